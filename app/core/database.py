@@ -8,6 +8,8 @@ from app.models.channel import Channel
 from app.models.site_config import SiteConfig
 from app.models.coupon import Coupon
 from app.models.price_history import PriceHistory
+from app.models.price_history_bucket import PriceHistoryBucket
+from app.models.price_summary import PriceSummary
 from app.models.file_storage import FileStorage
 from app.models.offer_click import OfferClick
 from app.models.page_view import PageView
@@ -26,7 +28,7 @@ async def init_db():
         database=db, 
         document_models=[
             Offer, Post, User, Affiliate, Channel, SiteConfig, 
-            Coupon, PriceHistory, FileStorage, OfferClick, PageView
+            Coupon, PriceHistory, PriceHistoryBucket, PriceSummary, FileStorage, OfferClick, PageView
         ]
     )
     print("✅ MongoDB conectado com sucesso")
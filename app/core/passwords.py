@@ -0,0 +1,121 @@
+"""
+Hash e verificação de senhas (bcrypt) fora do event loop
+
+Cada operação do bcrypt leva ~100-300 ms de CPU. Executada direto no handler,
+bloqueia o worker inteiro. Aqui ela roda em um pool de threads dedicado e
+limitado (o bcrypt libera o GIL), com um limite de operações pendentes: acima
+dele a requisição é recusada com 503 em vez de formar uma fila sem fim.
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict
+import bcrypt
+from fastapi import HTTPException, status
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Configurações
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+
+metrics: Dict[str, Any] = {
+    "submitted": 0,
+    "completed": 0,
+    "rejected": 0,
+    "pending": 0,
+    "peak_pending": 0,
+    "wait_ms_total": 0.0,
+    "wait_ms_max": 0.0,
+    "run_ms_total": 0.0,
+}
+
+
+def _timed(function, submitted_at: float, *args):
+    """Executa no pool. Retorna (resultado, tempo na fila, tempo de execução) em ms"""
+    started = time.perf_counter()
+    result = function(*args)
+    return result, (started - submitted_at) * 1000, (time.perf_counter() - started) * 1000
+
+
+def _decrement_pending():
+    metrics["pending"] -= 1
+
+
+def _release(loop: asyncio.AbstractEventLoop):
+    """Chamado na thread do executor quando o job termina (ou é cancelado antes de começar)"""
+    try:
+        loop.call_soon_threadsafe(_decrement_pending)
+    except RuntimeError:
+        # Event loop já encerrado (shutdown)
+        pass
+
+
+async def _run(function, *args):
+    if metrics["pending"] >= PASSWORD_HASH_MAX_PENDING:
+        metrics["rejected"] += 1
+        logger.warning("password_hash_pool_saturated", pending=metrics["pending"])
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado, tente novamente em instantes",
+            headers={"Retry-After": "1"}
+        )
+
+    metrics["submitted"] += 1
+    metrics["pending"] += 1
+    metrics["peak_pending"] = max(metrics["peak_pending"], metrics["pending"])
+
+    # O contador só cai quando o job sai do executor: se a requisição for cancelada
+    # (cliente desconectou), o bcrypt continua rodando e segue ocupando a fila
+    loop = asyncio.get_running_loop()
+    try:
+        future = executor.submit(_timed, function, time.perf_counter(), *args)
+    except RuntimeError:
+        # Pool encerrado (shutdown): nada foi enfileirado
+        metrics["pending"] -= 1
+        raise
+    future.add_done_callback(lambda _: _release(loop))
+    result, wait_ms, run_ms = await asyncio.wrap_future(future)
+
+    # Métricas atualizadas apenas no event loop (sem concorrência entre threads)
+    metrics["completed"] += 1
+    metrics["wait_ms_total"] += wait_ms
+    metrics["wait_ms_max"] = max(metrics["wait_ms_max"], wait_ms)
+    metrics["run_ms_total"] += run_ms
+    return result
+
+
+async def hash_password(password: str) -> str:
+    """Gera hash da senha"""
+    hashed = await _run(bcrypt.hashpw, password.encode("utf-8"), bcrypt.gensalt())
+    return hashed.decode("utf-8")
+
+
+async def verify_password(password: str, password_hash: str) -> bool:
+    """Verifica se a senha corresponde ao hash"""
+    return await _run(bcrypt.checkpw, password.encode("utf-8"), password_hash.encode("utf-8"))
+
+
+def get_password_metrics() -> Dict[str, Any]:
+    """Métricas do pool: operações, fila atual/máxima e tempos médios"""
+    completed = metrics["completed"]
+    return {
+        "workers": PASSWORD_HASH_WORKERS,
+        "max_pending": PASSWORD_HASH_MAX_PENDING,
+        "submitted": metrics["submitted"],
+        "completed": completed,
+        "rejected": metrics["rejected"],
+        "pending": metrics["pending"],
+        "peak_pending": metrics["peak_pending"],
+        "avg_wait_ms": round(metrics["wait_ms_total"] / completed, 2) if completed else None,
+        "max_wait_ms": round(metrics["wait_ms_max"], 2),
+        "avg_run_ms": round(metrics["run_ms_total"] / completed, 2) if completed else None,
+    }
+
+
+def shutdown_password_pool():
+    executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,78 @@
+"""
+Rate limiting distribuído (slowapi + Redis)
+
+Os contadores ficam no Redis, então os limites valem para todos os workers e
+containers juntos. A estratégia padrão (moving-window) é uma janela deslizante
+exata: cada verificação é um único script Lua atômico no Redis. Se o Redis cair,
+o slowapi passa a contar em memória (por processo) até ele voltar.
+
+Atrás de um proxy reverso/load balancer, o IP da conexão é o do proxy: informe
+os proxies em RATE_LIMIT_TRUSTED_PROXIES para que o limite use o IP do cliente
+vindo do X-Forwarded-For.
+"""
+import ipaddress
+import os
+from starlette.requests import Request
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+from app.core.cache import REDIS_URL
+
+# Configurações
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_STORAGE_URI = os.getenv("RATE_LIMIT_STORAGE_URI", REDIS_URL)
+# moving-window (exata) | sliding-window-counter (aproximada, mais leve) | fixed-window
+RATE_LIMIT_STRATEGY = os.getenv("RATE_LIMIT_STRATEGY", "moving-window")
+
+# Limites por rota (sintaxe do slowapi: "10/minute", "100/hour"...)
+RATE_LIMIT_EXTRACT = os.getenv("RATE_LIMIT_EXTRACT", "20/minute")
+RATE_LIMIT_ANALYTICS = os.getenv("RATE_LIMIT_ANALYTICS", "300/minute")
+RATE_LIMIT_LOGIN = os.getenv("RATE_LIMIT_LOGIN", "10/minute")
+
+# IPs/redes dos proxies confiáveis, separados por vírgula (ex: "10.0.0.0/8,172.17.0.1").
+# Vazio: X-Forwarded-For é ignorado (pode ser forjado pelo cliente)
+RATE_LIMIT_TRUSTED_PROXIES = [
+    ipaddress.ip_network(item.strip(), strict=False)
+    for item in os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "").split(",")
+    if item.strip()
+]
+
+
+def _is_trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in RATE_LIMIT_TRUSTED_PROXIES)
+
+
+def client_ip(request: Request) -> str:
+    """
+    IP do cliente para o rate limit. Só considera o X-Forwarded-For se a conexão
+    vier de um proxy confiável; nele, o cliente é o endereço mais à direita que
+    não é um proxy confiável (os anteriores podem ter sido forjados)
+    """
+    remote = get_remote_address(request)
+    forwarded = request.headers.get("x-forwarded-for")
+    if not forwarded or not _is_trusted_proxy(remote):
+        return remote
+
+    for address in reversed([item.strip() for item in forwarded.split(",") if item.strip()]):
+        if not _is_trusted_proxy(address):
+            return address
+    return remote
+
+
+def create_limiter(storage_uri: str = RATE_LIMIT_STORAGE_URI) -> Limiter:
+    """Limiter por IP com fallback em memória quando o storage não responde"""
+    return Limiter(
+        key_func=client_ip,
+        storage_uri=storage_uri,
+        strategy=RATE_LIMIT_STRATEGY,
+        key_prefix="rate_limit",
+        in_memory_fallback_enabled=True,
+        swallow_errors=True,
+        enabled=RATE_LIMIT_ENABLED,
+    )
+
+
+limiter = create_limiter()
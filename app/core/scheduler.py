@@ -1,11 +1,15 @@
 """
-Scheduler para tarefas agendadas (limpeza automática de arquivos)
+Scheduler para tarefas agendadas (limpeza automática de arquivos, re-scraping de preços
+e reconciliação das estatísticas dos canais)
 """
 import asyncio
 from datetime import datetime
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from app.services.file_storage import cleanup_expired_files, cleanup_orphan_files
+from app.services.price_rescrape import run_price_rescrape, RESCRAPE_ENABLED, RESCRAPE_INTERVAL_MINUTES
+from app.models.channel import Channel
 from app.core.logging import get_logger
 import os
 
@@ -15,6 +19,8 @@ logger = get_logger(__name__)
 CLEANUP_ENABLED = os.getenv("FILE_CLEANUP_ENABLED", "true").lower() == "true"
 CLEANUP_HOUR = int(os.getenv("FILE_CLEANUP_HOUR", "3"))  # 3h da manhã por padrão
 CLEANUP_ORPHANS_ENABLED = os.getenv("FILE_CLEANUP_ORPHANS_ENABLED", "false").lower() == "true"
+STATS_RECONCILE_ENABLED = os.getenv("CHANNEL_STATS_RECONCILE_ENABLED", "true").lower() == "true"
+STATS_RECONCILE_HOUR = int(os.getenv("CHANNEL_STATS_RECONCILE_HOUR", "4"))
 
 scheduler = None
 
@@ -49,21 +55,25 @@ async def scheduled_cleanup_orphans():
         logger.error("scheduled_cleanup_failed", type="orphans", error=str(e))
 
 
-def init_scheduler():
-    """
-    Inicializa scheduler de tarefas agendadas
-    
-    - Limpeza de arquivos expirados: diariamente às 3h
-    - Limpeza de arquivos órfãos: semanalmente aos domingos às 4h (opcional)
-    """
-    global scheduler
-    
-    if not CLEANUP_ENABLED:
-        logger.info("file_cleanup_disabled")
-        return
-    
-    scheduler = AsyncIOScheduler()
-    
+async def scheduled_price_rescrape():
+    """Tarefa agendada para re-scraping de preços das ofertas aprovadas"""
+    try:
+        await run_price_rescrape()
+    except Exception as e:
+        logger.error("scheduled_price_rescrape_failed", error=str(e))
+
+
+async def scheduled_channel_stats_reconcile():
+    """Tarefa agendada para corrigir divergências nos contadores dos canais"""
+    try:
+        corrected = await Channel.reconcile_statistics()
+        logger.info("channel_stats_reconciled", corrected=corrected)
+    except Exception as e:
+        logger.error("channel_stats_reconcile_failed", error=str(e))
+
+
+def add_cleanup_jobs():
+    """Adiciona as tarefas de limpeza de arquivos"""
     # Limpeza de arquivos expirados (diariamente)
     scheduler.add_job(
         scheduled_cleanup_expired,
@@ -92,6 +102,70 @@ def init_scheduler():
             job="cleanup_orphan_files",
             schedule=f"Domingos às {CLEANUP_HOUR + 1}:00"
         )
+
+
+def add_rescrape_job():
+    """Adiciona a tarefa de re-scraping de preços"""
+    scheduler.add_job(
+        scheduled_price_rescrape,
+        trigger=IntervalTrigger(minutes=RESCRAPE_INTERVAL_MINUTES),
+        id="price_rescrape",
+        name="Re-scraping de preços",
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True
+    )
+    logger.info(
+        "scheduled_job_added",
+        job="price_rescrape",
+        schedule=f"A cada {RESCRAPE_INTERVAL_MINUTES} minutos"
+    )
+
+
+def add_stats_reconcile_job():
+    """Adiciona a tarefa de reconciliação das estatísticas dos canais"""
+    scheduler.add_job(
+        scheduled_channel_stats_reconcile,
+        trigger=CronTrigger(hour=STATS_RECONCILE_HOUR, minute=30),
+        id="channel_stats_reconcile",
+        name="Reconciliação das estatísticas dos canais",
+        replace_existing=True
+    )
+    logger.info(
+        "scheduled_job_added",
+        job="channel_stats_reconcile",
+        schedule=f"Diariamente às {STATS_RECONCILE_HOUR}:30"
+    )
+
+
+def init_scheduler():
+    """
+    Inicializa scheduler de tarefas agendadas
+    
+    - Limpeza de arquivos expirados: diariamente às 3h
+    - Limpeza de arquivos órfãos: semanalmente aos domingos às 4h (opcional)
+    - Re-scraping de preços: a cada PRICE_RESCRAPE_INTERVAL_MINUTES (opcional)
+    - Reconciliação das estatísticas dos canais: diariamente às 4h30
+    """
+    global scheduler
+    
+    if not CLEANUP_ENABLED:
+        logger.info("file_cleanup_disabled")
+    if not RESCRAPE_ENABLED:
+        logger.info("price_rescrape_disabled")
+    if not STATS_RECONCILE_ENABLED:
+        logger.info("channel_stats_reconcile_disabled")
+    if not CLEANUP_ENABLED and not RESCRAPE_ENABLED and not STATS_RECONCILE_ENABLED:
+        return
+    
+    scheduler = AsyncIOScheduler()
+    
+    if CLEANUP_ENABLED:
+        add_cleanup_jobs()
+    if RESCRAPE_ENABLED:
+        add_rescrape_job()
+    if STATS_RECONCILE_ENABLED:
+        add_stats_reconcile_job()
     
     scheduler.start()
     logger.info("scheduler_started", jobs=len(scheduler.get_jobs()))
@@ -1,14 +1,20 @@
 """
 Módulo de segurança: JWT, autenticação e autorização
 """
+import hashlib
+import time
+import uuid
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, Optional, Tuple
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 import os
 from dotenv import load_dotenv
+from app.core import cache
+from app.core.logging import get_logger
 
 # Carregar variáveis de ambiente
 load_dotenv()
@@ -18,12 +24,20 @@ SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 
+# Tokens já verificados (por processo), mantidos até o próprio exp
+TOKEN_CACHE_MAX_SIZE = int(os.getenv("TOKEN_CACHE_MAX_SIZE", "10000"))
+
+# Cache do usuário autenticado (por processo; alterações feitas em outro worker valem após o TTL)
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "10000"))
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
+logger = get_logger(__name__)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    """Cria um token JWT"""
+    """Cria um token JWT (com jti e iat para permitir revogação)"""
     to_encode = data.copy()
     
     if expires_delta:
@@ -31,26 +45,154 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire})
+    issued_at = time.time()
+    # iat do JWT tem resolução de segundos; iat_ms (privado) é usado na revogação por usuário
+    to_encode.update({"exp": expire, "iat": int(issued_at), "iat_ms": int(issued_at * 1000), "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
+# sha256(token) -> (exp, payload)
+_token_cache: Dict[bytes, Tuple[float, dict]] = {}
+
+
 def verify_token(token: str) -> dict:
-    """Verifica e decodifica um token JWT"""
+    """
+    Verifica e decodifica um token JWT. Tokens já verificados vêm do cache
+    (sem refazer HMAC e JSON) até expirarem
+    """
+    key = hashlib.sha256(token.encode("utf-8")).digest()
+    cached = _token_cache.get(key)
+    if cached and cached[0] > time.time():
+        return cached[1]
+    
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except JWTError:
+        _token_cache.pop(key, None)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token inválido ou expirado",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    
+    if "exp" in payload:
+        if len(_token_cache) >= TOKEN_CACHE_MAX_SIZE:
+            _token_cache.pop(next(iter(_token_cache)))  # Descarta a entrada mais antiga
+        _token_cache[key] = (float(payload["exp"]), payload)
+    return payload
+
+
+# Revogação: tokens individuais (logout) e todos os tokens de um usuário emitidos
+# antes de um instante (desativação/exclusão). Redis compartilha entre os workers;
+# a cópia local vale mesmo sem Redis
+# jti -> exp
+_revoked_tokens: Dict[str, float] = {}
+# user_id -> (revogado_em, expira_em)
+_revoked_users: Dict[str, Tuple[float, float]] = {}
+
+
+def _prune_revocations(now: float):
+    for jti in [jti for jti, expires in _revoked_tokens.items() if expires <= now]:
+        del _revoked_tokens[jti]
+    for user_id in [user_id for user_id, (_, expires) in _revoked_users.items() if expires <= now]:
+        del _revoked_users[user_id]
+
+
+async def revoke_token(payload: dict):
+    """Revoga um token (logout) até o seu exp"""
+    jti = payload.get("jti")
+    if not jti:
+        return
+    now = time.time()
+    expires = float(payload.get("exp", now + ACCESS_TOKEN_EXPIRE_MINUTES * 60))
+    _prune_revocations(now)
+    _revoked_tokens[jti] = expires
+    if cache.redis_client and expires > now:
+        try:
+            await cache.redis_client.setex(f"auth:revoked:{jti}", int(expires - now) + 1, "1")
+        except Exception as e:
+            logger.warning("token_revocation_sync_failed", error=str(e))
+
+
+async def revoke_user_tokens(user_id: Any):
+    """Revoga todos os tokens já emitidos para o usuário (desativação/exclusão)"""
+    now = time.time()
+    ttl = ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    _prune_revocations(now)
+    _revoked_users[str(user_id)] = (now, now + ttl)
+    invalidate_user_cache(user_id)
+    if cache.redis_client:
+        try:
+            await cache.redis_client.setex(f"auth:revoked_user:{user_id}", ttl, str(now))
+        except Exception as e:
+            logger.warning("token_revocation_sync_failed", error=str(e))
+
+
+async def is_token_revoked(payload: dict) -> bool:
+    """Consulta a lista de revogação (local e, se disponível, Redis em uma única ida)"""
+    jti = payload.get("jti")
+    user_id = str(payload.get("sub"))
+    # Tokens sem iat_ms (emitidos antes dele existir): iat em segundos, revogados no mesmo segundo
+    issued_at = payload["iat_ms"] / 1000 if "iat_ms" in payload else float(payload.get("iat", 0))
+    
+    if jti in _revoked_tokens:
+        return True
+    revoked_user = _revoked_users.get(user_id)
+    if revoked_user and issued_at <= revoked_user[0]:
+        return True
+    
+    if cache.redis_client:
+        try:
+            revoked, revoked_before = await cache.redis_client.mget(
+                f"auth:revoked:{jti}", f"auth:revoked_user:{user_id}"
+            )
+        except Exception:
+            return False
+        if (jti and revoked) or (revoked_before and issued_at <= float(revoked_before)):
+            return True
+    return False
+
+
+@dataclass(frozen=True)
+class AuthenticatedUser:
+    """Dados do usuário autenticado usados na autorização (perfil completo: User.get(id))"""
+    id: Any
+    role: str
+    is_active: bool
 
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Obtém o usuário atual do token JWT"""
+# user_id -> (expira_em, usuário)
+_user_cache: Dict[str, Tuple[float, AuthenticatedUser]] = {}
+
+
+def invalidate_user_cache(user_id: Any):
+    """Remove o usuário do cache (após alterar role/status ou excluir)"""
+    _user_cache.pop(str(user_id), None)
+
+
+async def load_authenticated_user(user_id: str) -> Optional[AuthenticatedUser]:
+    """Busca id/role/is_active do usuário, do cache ou do banco"""
+    cached = _user_cache.get(user_id)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    
+    # Importar aqui para evitar circular import
+    from app.models.user import User
+    user = await User.get(user_id)
+    if user is None:
+        _user_cache.pop(user_id, None)
+        return None
+    
+    authenticated = AuthenticatedUser(id=user.id, role=user.role, is_active=user.is_active)
+    if len(_user_cache) >= USER_CACHE_MAX_SIZE:
+        _user_cache.pop(next(iter(_user_cache)))  # Descarta a entrada mais antiga
+    _user_cache[user_id] = (time.monotonic() + USER_CACHE_TTL_SECONDS, authenticated)
+    return authenticated
+
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> AuthenticatedUser:
+    """Obtém o usuário atual do token JWT (id, role e is_active, com cache de curta duração)"""
     token = credentials.credentials
     payload = verify_token(token)
     
@@ -62,9 +204,14 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Importar aqui para evitar circular import
-    from app.models.user import User
-    user = await User.get(user_id)
+    if await is_token_revoked(payload):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token revogado",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    user = await load_authenticated_user(str(user_id))
     
     if user is None:
         raise HTTPException(
@@ -82,7 +229,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     return user
 
 
-async def require_admin(user = Depends(get_current_user)):
+async def require_admin(user: AuthenticatedUser = Depends(get_current_user)) -> AuthenticatedUser:
     """Requer que o usuário seja admin"""
     if user.role != "admin":
         raise HTTPException(
@@ -92,7 +239,7 @@ async def require_admin(user = Depends(get_current_user)):
     return user
 
 
-async def require_moderator(user = Depends(get_current_user)):
+async def require_moderator(user: AuthenticatedUser = Depends(get_current_user)) -> AuthenticatedUser:
     """Requer que o usuário seja admin ou moderator"""
     if user.role not in ["admin", "moderator"]:
         raise HTTPException(
@@ -1,30 +1,31 @@
 import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
+from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from app.routes import offers, posts, users, affiliates, channels, site_config, coupons, health, price_history, files, analytics
 from app.core.database import init_db
 from app.core.cache import init_redis, close_redis
 from app.core.logging import configure_logging, get_logger
+from app.core.rate_limit import limiter
 from app.services.ai_categorization import init_ai
+from app.services.local_classifier import init_local_classifier
 from app.core.scheduler import init_scheduler, shutdown_scheduler
+from app.core.passwords import shutdown_password_pool
+from app.services.last_login import shutdown_last_login_writer
+from app.services.channel_dispatch import init_dispatcher, shutdown_dispatcher
 
 # Configurar logs estruturados
 configure_logging()
 logger = get_logger(__name__)
 
-# Configurar rate limiting
-limiter = Limiter(key_func=get_remote_address)
-
 app = FastAPI(
     title="Ecosystem Backend",
     version="2.3.1",
     description="Backend completo com JWT, cache Redis, rate limiting, logs estruturados, IA, gerenciamento de arquivos, sistema de analytics e suporte a 5 plataformas (ML, Shopee, AliExpress, Amazon, Kabum)."
 )
 
-# Adicionar rate limiter ao app
+# Adicionar rate limiter ao app (Redis compartilhado entre workers; limites por rota em app/core/rate_limit.py)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
@@ -36,6 +37,7 @@ app.add_middleware(
     allow_credentials=False,  # Deve ser False quando allow_origins=["*"]
     allow_methods=["*"],  # Permite todos os métodos (GET, POST, PUT, DELETE, etc.)
     allow_headers=["*"],  # Permite todos os headers
+    expose_headers=["X-Next-Cursor"],  # Cursor de paginação de /posts/
 )
 
 @app.on_event("startup")
@@ -44,14 +46,19 @@ async def startup():
     await init_db()
     await init_redis()
     init_ai()
+    init_local_classifier()
     init_scheduler()
+    await init_dispatcher()
     logger.info("Aplicação inicializada com sucesso")
 
 @app.on_event("shutdown")
 async def shutdown():
     logger.info("Encerrando aplicação...")
+    await shutdown_dispatcher()
+    await shutdown_last_login_writer()
     await close_redis()
     shutdown_scheduler()
+    shutdown_password_pool()
     logger.info("Aplicação encerrada")
 
 # Registrar rotas
@@ -1,7 +1,32 @@
+import asyncio
 from beanie import Document, Indexed
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from pydantic import Field
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+def post_status_delta(old_status: Optional[str], new_status: Optional[str]) -> Tuple[int, int]:
+    """
+    Variação de (tentativas, sucessos) de um canal causada pela transição de status de um post.
+    old_status=None indica post criado; new_status=None indica post removido.
+    """
+    attempts = (new_status is not None) - (old_status is not None)
+    successes = (new_status == "success") - (old_status == "success")
+    return attempts, successes
+
+
+def sum_post_deltas(transitions) -> Dict[str, Tuple[int, int]]:
+    """Soma as variações de uma lista de (canal, status anterior, novo status) por canal"""
+    deltas: Dict[str, Tuple[int, int]] = {}
+    for name, old_status, new_status in transitions:
+        attempts, successes = post_status_delta(old_status, new_status)
+        total_attempts, total_successes = deltas.get(name, (0, 0))
+        deltas[name] = (total_attempts + attempts, total_successes + successes)
+    return deltas
+
 
 class Channel(Document):
     """Modelo para canais de publicação (Telegram, WhatsApp, Instagram, Site, etc)"""
@@ -27,6 +52,7 @@ class Channel(Document):
     
     # Estatísticas
     total_posts: int = Field(default=0, description="Total de posts enviados")
+    total_attempts: int = Field(default=0, description="Total de posts (tentativas) do canal")
     success_rate: float = Field(default=0.0, ge=0, le=100, description="Taxa de sucesso (%)")
     
     is_active: bool = Field(default=True, description="Se o canal está ativo")
@@ -48,3 +74,104 @@ class Channel(Document):
     async def get_active_channels(cls) -> list["Channel"]:
         """Retorna apenas canais ativos ordenados por prioridade"""
         return await cls.find({"is_active": True}).sort("-priority").to_list()
+
+    @classmethod
+    async def apply_post_delta(cls, name: str, attempts: int = 0, successes: int = 0):
+        """
+        Aplica uma variação às estatísticas do canal em uma única operação atômica
+        (update com pipeline: incrementa os contadores e recalcula success_rate)
+        """
+        if not attempts and not successes:
+            return
+
+        pipeline = [
+            {"$set": {
+                "total_posts": {"$max": [0, {"$add": ["$total_posts", successes]}]},
+                "total_attempts": {"$max": [0, {"$add": ["$total_attempts", attempts]}]},
+            }},
+            {"$set": {
+                "success_rate": {"$cond": [
+                    {"$gt": ["$total_attempts", 0]},
+                    {"$min": [100, {"$round": [
+                        {"$multiply": [{"$divide": ["$total_posts", "$total_attempts"]}, 100]}, 2
+                    ]}]},
+                    0.0
+                ]},
+                "updated_at": "$$NOW",
+                **({"last_post_at": "$$NOW"} if successes > 0 else {})
+            }}
+        ]
+
+        collection = cls.get_pymongo_collection()
+        result = await collection.update_one({"name": name, "total_attempts": {"$exists": True}}, pipeline)
+        if result.matched_count:
+            return
+
+        # Canais anteriores ao contador de tentativas são inicializados pela reconciliação;
+        # nomes sem documento (canais padrão, slugs) não têm estatísticas a manter
+        if await collection.count_documents({"name": name, "total_attempts": {"$exists": False}}, limit=1):
+            await cls.reconcile_statistics([name])
+
+    @classmethod
+    async def apply_post_deltas(cls, deltas: Dict[str, Tuple[int, int]]):
+        """Aplica as variações (tentativas, sucessos) de vários canais concorrentemente"""
+        await asyncio.gather(*(
+            cls.apply_post_delta(name, attempts, successes)
+            for name, (attempts, successes) in deltas.items()
+        ))
+
+    @classmethod
+    async def record_post_transition(cls, name: str, old_status: Optional[str], new_status: Optional[str]):
+        """Atualiza as estatísticas do canal conforme a transição de status de um post"""
+        await cls.apply_post_delta(name, *post_status_delta(old_status, new_status))
+
+    @classmethod
+    async def reconcile_statistics(cls, names: Optional[List[str]] = None) -> int:
+        """
+        Recalcula as estatísticas a partir dos posts (corrige divergências dos contadores).
+        Retorna o número de canais corrigidos.
+        """
+        from app.models.post import Post
+
+        match = {"channel": {"$in": names}} if names is not None else {}
+        rows = await Post.get_pymongo_collection().aggregate([
+            {"$match": match},
+            {"$group": {
+                "_id": "$channel",
+                "attempts": {"$sum": 1},
+                "successes": {"$sum": {"$cond": [{"$eq": ["$status", "success"]}, 1, 0]}}
+            }}
+        ]).to_list(length=None)
+        counts = {row["_id"]: row for row in rows}
+
+        query = {"name": {"$in": names}} if names is not None else {}
+        channels = await cls.get_pymongo_collection().find(
+            query, {"name": 1, "total_posts": 1, "total_attempts": 1, "success_rate": 1}
+        ).to_list(length=None)
+
+        corrected = 0
+        for channel in channels:
+            row = counts.get(channel["name"], {})
+            attempts, successes = row.get("attempts", 0), row.get("successes", 0)
+            stats = {
+                "total_posts": successes,
+                "total_attempts": attempts,
+                "success_rate": round(successes / attempts * 100, 2) if attempts else 0.0,
+            }
+            if all(channel.get(field) == value for field, value in stats.items()):
+                continue
+
+            logger.info(
+                "channel_stats_drift_corrected",
+                channel=channel["name"],
+                total_posts=channel.get("total_posts"),
+                total_attempts=channel.get("total_attempts"),
+                expected_posts=successes,
+                expected_attempts=attempts
+            )
+            await cls.get_pymongo_collection().update_one(
+                {"_id": channel["_id"]}, {"$set": {**stats, "updated_at": datetime.utcnow()}}
+            )
+            corrected += 1
+
+        return corrected
@@ -22,6 +22,7 @@ class Offer(Document):
     note: Optional[str] = None  # Avisos sobre limitações da extração
     status: str = "pending"
     total_clicks: int = 0  # Contador de cliques na oferta
+    price_checked_at: Optional[datetime] = None  # Última verificação de preço pelo re-scraping
     created_at: datetime = datetime.utcnow()
     updated_at: datetime = datetime.utcnow()
 
@@ -37,6 +38,11 @@ class Offer(Document):
                 ],
                 name="unique_offer_per_day"
             ),
+            # Seleção de ofertas para re-scraping
+            IndexModel(
+                [("status", ASCENDING), ("price_checked_at", ASCENDING)],
+                name="rescrape_queue"
+            ),
         ]
     
     @classmethod
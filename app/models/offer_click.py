@@ -1,10 +1,14 @@
-from beanie import Document
+from beanie import Document, TimeSeriesConfig, Granularity
 from datetime import datetime
 from typing import Optional
 from pydantic import Field
+import os
+
+# Retenção dos eventos brutos em segundos (0 = nunca expira)
+EVENTS_TTL_SECONDS = int(os.getenv("ANALYTICS_EVENTS_TTL_SECONDS", "0"))
 
 class OfferClick(Document):
-    """Modelo para rastreamento de cliques em ofertas"""
+    """Modelo para rastreamento de cliques em ofertas (time-series collection)"""
     
     offer_id: str = Field(..., description="ID da oferta clicada")
     source: str = Field(default="web", description="Origem do clique (home, ofertas, dashboard, etc)")
@@ -14,8 +18,12 @@ class OfferClick(Document):
     
     class Settings:
         name = "offer_clicks"
+        timeseries = TimeSeriesConfig(
+            time_field="clicked_at",
+            meta_field="offer_id",
+            granularity=Granularity.minutes,
+            expire_after_seconds=EVENTS_TTL_SECONDS or None
+        )
         indexes = [
             [("offer_id", 1), ("clicked_at", -1)],  # Buscar cliques por oferta ordenados por data
-            [("source", 1)],  # Buscar por origem
-            [("clicked_at", -1)],  # Ordenar por data recente
         ]
@@ -1,10 +1,11 @@
-from beanie import Document
+from beanie import Document, TimeSeriesConfig, Granularity
 from datetime import datetime
 from typing import Optional
 from pydantic import Field
+from app.models.offer_click import EVENTS_TTL_SECONDS
 
 class PageView(Document):
-    """Modelo para rastreamento de visualizações de páginas"""
+    """Modelo para rastreamento de visualizações de páginas (time-series collection)"""
     
     page: str = Field(..., description="Nome da página visualizada (home, ofertas, cupons, etc)")
     ip_address: Optional[str] = Field(None, description="Endereço IP do usuário")
@@ -13,7 +14,12 @@ class PageView(Document):
     
     class Settings:
         name = "page_views"
+        timeseries = TimeSeriesConfig(
+            time_field="viewed_at",
+            meta_field="page",
+            granularity=Granularity.minutes,
+            expire_after_seconds=EVENTS_TTL_SECONDS or None
+        )
         indexes = [
             [("page", 1), ("viewed_at", -1)],  # Buscar views por página ordenados por data
-            [("viewed_at", -1)],  # Ordenar por data recente
         ]
@@ -1,7 +1,17 @@
 from beanie import Document
-from datetime import datetime
-from typing import Optional, Dict, Any
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List
 from pydantic import Field
+from pymongo import IndexModel, ASCENDING, DESCENDING
+
+# Campos da oferta copiados para o post (exibição sem $lookup)
+OFFER_DISPLAY_FIELDS = {
+    "offer_title": "title",
+    "offer_image": "image",
+    "offer_price": "price_discounted",
+    "offer_source": "source",
+}
 
 class Post(Document):
     offer_id: str = Field(..., description="ID da oferta relacionada")
@@ -10,8 +20,98 @@ class Post(Document):
     status: str = Field(default="pending", description="pending, success, failed")
     responses: Optional[Dict[str, Any]] = Field(default_factory=dict)
     error: Optional[str] = None
+    # Dados da oferta desnormalizados (mantidos em sincronia no update da oferta)
+    offer_title: Optional[str] = None
+    offer_image: Optional[str] = None
+    offer_price: Optional[float] = None
+    offer_source: Optional[str] = None
+    # Despacho: tentativas de envio e reserva (lease) do worker que está enviando
+    attempts: int = 0
+    dispatch_token: Optional[str] = None
+    dispatch_lease_until: Optional[datetime] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
     class Settings:
-        name = "posts"
\ No newline at end of file
+        name = "posts"
+        indexes = [
+            # Listagem filtrada e paginada por cursor (created_at, _id)
+            IndexModel(
+                [("status", ASCENDING), ("channel", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                name="status_channel_created"
+            ),
+            IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created_desc"),
+            IndexModel([("offer_id", ASCENDING)], name="offer_id"),
+        ]
+
+    @staticmethod
+    def offer_display_fields(offer) -> Dict[str, Any]:
+        """Extrai da oferta os campos desnormalizados no post"""
+        return {post_field: getattr(offer, offer_field, None) for post_field, offer_field in OFFER_DISPLAY_FIELDS.items()}
+
+    @classmethod
+    async def sync_offer_fields(cls, offer_id: str, fields: Dict[str, Any]):
+        """Atualiza os campos desnormalizados de todos os posts de uma oferta"""
+        if fields:
+            await cls.get_pymongo_collection().update_many({"offer_id": offer_id}, {"$set": fields})
+
+    @classmethod
+    async def create_for_offer(cls, offer, channels: List[str]) -> List["Post"]:
+        """Cria os posts pendentes de uma oferta em todos os canais com um único insert_many"""
+        from app.models.channel import Channel, sum_post_deltas
+
+        posts = [
+            cls(
+                offer_id=str(offer.id),
+                channel=channel,
+                status="pending",
+                enviado=False,
+                **cls.offer_display_fields(offer)
+            )
+            for channel in channels
+        ]
+        if posts:
+            await cls.insert_many(posts)
+            await Channel.apply_post_deltas(sum_post_deltas((p.channel, None, p.status) for p in posts))
+        return posts
+
+    @classmethod
+    async def delete_for_offer(cls, offer_id: str) -> List[str]:
+        """Remove todos os posts de uma oferta com um único delete_many. Retorna os IDs removidos"""
+        from app.models.channel import Channel, sum_post_deltas
+
+        collection = cls.get_pymongo_collection()
+        posts = await collection.find({"offer_id": offer_id}, {"channel": 1, "status": 1}).to_list(length=None)
+        if not posts:
+            return []
+
+        await collection.delete_many({"_id": {"$in": [p["_id"] for p in posts]}})
+        await Channel.apply_post_deltas(sum_post_deltas((p["channel"], p["status"], None) for p in posts))
+        return [str(p["_id"]) for p in posts]
+
+    @classmethod
+    async def claim_pending(cls, channels: List[str], limit: int, lease_seconds: int) -> List[Dict[str, Any]]:
+        """
+        Reserva até `limit` posts pendentes (mais antigos primeiro) para envio.
+        Posts com lease ativo são ignorados; leases expirados (worker que caiu) são reaproveitados.
+        """
+        collection = cls.get_pymongo_collection()
+        now = datetime.utcnow()
+        query = {
+            "status": "pending",
+            "enviado": False,
+            "channel": {"$in": channels},
+            "$or": [{"dispatch_lease_until": None}, {"dispatch_lease_until": {"$lt": now}}]
+        }
+
+        candidates = await collection.find(query, {"_id": 1}).sort("created_at", ASCENDING).limit(limit).to_list(length=None)
+        if not candidates:
+            return []
+
+        # O filtro repetido no update garante que outra instância não reserve o mesmo post
+        token = uuid.uuid4().hex
+        await collection.update_many(
+            {**query, "_id": {"$in": [c["_id"] for c in candidates]}},
+            {"$set": {"dispatch_token": token, "dispatch_lease_until": now + timedelta(seconds=lease_seconds)}}
+        )
+        return await collection.find({"dispatch_token": token}).to_list(length=None)
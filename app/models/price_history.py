@@ -1,13 +1,30 @@
 """
 Modelo de histórico de preços
 """
-from beanie import Document
+from beanie import Document, TimeSeriesConfig, Granularity
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List, Dict, Any
 from pydantic import Field
+import os
+
+# Modo de armazenamento:
+# - raw (padrão): um documento por observação na time-series collection price_history
+# - bucket: um documento por oferta por dia em price_history_buckets (lê um dia
+#   inteiro em um único documento, sem depender de time-series collections)
+# - both: grava nos dois e continua lendo do raw; serve para preencher os buckets
+#   durante a migração antes de trocar para bucket (sem perder o histórico recente)
+PRICE_HISTORY_STORAGE = os.getenv("PRICE_HISTORY_STORAGE", "raw").lower()
+
+# Resoluções suportadas e a unidade correspondente do $dateTrunc
+RESOLUTIONS = {
+    "raw": None,
+    "hourly": "hour",
+    "daily": "day",
+    "weekly": "week"
+}
 
 class PriceHistory(Document):
-    """Armazena histórico de variação de preços de ofertas"""
+    """Armazena histórico de variação de preços de ofertas (time-series collection)"""
     
     offer_id: str  # ID da oferta
     price_original: Optional[float] = None
@@ -19,11 +36,193 @@ class PriceHistory(Document):
     
     class Settings:
         name = "price_history"
+        timeseries = TimeSeriesConfig(
+            time_field="timestamp",
+            meta_field="offer_id",
+            granularity=Granularity.hours
+        )
         indexes = [
-            "offer_id",
-            "timestamp"
+            [("offer_id", 1), ("timestamp", -1)],  # Consultas por oferta ordenadas por data
+        ]
+    
+    @classmethod
+    async def record(
+        cls,
+        offer_id: str,
+        price_original: Optional[float],
+        price_discounted: Optional[float],
+        discount: Optional[str] = None,
+        currency: str = "BRL",
+        source: str = ""
+    ) -> Optional["PriceHistory"]:
+        """
+        Registra uma observação de preço conforme PRICE_HISTORY_STORAGE e
+        atualiza o resumo da oferta (PriceSummary).
+        Retorna o documento bruto criado (None no modo bucket).
+        """
+        from app.models.price_history_bucket import PriceHistoryBucket
+        from app.models.price_summary import PriceSummary
+        
+        timestamp = datetime.utcnow()
+        record = None
+        
+        if PRICE_HISTORY_STORAGE in ("raw", "both"):
+            record = cls(
+                offer_id=offer_id,
+                price_original=price_original,
+                price_discounted=price_discounted,
+                discount=discount,
+                currency=currency,
+                timestamp=timestamp,
+                source=source
+            )
+            await record.insert()
+        
+        if PRICE_HISTORY_STORAGE in ("bucket", "both"):
+            await PriceHistoryBucket.add_observation(
+                offer_id=offer_id,
+                timestamp=timestamp,
+                price_original=price_original,
+                price_discounted=price_discounted,
+                discount=discount,
+                currency=currency,
+                source=source
+            )
+        
+        if price_discounted is None:
+            return record
+        
+        # Ofertas com histórico anterior ao resumo: reconstruir a partir do histórico (já inclui esta observação)
+        if await PriceSummary.find_one({"offer_id": offer_id}) is None:
+            await PriceSummary.rebuild([offer_id])
+        else:
+            await PriceSummary.apply_observation(
+                offer_id=offer_id,
+                price=price_discounted,
+                timestamp=timestamp,
+                discount=discount,
+                currency=currency
+            )
+        
+        return record
+    
+    @classmethod
+    def _points_pipeline(cls, offer_ids: List[str], start_date: datetime):
+        """
+        Retorna (collection, pipeline) que produz uma observação por documento
+        com os campos offer_id, timestamp, price_original, price_discounted,
+        discount, currency e source, independente do modo de armazenamento
+        """
+        from app.models.price_history_bucket import PriceHistoryBucket
+        
+        if PRICE_HISTORY_STORAGE != "bucket":
+            pipeline = [
+                {"$match": {"offer_id": {"$in": offer_ids}, "timestamp": {"$gte": start_date}}},
+                {"$project": {"_id": 0, "offer_id": 1, "timestamp": 1, "price_original": 1,
+                              "price_discounted": 1, "discount": 1, "currency": 1, "source": 1}}
+            ]
+            return cls.get_pymongo_collection(), pipeline
+        
+        start_day = datetime(start_date.year, start_date.month, start_date.day)
+        pipeline = [
+            {"$match": {"offer_id": {"$in": offer_ids}, "day": {"$gte": start_day}}},
+            {"$unwind": "$prices"},
+            {"$match": {"prices.t": {"$gte": start_date}}},
+            {"$project": {
+                "_id": 0,
+                "offer_id": 1,
+                "timestamp": "$prices.t",
+                "price_original": "$prices.price_original",
+                "price_discounted": "$prices.price_discounted",
+                "discount": "$prices.discount",
+                "currency": 1,
+                "source": "$prices.source"
+            }}
+        ]
+        return PriceHistoryBucket.get_pymongo_collection(), pipeline
+    
+    @staticmethod
+    def _downsample_stages(resolution: str) -> List[Dict[str, Any]]:
+        """Estágios que agregam as observações por intervalo (último preço, mín, máx e média)"""
+        unit = RESOLUTIONS[resolution]
+        if unit is None:
+            return [{"$sort": {"timestamp": -1}}]
+        
+        date_trunc = {"date": "$timestamp", "unit": unit}
+        if unit == "week":
+            date_trunc["startOfWeek"] = "monday"
+        
+        return [
+            {"$sort": {"timestamp": 1}},
+            {"$group": {
+                "_id": {"offer_id": "$offer_id", "bucket": {"$dateTrunc": date_trunc}},
+                "price_discounted": {"$last": "$price_discounted"},
+                "price_original": {"$last": "$price_original"},
+                "discount": {"$last": "$discount"},
+                "currency": {"$last": "$currency"},
+                "price_min": {"$min": "$price_discounted"},
+                "price_max": {"$max": "$price_discounted"},
+                "price_avg": {"$avg": "$price_discounted"},
+                "samples": {"$sum": 1}
+            }},
+            {"$project": {
+                "_id": 0,
+                "offer_id": "$_id.offer_id",
+                "timestamp": "$_id.bucket",
+                "price_discounted": 1,
+                "price_original": 1,
+                "discount": 1,
+                "currency": 1,
+                "price_min": 1,
+                "price_max": 1,
+                "price_avg": {"$round": ["$price_avg", 2]},
+                "samples": 1
+            }},
+            {"$sort": {"timestamp": -1}}
         ]
     
+    @classmethod
+    async def get_price_series(cls, offer_id: str, days: int = 30, resolution: str = "raw") -> List[Dict[str, Any]]:
+        """
+        Retorna o histórico de preços de uma oferta nos últimos N dias,
+        reamostrado no servidor conforme a resolução (raw, hourly, daily, weekly)
+        """
+        from datetime import timedelta
+        
+        start_date = datetime.utcnow() - timedelta(days=days)
+        collection, pipeline = cls._points_pipeline([offer_id], start_date)
+        pipeline += cls._downsample_stages(resolution)
+        
+        return await collection.aggregate(pipeline).to_list(length=None)
+    
+    @classmethod
+    async def get_price_series_batch(
+        cls,
+        offer_ids: List[str],
+        days: int = 30,
+        resolution: str = "daily"
+    ) -> Dict[str, Dict[str, list]]:
+        """
+        Retorna as séries de várias ofertas em uma única agregação, em formato
+        compacto: {offer_id: {"t": [epoch ms...], "p": [preço...]}} em ordem cronológica
+        """
+        from datetime import timedelta
+        
+        start_date = datetime.utcnow() - timedelta(days=days)
+        collection, pipeline = cls._points_pipeline(offer_ids, start_date)
+        pipeline += cls._downsample_stages(resolution)
+        pipeline += [
+            {"$sort": {"offer_id": 1, "timestamp": 1}},
+            {"$group": {
+                "_id": "$offer_id",
+                "t": {"$push": {"$toLong": "$timestamp"}},
+                "p": {"$push": "$price_discounted"}
+            }}
+        ]
+        
+        rows = await collection.aggregate(pipeline, allowDiskUse=True).to_list(length=None)
+        return {row["_id"]: {"t": row["t"], "p": row["p"]} for row in rows}
+    
     @classmethod
     async def get_price_history(cls, offer_id: str, days: int = 30):
         """Retorna histórico de preços de uma oferta nos últimos N dias"""
@@ -39,36 +238,41 @@ class PriceHistory(Document):
         return history
     
     @classmethod
-    async def get_lowest_price(cls, offer_id: str):
-        """Retorna o menor preço registrado de uma oferta"""
-        history = await cls.find(
-            cls.offer_id == offer_id,
-            cls.price_discounted != None
-        ).sort("price_discounted").first_or_none()
+    async def get_lowest_price(cls, offer_id: str) -> Optional[Dict[str, Any]]:
+        """Retorna o menor preço registrado de uma oferta (lido do resumo em O(1))"""
+        from app.models.price_summary import PriceSummary
         
-        return history
+        summary = await PriceSummary.get_for_offer(offer_id)
+        if not summary or summary.min_price is None:
+            return None
+        
+        return {
+            "price_discounted": summary.min_price,
+            "timestamp": summary.min_price_at,
+            "discount": summary.min_price_discount
+        }
     
     @classmethod
     async def get_price_variation(cls, offer_id: str):
-        """Calcula a variação de preço (%) em relação ao histórico"""
-        history = await cls.find(
-            cls.offer_id == offer_id
-        ).sort("-timestamp").to_list()
+        """Calcula a variação de preço (%) entre o primeiro e o último registro (lido do resumo em O(1))"""
+        from app.models.price_summary import PriceSummary
         
-        if len(history) < 2:
-            return None
+        summary = await PriceSummary.get_for_offer(offer_id)
         
-        latest = history[0]
-        oldest = history[-1]
+        if not summary or summary.samples < 2:
+            return None
         
-        if not latest.price_discounted or not oldest.price_discounted:
+        if not summary.last_price or not summary.first_price:
             return None
         
-        variation = ((latest.price_discounted - oldest.price_discounted) / oldest.price_discounted) * 100
+        variation = ((summary.last_price - summary.first_price) / summary.first_price) * 100
         
         return {
-            "current_price": latest.price_discounted,
-            "initial_price": oldest.price_discounted,
+            "current_price": summary.last_price,
+            "initial_price": summary.first_price,
             "variation_percent": round(variation, 2),
-            "trend": "up" if variation > 0 else "down" if variation < 0 else "stable"
+            "trend": "up" if variation > 0 else "down" if variation < 0 else "stable",
+            "lowest_price": summary.min_price,
+            "highest_price": summary.max_price,
+            "last_change_at": summary.last_change_at
         }
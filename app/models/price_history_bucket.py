@@ -0,0 +1,74 @@
+"""
+Modelo de histórico de preços em buckets (bucket pattern)
+"""
+from beanie import Document
+from datetime import datetime
+from typing import List, Optional, Dict, Any
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING
+
+class PriceHistoryBucket(Document):
+    """Agrupa as observações de preço de uma oferta em um documento por dia"""
+
+    offer_id: str  # ID da oferta
+    day: datetime  # Início do dia (UTC) coberto pelo bucket
+    prices: List[Dict[str, Any]] = Field(
+        default_factory=list,
+        description="Observações do dia: {t, price_discounted, price_original, discount, source}"
+    )
+    samples: int = 0  # Número de observações no bucket
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    last_price: Optional[float] = None
+    last_timestamp: Optional[datetime] = None
+    currency: str = "BRL"
+
+    class Settings:
+        name = "price_history_buckets"
+        indexes = [
+            IndexModel(
+                [("offer_id", ASCENDING), ("day", ASCENDING)],
+                name="unique_offer_day",
+                unique=True
+            ),
+        ]
+
+    @classmethod
+    async def add_observation(
+        cls,
+        offer_id: str,
+        timestamp: datetime,
+        price_original: Optional[float],
+        price_discounted: Optional[float],
+        discount: Optional[str] = None,
+        currency: str = "BRL",
+        source: str = ""
+    ):
+        """Adiciona uma observação ao bucket do dia (upsert atômico)"""
+        day = datetime(timestamp.year, timestamp.month, timestamp.day)
+
+        update: Dict[str, Any] = {
+            "$push": {
+                "prices": {
+                    "t": timestamp,
+                    "price_discounted": price_discounted,
+                    "price_original": price_original,
+                    "discount": discount,
+                    "source": source
+                }
+            },
+            "$inc": {"samples": 1},
+            "$set": {"last_timestamp": timestamp, "currency": currency}
+        }
+
+        # $min/$max com null sobrescreveriam os valores (null < número no MongoDB)
+        if price_discounted is not None:
+            update["$min"] = {"min_price": price_discounted}
+            update["$max"] = {"max_price": price_discounted}
+            update["$set"]["last_price"] = price_discounted
+
+        await cls.get_pymongo_collection().update_one(
+            {"offer_id": offer_id, "day": day},
+            update,
+            upsert=True
+        )
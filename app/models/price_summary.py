@@ -0,0 +1,145 @@
+"""
+Modelo de resumo de preços por oferta
+"""
+from beanie import Document, Indexed
+from datetime import datetime
+from typing import Optional, List, Dict, Any
+from pydantic import Field
+
+class PriceSummary(Document):
+    """
+    Resumo mantido incrementalmente do histórico de preços de uma oferta
+    (primeiro, último, mínimo, máximo, contagem e última mudança).
+    Considera apenas observações com price_discounted preenchido.
+    """
+
+    offer_id: Indexed(str, unique=True)
+    samples: int = 0
+    currency: str = "BRL"
+    first_price: Optional[float] = None
+    first_timestamp: Optional[datetime] = None
+    last_price: Optional[float] = None
+    last_timestamp: Optional[datetime] = None
+    min_price: Optional[float] = None
+    min_price_at: Optional[datetime] = None
+    min_price_discount: Optional[str] = None
+    max_price: Optional[float] = None
+    max_price_at: Optional[datetime] = None
+    last_change_at: Optional[datetime] = Field(None, description="Quando o preço mudou pela última vez")
+    last_change_from: Optional[float] = Field(None, description="Preço anterior à última mudança")
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    class Settings:
+        name = "price_summaries"
+
+    @classmethod
+    async def apply_observation(
+        cls,
+        offer_id: str,
+        price: float,
+        timestamp: datetime,
+        discount: Optional[str] = None,
+        currency: str = "BRL"
+    ):
+        """
+        Atualiza o resumo com uma nova observação em uma única operação atômica
+        (update com pipeline: todas as expressões leem o estado anterior)
+        """
+        price = {"$literal": price}
+        timestamp = {"$literal": timestamp}
+        is_new_min = {"$or": [{"$eq": [{"$ifNull": ["$min_price", None]}, None]}, {"$lt": [price, "$min_price"]}]}
+        is_new_max = {"$or": [{"$eq": [{"$ifNull": ["$max_price", None]}, None]}, {"$gt": [price, "$max_price"]}]}
+        is_change = {"$and": [
+            {"$ne": [{"$ifNull": ["$last_price", None]}, None]},
+            {"$ne": ["$last_price", price]}
+        ]}
+
+        pipeline = [{
+            "$set": {
+                "samples": {"$add": [{"$ifNull": ["$samples", 0]}, 1]},
+                "currency": currency,
+                "first_price": {"$ifNull": ["$first_price", price]},
+                "first_timestamp": {"$ifNull": ["$first_timestamp", timestamp]},
+                "last_price": price,
+                "last_timestamp": timestamp,
+                "min_price": {"$cond": [is_new_min, price, "$min_price"]},
+                "min_price_at": {"$cond": [is_new_min, timestamp, "$min_price_at"]},
+                "min_price_discount": {"$cond": [is_new_min, {"$literal": discount}, "$min_price_discount"]},
+                "max_price": {"$cond": [is_new_max, price, "$max_price"]},
+                "max_price_at": {"$cond": [is_new_max, timestamp, "$max_price_at"]},
+                "last_change_at": {"$cond": [is_change, timestamp, {"$ifNull": ["$last_change_at", None]}]},
+                "last_change_from": {"$cond": [is_change, "$last_price", {"$ifNull": ["$last_change_from", None]}]},
+                "updated_at": "$$NOW"
+            }
+        }]
+
+        await cls.get_pymongo_collection().update_one({"offer_id": offer_id}, pipeline, upsert=True)
+
+    @classmethod
+    async def rebuild(cls, offer_ids: List[str]) -> int:
+        """
+        Recalcula os resumos a partir do histórico completo (backfill e correção de divergências).
+        Retorna o número de resumos gravados.
+        """
+        from app.models.price_history import PriceHistory
+
+        collection, pipeline = PriceHistory._points_pipeline(offer_ids, datetime(1970, 1, 1))
+        pipeline += [
+            {"$match": {"price_discounted": {"$ne": None}}},
+            {"$setWindowFields": {
+                "partitionBy": "$offer_id",
+                "sortBy": {"timestamp": 1},
+                "output": {"prev_price": {"$shift": {"output": "$price_discounted", "by": -1}}}
+            }},
+            {"$sort": {"offer_id": 1, "timestamp": 1}},
+            {"$group": {
+                "_id": "$offer_id",
+                "samples": {"$sum": 1},
+                "currency": {"$last": "$currency"},
+                "first_price": {"$first": "$price_discounted"},
+                "first_timestamp": {"$first": "$timestamp"},
+                "last_price": {"$last": "$price_discounted"},
+                "last_timestamp": {"$last": "$timestamp"},
+                # Comparação de documentos: menor preço e, no empate, o registro mais antigo
+                "min": {"$min": {"price": "$price_discounted", "at": "$timestamp", "discount": "$discount"}},
+                "max": {"$max": {"price": "$price_discounted", "at": "$timestamp"}},
+                "changes": {"$push": {"$cond": [
+                    {"$and": [{"$ne": ["$prev_price", None]}, {"$ne": ["$prev_price", "$price_discounted"]}]},
+                    {"at": "$timestamp", "from": "$prev_price"},
+                    "$$REMOVE"
+                ]}}
+            }}
+        ]
+
+        rows = await collection.aggregate(pipeline, allowDiskUse=True).to_list(length=None)
+
+        for row in rows:
+            last_change = row["changes"][-1] if row["changes"] else {}
+            summary: Dict[str, Any] = {
+                "offer_id": row["_id"],
+                "samples": row["samples"],
+                "currency": row.get("currency") or "BRL",
+                "first_price": row["first_price"],
+                "first_timestamp": row["first_timestamp"],
+                "last_price": row["last_price"],
+                "last_timestamp": row["last_timestamp"],
+                "min_price": row["min"]["price"],
+                "min_price_at": row["min"]["at"],
+                "min_price_discount": row["min"].get("discount"),
+                "max_price": row["max"]["price"],
+                "max_price_at": row["max"]["at"],
+                "last_change_at": last_change.get("at"),
+                "last_change_from": last_change.get("from"),
+                "updated_at": datetime.utcnow()
+            }
+            await cls.get_pymongo_collection().replace_one({"offer_id": row["_id"]}, summary, upsert=True)
+
+        return len(rows)
+
+    @classmethod
+    async def get_for_offer(cls, offer_id: str) -> Optional["PriceSummary"]:
+        """Busca o resumo da oferta, reconstruindo a partir do histórico se ainda não existir"""
+        summary = await cls.find_one({"offer_id": offer_id})
+        if summary is None and await cls.rebuild([offer_id]):
+            summary = await cls.find_one({"offer_id": offer_id})
+        return summary
@@ -2,7 +2,7 @@ from beanie import Document, Indexed
 from datetime import datetime
 from typing import Optional
 from pydantic import EmailStr, Field
-import bcrypt
+from app.core import passwords
 
 class User(Document):
     name: str = Field(..., min_length=3, max_length=100)
@@ -20,13 +20,13 @@ class User(Document):
         name = "users"
     
     @staticmethod
-    def hash_password(password: str) -> str:
-        """Gera hash da senha"""
-        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    async def hash_password(password: str) -> str:
+        """Gera hash da senha (pool de threads do bcrypt, fora do event loop)"""
+        return await passwords.hash_password(password)
     
-    def verify_password(self, password: str) -> bool:
-        """Verifica se a senha está correta"""
-        return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
+    async def verify_password(self, password: str) -> bool:
+        """Verifica se a senha está correta (pool de threads do bcrypt, fora do event loop)"""
+        return await passwords.verify_password(password, self.password_hash)
     
     @classmethod
     async def get_by_email(cls, email: str) -> Optional["User"]:
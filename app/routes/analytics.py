@@ -1,17 +1,36 @@
 """
 Rotas de Analytics - Rastreamento de cliques e visualizações
 """
-from fastapi import APIRouter, HTTPException, Request
+import asyncio
+import os
+from fastapi import APIRouter, HTTPException, Request, Depends, Query
+from fastapi.responses import StreamingResponse
 from app.models.offer_click import OfferClick
 from app.models.page_view import PageView
 from app.models.offer import Offer
+from app.core.cache import get_cached, set_cached
+from app.core.rate_limit import client_ip, limiter, RATE_LIMIT_ANALYTICS
+from app.core.security import require_moderator
+from app.services import analytics_export
+from app.services.click_filter import click_filter
 from beanie import PydanticObjectId
 from datetime import datetime, timedelta
 from typing import Optional
 
 router = APIRouter(prefix="/analytics", tags=["Analytics"])
 
+# TTL curto para os resultados agregados do dashboard
+ANALYTICS_CACHE_TTL = int(os.getenv("ANALYTICS_CACHE_TTL", "60"))
 
+
+def _facet_count(facets: dict, name: str) -> int:
+    """Extrai o resultado de um estágio $count dentro de um $facet"""
+    items = facets.get(name) or []
+    return items[0]["count"] if items else 0
+
+
+# Beacons do frontend (click/pageview) ficam fora do rate limit: vários visitantes
+# atrás do mesmo NAT dividiriam o limite e eventos legítimos seriam perdidos
 @router.post("/click")
 async def track_offer_click(data: dict, request: Request):
     """
@@ -20,12 +39,24 @@ async def track_offer_click(data: dict, request: Request):
     Body:
     - offer_id: ID da oferta
     - source: origem do clique (home, ofertas, dashboard, etc) - opcional
+    
+    Cliques de bots e repetições de (ip, user_agent, oferta) dentro da janela
+    de deduplicação são ignorados e não incrementam total_clicks.
     """
     try:
         offer_id = data.get("offer_id")
         if not offer_id:
             raise HTTPException(400, "Campo 'offer_id' é obrigatório")
         
+        # IP real do visitante (X-Forwarded-For de proxy confiável), não o do proxy
+        ip_address = client_ip(request)
+        user_agent = request.headers.get("user-agent")
+        
+        # Descartar bots e cliques repetidos antes de tocar no banco
+        suppressed_reason = await click_filter.check(ip_address, user_agent, str(offer_id))
+        if suppressed_reason:
+            return {"status": "ignored", "message": "Click não contabilizado", "reason": suppressed_reason}
+        
         # Verificar se oferta existe
         offer = await Offer.get(offer_id)
         if not offer:
@@ -35,16 +66,14 @@ async def track_offer_click(data: dict, request: Request):
         click = OfferClick(
             offer_id=str(offer_id),
             source=data.get("source", "web"),
-            ip_address=request.client.host if request.client else None,
-            user_agent=request.headers.get("user-agent"),
+            ip_address=ip_address,
+            user_agent=user_agent,
             clicked_at=datetime.utcnow()
         )
-        await click.save()
+        await click.insert()
         
-        # Incrementar contador na oferta
-        offer.total_clicks += 1
-        offer.updated_at = datetime.utcnow()
-        await offer.save()
+        # Incrementar contador na oferta (atômico, sem regravar o documento)
+        await offer.update({"$inc": {"total_clicks": 1}, "$set": {"updated_at": datetime.utcnow()}})
         
         return {"status": "success", "message": "Click registrado"}
     
@@ -54,6 +83,15 @@ async def track_offer_click(data: dict, request: Request):
         raise HTTPException(500, f"Erro ao registrar click: {str(e)}")
 
 
+@router.get("/click/filter-stats")
+@limiter.limit(RATE_LIMIT_ANALYTICS)
+async def get_click_filter_stats(request: Request, moderator = Depends(require_moderator)):
+    """
+    Retorna quantos cliques foram descartados pelo filtro de ingestão (bots e duplicados)
+    """
+    return await click_filter.get_stats()
+
+
 @router.post("/pageview")
 async def track_page_view(data: dict, request: Request):
     """
@@ -70,11 +108,11 @@ async def track_page_view(data: dict, request: Request):
         # Criar registro de visualização
         pageview = PageView(
             page=page,
-            ip_address=request.client.host if request.client else None,
+            ip_address=client_ip(request),
             user_agent=request.headers.get("user-agent"),
             viewed_at=datetime.utcnow()
         )
-        await pageview.save()
+        await pageview.insert()
         
         return {"status": "success"}
     
@@ -85,7 +123,8 @@ async def track_page_view(data: dict, request: Request):
 
 
 @router.get("/offer/{offer_id}")
-async def get_offer_metrics(offer_id: str):
+@limiter.limit(RATE_LIMIT_ANALYTICS)
+async def get_offer_metrics(request: Request, offer_id: str):
     """
     Obtém métricas de uma oferta específica
     
@@ -97,57 +136,56 @@ async def get_offer_metrics(offer_id: str):
     - last_30_days (total de cliques nos últimos 30 dias)
     """
     try:
+        cache_key = f"analytics:offer:{offer_id}"
+        cached = await get_cached(cache_key)
+        if cached:
+            return cached
+        
         # Buscar oferta
         offer = await Offer.get(offer_id)
         if not offer:
             raise HTTPException(404, "Oferta não encontrada")
         
-        # Total de cliques
-        total_clicks = await OfferClick.find({"offer_id": offer_id}).count()
+        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
         
-        # Cliques por fonte
-        pipeline_source = [
+        # Todas as métricas em uma única agregação
+        pipeline = [
             {"$match": {"offer_id": offer_id}},
-            {"$group": {"_id": "$source", "count": {"$sum": 1}}},
-            {"$sort": {"count": -1}}
-        ]
-        clicks_by_source_raw = await OfferClick.get_pymongo_collection().aggregate(pipeline_source).to_list(length=None)
-        clicks_by_source = {item["_id"]: item["count"] for item in clicks_by_source_raw}
-        
-        # Cliques por dia (últimos 30 dias)
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        pipeline_day = [
-            {
-                "$match": {
-                    "offer_id": offer_id,
-                    "clicked_at": {"$gte": thirty_days_ago}
-                }
-            },
             {
-                "$group": {
-                    "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$clicked_at"}},
-                    "clicks": {"$sum": 1}
+                "$facet": {
+                    "total": [{"$count": "count"}],
+                    "by_source": [
+                        {"$group": {"_id": "$source", "count": {"$sum": 1}}},
+                        {"$sort": {"count": -1}}
+                    ],
+                    "by_day": [
+                        {"$match": {"clicked_at": {"$gte": thirty_days_ago}}},
+                        {
+                            "$group": {
+                                "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$clicked_at"}},
+                                "clicks": {"$sum": 1}
+                            }
+                        },
+                        {"$sort": {"_id": 1}}
+                    ]
                 }
-            },
-            {"$sort": {"_id": 1}}
+            }
         ]
-        clicks_by_day_raw = await OfferClick.get_pymongo_collection().aggregate(pipeline_day).to_list(length=None)
-        clicks_by_day = [{"date": item["_id"], "clicks": item["clicks"]} for item in clicks_by_day_raw]
+        result = await OfferClick.get_pymongo_collection().aggregate(pipeline).to_list(length=1)
+        facets = result[0] if result else {}
         
-        # Total últimos 30 dias
-        last_30_days = await OfferClick.find({
-            "offer_id": offer_id,
-            "clicked_at": {"$gte": thirty_days_ago}
-        }).count()
+        clicks_by_day = [{"date": item["_id"], "clicks": item["clicks"]} for item in facets.get("by_day", [])]
         
-        return {
+        response = {
             "offer_id": str(offer.id),
             "offer_title": offer.title,
-            "total_clicks": total_clicks,
-            "clicks_by_source": clicks_by_source,
+            "total_clicks": _facet_count(facets, "total"),
+            "clicks_by_source": {item["_id"]: item["count"] for item in facets.get("by_source", [])},
             "clicks_by_day": clicks_by_day,
-            "last_30_days": last_30_days
+            "last_30_days": sum(item["clicks"] for item in clicks_by_day)
         }
+        await set_cached(cache_key, response, ttl=ANALYTICS_CACHE_TTL)
+        return response
     
     except HTTPException:
         raise
@@ -156,7 +194,8 @@ async def get_offer_metrics(offer_id: str):
 
 
 @router.get("/summary")
-async def get_analytics_summary():
+@limiter.limit(RATE_LIMIT_ANALYTICS)
+async def get_analytics_summary(request: Request):
     """
     Obtém resumo geral de métricas
     
@@ -169,63 +208,125 @@ async def get_analytics_summary():
     - views_last_7_days
     """
     try:
-        seven_days_ago = datetime.utcnow() - timedelta(days=7)
+        cached = await get_cached("analytics:summary")
+        if cached:
+            return cached
         
-        # Total de cliques
-        total_clicks = await OfferClick.find({}).count()
-        
-        # Total de visualizações
-        total_views = await PageView.find({}).count()
+        seven_days_ago = datetime.utcnow() - timedelta(days=7)
         
-        # Ofertas mais clicadas (top 10)
-        pipeline_most_clicked = [
-            {"$group": {"_id": "$offer_id", "clicks": {"$sum": 1}}},
-            {"$sort": {"clicks": -1}},
-            {"$limit": 10}
+        # Cliques: total, top 10 (com título via $lookup) e últimos 7 dias
+        clicks_pipeline = [
+            {
+                "$facet": {
+                    "total": [{"$count": "count"}],
+                    "last_7_days": [
+                        {"$match": {"clicked_at": {"$gte": seven_days_ago}}},
+                        {"$count": "count"}
+                    ],
+                    "most_clicked": [
+                        {"$group": {"_id": "$offer_id", "clicks": {"$sum": 1}}},
+                        {"$sort": {"clicks": -1}},
+                        {"$limit": 10},
+                        {
+                            "$lookup": {
+                                "from": "offers",
+                                "let": {
+                                    "offer_oid": {
+                                        "$convert": {"input": "$_id", "to": "objectId", "onError": None, "onNull": None}
+                                    }
+                                },
+                                "pipeline": [
+                                    {"$match": {"$expr": {"$eq": ["$_id", "$$offer_oid"]}}},
+                                    {"$project": {"title": 1}}
+                                ],
+                                "as": "offer"
+                            }
+                        },
+                        # Se oferta não existir mais, pular
+                        {"$unwind": "$offer"},
+                        {"$project": {"_id": 0, "offer_id": "$_id", "title": "$offer.title", "clicks": 1}}
+                    ]
+                }
+            }
         ]
-        most_clicked_raw = await OfferClick.get_pymongo_collection().aggregate(pipeline_most_clicked).to_list(length=None)
-        
-        # Enriquecer com dados das ofertas
-        most_clicked_offers = []
-        for item in most_clicked_raw:
-            try:
-                offer = await Offer.get(item["_id"])
-                if offer:
-                    most_clicked_offers.append({
-                        "offer_id": item["_id"],
-                        "title": offer.title,
-                        "clicks": item["clicks"]
-                    })
-            except:
-                # Se oferta não existir mais, pular
-                continue
-        
-        # Páginas mais visualizadas
-        pipeline_pages = [
-            {"$group": {"_id": "$page", "views": {"$sum": 1}}},
-            {"$sort": {"views": -1}}
+        
+        # Visualizações: total, por página e últimos 7 dias
+        views_pipeline = [
+            {
+                "$facet": {
+                    "total": [{"$count": "count"}],
+                    "last_7_days": [
+                        {"$match": {"viewed_at": {"$gte": seven_days_ago}}},
+                        {"$count": "count"}
+                    ],
+                    "by_page": [
+                        {"$group": {"_id": "$page", "views": {"$sum": 1}}},
+                        {"$sort": {"views": -1}}
+                    ]
+                }
+            }
         ]
-        most_viewed_pages_raw = await PageView.get_pymongo_collection().aggregate(pipeline_pages).to_list(length=None)
-        most_viewed_pages = {item["_id"]: item["views"] for item in most_viewed_pages_raw}
-        
-        # Cliques últimos 7 dias
-        clicks_last_7_days = await OfferClick.find({
-            "clicked_at": {"$gte": seven_days_ago}
-        }).count()
-        
-        # Views últimos 7 dias
-        views_last_7_days = await PageView.find({
-            "viewed_at": {"$gte": seven_days_ago}
-        }).count()
-        
-        return {
-            "total_offer_clicks": total_clicks,
-            "total_page_views": total_views,
-            "most_clicked_offers": most_clicked_offers,
-            "most_viewed_pages": most_viewed_pages,
-            "clicks_last_7_days": clicks_last_7_days,
-            "views_last_7_days": views_last_7_days
+        
+        clicks_raw, views_raw = await asyncio.gather(
+            OfferClick.get_pymongo_collection().aggregate(clicks_pipeline).to_list(length=1),
+            PageView.get_pymongo_collection().aggregate(views_pipeline).to_list(length=1)
+        )
+        clicks = clicks_raw[0] if clicks_raw else {}
+        views = views_raw[0] if views_raw else {}
+        
+        response = {
+            "total_offer_clicks": _facet_count(clicks, "total"),
+            "total_page_views": _facet_count(views, "total"),
+            "most_clicked_offers": clicks.get("most_clicked", []),
+            "most_viewed_pages": {item["_id"]: item["views"] for item in views.get("by_page", [])},
+            "clicks_last_7_days": _facet_count(clicks, "last_7_days"),
+            "views_last_7_days": _facet_count(views, "last_7_days")
         }
+        await set_cached("analytics:summary", response, ttl=ANALYTICS_CACHE_TTL)
+        return response
     
     except Exception as e:
         raise HTTPException(500, f"Erro ao buscar resumo de analytics: {str(e)}")
+
+
+@router.get("/export")
+@limiter.limit(RATE_LIMIT_ANALYTICS)
+async def export_events(
+    request: Request,
+    dataset: str = Query("clicks", pattern="^(clicks|pageviews)$", description="clicks | pageviews"),
+    format: str = Query("ndjson", pattern="^(ndjson|csv|parquet)$", description="ndjson | csv | parquet"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    offer_id: Optional[str] = None,
+    source: Optional[str] = None,
+    page: Optional[str] = None,
+    moderator = Depends(require_moderator)
+):
+    """
+    Exporta eventos brutos em streaming (requer moderador)
+    
+    Query:
+    - dataset: clicks (offer_clicks) ou pageviews (page_views)
+    - format: ndjson, csv ou parquet (parquet requer pyarrow)
+    - start / end: intervalo de datas (ISO 8601, end exclusivo)
+    - offer_id, source: filtros de cliques
+    - page: filtro de visualizações
+    
+    Os dados são lidos do cursor em lotes, sem carregar o resultado inteiro em memória.
+    """
+    if format == "parquet" and not analytics_export.is_parquet_available():
+        raise HTTPException(400, "Exportação Parquet indisponível: pyarrow não instalado")
+    
+    if start and end and start >= end:
+        raise HTTPException(400, "'start' deve ser anterior a 'end'")
+    
+    query = analytics_export.build_export_query(
+        dataset, start=start, end=end, offer_id=offer_id, source=source, page=page
+    )
+    
+    filename = f"{dataset}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{format}"
+    return StreamingResponse(
+        analytics_export.stream_export(dataset, format, query),
+        media_type=analytics_export.EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
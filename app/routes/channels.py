@@ -316,3 +316,20 @@ async def update_channel_stats(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erro ao atualizar estatísticas: {str(e)}"
         )
+
+# 🔟 Reconciliar estatísticas dos canais com os posts (requer admin)
+@router.post("/stats/reconcile")
+async def reconcile_channel_stats(admin = Depends(require_admin)):
+    """Recalcula total_posts, total_attempts e success_rate a partir dos posts"""
+    try:
+        corrected = await Channel.reconcile_statistics()
+        return {
+            "status": "success",
+            "message": "Estatísticas reconciliadas com sucesso",
+            "corrected": corrected
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao reconciliar estatísticas: {str(e)}"
+        )
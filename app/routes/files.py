@@ -337,7 +337,7 @@ async def cleanup_expired(admin = Depends(require_admin)):
         
         logger.info(
             "cleanup_expired_executed",
-            admin_id=admin.get("user_id"),
+            admin_id=str(admin.id),
             deleted=result["deleted"]
         )
         
@@ -362,7 +362,7 @@ async def cleanup_orphans(admin = Depends(require_admin)):
         
         logger.info(
             "cleanup_orphans_executed",
-            admin_id=admin.get("user_id"),
+            admin_id=str(admin.id),
             deleted=result["deleted"]
         )
         
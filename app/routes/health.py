@@ -4,6 +4,8 @@ Rotas de health check e monitoramento
 from fastapi import APIRouter
 from app.core.database import get_db_status
 from app.core.cache import is_redis_available
+from app.core.passwords import get_password_metrics
+from app.services.last_login import last_login_writer
 from datetime import datetime
 import sys
 
@@ -46,7 +48,9 @@ async def detailed_health_check():
         "python_version": f"{sys.version_info.major}.{sys.version_info.minor}.{sys.version_info.micro}",
         "services": {
             "mongodb": db_status,
-            "redis": redis_status
+            "redis": redis_status,
+            "password_hashing": get_password_metrics(),
+            "last_login_writer": last_login_writer.get_stats()
         },
         "features": {
             "jwt_auth": True,
@@ -1,17 +1,23 @@
-from fastapi import APIRouter, HTTPException, Depends
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends, Request
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime
 from beanie import PydanticObjectId
 from tenacity import retry, stop_after_attempt, wait_exponential
 from app.services.offer_extractor.factory import get_extractor
+from app.services.offer_extractor.prices import convert_price_to_float
 from app.models.offer import Offer
-from app.models.post import Post
+from app.models.post import Post, OFFER_DISPLAY_FIELDS
 from app.models.price_history import PriceHistory
 from app.core.cache import get_cached, set_cached
 from app.core.security import get_current_user, require_admin, require_moderator
 from app.core.logging import get_logger
-from app.services.ai_categorization import categorize_offer, categorize_by_keywords, generate_tags, generate_tags_by_keywords
+from app.core.rate_limit import limiter, RATE_LIMIT_EXTRACT
+from app.services.price_events import publish_price_change
+from app.services.ai_categorization import classify_offer, generate_tags, generate_tags_by_keywords
+from app.services.ai_cache import ai_cache
+from app.services.tag_backfill import start_tag_backfill, get_job as get_tag_backfill_job, cancel_job as cancel_tag_backfill
 import hashlib
 
 router = APIRouter(prefix="/offers", tags=["Offers"])
@@ -21,40 +27,6 @@ logger = get_logger(__name__)
 
 CHANNELS_DEFAULT = ["telegram", "whatsapp", "site", "instagram"]
 
-def convert_price_to_float(price_str: str) -> float:
-    """
-    Converte string de preço para float, tratando formatos brasileiros.
-    Exemplos:
-    - "5.950" -> 5950.0
-    - "3.254,99" -> 3254.99
-    - "1.000" -> 1000.0
-    - "10,50" -> 10.5
-    """
-    if not price_str:
-        return None
-    
-    try:
-        # Remove espaços
-        price_str = price_str.strip()
-        
-        # Se tem vírgula, é separador decimal (ex: 3.254,99)
-        if "," in price_str:
-            price_str = price_str.replace(".", "").replace(",", ".")
-        # Se tem apenas ponto, pode ser milhar (5.950) ou decimal (10.5)
-        elif "." in price_str:
-            # Contar quantos dígitos após o último ponto
-            parts = price_str.split(".")
-            last_part = parts[-1]
-            
-            # Se tem 3 dígitos após o ponto, é separador de milhar
-            if len(last_part) == 3 and len(parts) > 1:
-                price_str = price_str.replace(".", "")
-            # Caso contrário, é separador decimal
-        
-        return float(price_str)
-    except:
-        return None
-
 class ExtractRequest(BaseModel):
     url: str
 
@@ -100,7 +72,8 @@ async def extract_with_retry(url: str):
 
 
 @router.post("/extract")
-async def extract_offer(data: ExtractRequest, current_user = Depends(get_current_user)):
+@limiter.limit(RATE_LIMIT_EXTRACT)
+async def extract_offer(request: Request, data: ExtractRequest, current_user = Depends(get_current_user)):
     """Extrai informações de uma URL (requer autenticação)"""
     url = data.url
     if not url:
@@ -135,7 +108,8 @@ async def extract_offer(data: ExtractRequest, current_user = Depends(get_current
 
 # 1.5️⃣ Extrair e salvar oferta automaticamente (com validação de duplicata)
 @router.post("/extract-and-save")
-async def extract_and_save_offer(data: ExtractRequest):
+@limiter.limit(RATE_LIMIT_EXTRACT)
+async def extract_and_save_offer(request: Request, data: ExtractRequest):
     url = data.url
     if not url:
         raise HTTPException(400, "Campo 'url' é obrigatório.")
@@ -165,22 +139,12 @@ async def extract_and_save_offer(data: ExtractRequest):
                     "existing_offer": existing_offer
                 }
         
-        # Categorização automática com IA
-        category = "Outros"
-        tags = []
-        try:
-            category = await categorize_offer(title, description)
-            logger.info("offer_categorized", category=category, method="ai")
-            
-            # Gerar tags com IA
-            tags = await generate_tags(title, description, category)
-            logger.info("tags_generated", tags=tags, method="ai")
-        except Exception as e:
-            # Fallback para categorização por keywords
-            category = categorize_by_keywords(title)
-            tags = generate_tags_by_keywords(title)
-            logger.info("offer_categorized", category=category, method="keywords")
-            logger.info("tags_generated", tags=tags, method="keywords")
+        # Categorização e tags (IA com orçamento de latência e fallback por keywords)
+        classification = await classify_offer(title, description)
+        category = classification["category"]
+        tags = classification["tags"]
+        logger.info("offer_categorized", category=category, method=classification["category_method"])
+        logger.info("tags_generated", tags=tags, method=classification["tags_method"])
         
         # Criar oferta
         original_price_str = extracted_data.get("original_price", "")
@@ -210,28 +174,20 @@ async def extract_and_save_offer(data: ExtractRequest):
         await offer.insert()
         logger.info("offer_created", offer_id=str(offer.id), category=category, images_count=len(extracted_data.get("images", [])))
         
-        # Registrar no histórico de preços
-        price_history = PriceHistory(
-            offer_id=str(offer.id),
-            price_original=original_price,
-            price_discounted=price,
-            discount=extracted_data.get("discount", ""),
-            currency="BRL",
-            source="scraping"
+        # Histórico de preços e posts dependem apenas do ID da oferta: gravar concorrentemente
+        await asyncio.gather(
+            PriceHistory.record(
+                offer_id=str(offer.id),
+                price_original=original_price,
+                price_discounted=price,
+                discount=extracted_data.get("discount", ""),
+                currency="BRL",
+                source="scraping"
+            ),
+            Post.create_for_offer(offer, CHANNELS_DEFAULT)
         )
-        await price_history.insert()
         logger.info("price_history_recorded", offer_id=str(offer.id))
         
-        # Criar posts para cada canal
-        for channel in CHANNELS_DEFAULT:
-            post = Post(
-                offer_id=str(offer.id),
-                channel=channel,
-                status="pending",
-                enviado=False
-            )
-            await post.insert()
-        
         return {
             "status": "success",
             "message": "Oferta extraída e salva com sucesso",
@@ -291,14 +247,7 @@ async def create_offer(data: OfferCreate, moderator = Depends(require_moderator)
         await offer.insert()
         
         # Criar posts para cada canal
-        for channel in CHANNELS_DEFAULT:
-            post = Post(
-                offer_id=str(offer.id),
-                channel=channel,
-                status="pending",
-                enviado=False
-            )
-            await post.insert()
+        await Post.create_for_offer(offer, CHANNELS_DEFAULT)
 
         return {"status": "success", "id": str(offer.id), "data": offer}
     except Exception as e:
@@ -333,44 +282,43 @@ async def list_offers(
         raise HTTPException(500, f"Erro ao listar ofertas: {e}")
 
 
+# 3.0️⃣ Métricas do cache de respostas da IA (deve vir antes de /{offer_id})
+@router.get("/ai/cache-stats")
+async def ai_cache_stats(moderator = Depends(require_moderator)):
+    """Taxa de acerto do cache de categorização/tags por título normalizado"""
+    return await ai_cache.get_stats()
+
+
 # 3.1️⃣ Atualizar tags de todas as ofertas em lote (deve vir antes de /{offer_id})
-@router.post("/batch/generate-tags")
+@router.post("/batch/generate-tags", status_code=202)
 async def batch_generate_tags(admin = Depends(require_admin)):
-    """Gera tags para todas as ofertas que não possuem tags"""
+    """
+    Inicia em segundo plano a geração de tags para todas as ofertas sem tags.
+    Retorna o job (ou o já em execução); o progresso é consultado em
+    GET /offers/batch/generate-tags/{job_id}
+    """
     try:
-        # Buscar ofertas sem tags ou com tags vazias
-        offers = await Offer.find({"$or": [{"tags": []}, {"tags": None}]}).to_list()
-        
-        updated_count = 0
-        errors = []
-        
-        for offer in offers:
-            try:
-                # Gerar tags
-                tags = await generate_tags(offer.title, offer.description, offer.category)
-                
-                # Atualizar oferta
-                offer.tags = tags
-                offer.updated_at = datetime.utcnow()
-                await offer.save()
-                
-                updated_count += 1
-                logger.info("batch_tags_generated", offer_id=str(offer.id), tags=tags)
-                
-            except Exception as e:
-                errors.append({"offer_id": str(offer.id), "error": str(e)})
-                logger.error("batch_tags_generation_failed", offer_id=str(offer.id), error=str(e))
-        
-        return {
-            "status": "completed",
-            "total_offers": len(offers),
-            "updated": updated_count,
-            "errors": len(errors),
-            "error_details": errors[:10]  # Primeiros 10 erros
-        }
+        return await start_tag_backfill()
     except Exception as e:
         logger.error("batch_tags_generation_error", error=str(e))
-        raise HTTPException(500, f"Erro no processamento em lote: {e}")
+        raise HTTPException(500, f"Erro ao iniciar processamento em lote: {e}")
+
+
+@router.get("/batch/generate-tags/{job_id}")
+async def batch_generate_tags_status(job_id: str, admin = Depends(require_admin)):
+    """Progresso do job de geração de tags (processadas, atualizadas, erros, taxa e ETA)"""
+    job = await get_tag_backfill_job(job_id)
+    if not job:
+        raise HTTPException(404, "Job não encontrado")
+    return job
+
+
+@router.delete("/batch/generate-tags/{job_id}")
+async def batch_generate_tags_cancel(job_id: str, admin = Depends(require_admin)):
+    """Cancela o job (as tags já geradas são gravadas)"""
+    if not cancel_tag_backfill(job_id):
+        raise HTTPException(404, "Job não encontrado ou já finalizado neste worker")
+    return {"status": "cancelling", "job_id": job_id}
 
 
 # 4️⃣ Buscar oferta específica por ID
@@ -409,10 +357,18 @@ async def update_offer(
         
         await offer.save()
         
+        # Manter dados desnormalizados dos posts em sincronia
+        changed_display_fields = {
+            post_field: getattr(offer, offer_field)
+            for post_field, offer_field in OFFER_DISPLAY_FIELDS.items()
+            if offer_field in update_data
+        }
+        await Post.sync_offer_fields(str(offer.id), changed_display_fields)
+        
         # Se preço mudou, registrar no histórico
         if (data.price_original and data.price_original != old_price_original) or \
            (data.price_discounted and data.price_discounted != old_price_discounted):
-            price_history = PriceHistory(
+            await PriceHistory.record(
                 offer_id=str(offer.id),
                 price_original=offer.price_original,
                 price_discounted=offer.price_discounted,
@@ -420,7 +376,7 @@ async def update_offer(
                 currency=offer.currency,
                 source="manual_update"
             )
-            await price_history.insert()
+            await publish_price_change(str(offer.id), old_price_discounted, offer.price_discounted, source="manual_update")
             logger.info("price_history_updated", offer_id=str(offer.id))
         
         return {"status": "updated", "data": offer}
@@ -439,10 +395,8 @@ async def delete_offer(offer_id: PydanticObjectId, admin = Depends(require_admin
         
         # Remover posts associados
         try:
-            posts = await Post.find({"offer_id": str(offer_id)}).to_list()
-            for p in posts:
-                await p.delete()
-            logger.info("posts_deleted", offer_id=str(offer_id), count=len(posts))
+            deleted_ids = await Post.delete_for_offer(str(offer_id))
+            logger.info("posts_deleted", offer_id=str(offer_id), count=len(deleted_ids))
         except Exception as e:
             logger.warning("posts_deletion_partial_failure", error=str(e))
 
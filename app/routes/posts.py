@@ -1,104 +1,108 @@
-from fastapi import APIRouter, HTTPException, Depends
-from app.models.post import Post
+import base64
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from app.models.post import Post, OFFER_DISPLAY_FIELDS
+from app.models.channel import Channel
 from beanie import PydanticObjectId
+from bson import ObjectId
 from datetime import datetime
 from typing import Optional
-from app.core.security import require_moderator
+from pymongo import DESCENDING, ReturnDocument, UpdateMany
+from app.core.security import require_moderator, require_admin
+from app.services.channel_dispatch import dispatcher
 
 router = APIRouter(prefix="/posts", tags=["Posts"])
 
 
-async def update_channel_statistics(channel_name: str):
+def encode_cursor(post: dict) -> str:
+    """Cursor opaco com a posição (created_at, _id) do último post da página"""
+    raw = f"{post['created_at'].isoformat()}|{post['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        created_at, post_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), ObjectId(post_id)
+    except Exception:
+        raise HTTPException(400, "Cursor inválido")
+
+
+async def fill_missing_offer_fields(posts: list):
     """
-    Atualiza as estatísticas de um canal (total_posts e success_rate)
+    Preenche (e persiste) os campos da oferta em posts antigos criados antes
+    da desnormalização, com uma única consulta por página
     """
-    from app.models.channel import Channel
+    from app.models.offer import Offer
     
-    channel = await Channel.find_one({"name": channel_name})
-    if not channel:
+    missing = {p["offer_id"] for p in posts if "offer_title" not in p and ObjectId.is_valid(p["offer_id"])}
+    if not missing:
         return
     
-    # Contar total de posts com status="success"
-    success_count = await Post.find({"channel": channel_name, "status": "success"}).count()
-    
-    # Contar total de posts (tentativas)
-    total_attempts = await Post.find({"channel": channel_name}).count()
+    projection = {field: 1 for field in OFFER_DISPLAY_FIELDS.values()}
+    offers = await Offer.get_pymongo_collection().find(
+        {"_id": {"$in": [ObjectId(offer_id) for offer_id in missing]}}, projection
+    ).to_list(length=None)
     
-    # Calcular success_rate
-    success_rate = (success_count / total_attempts * 100) if total_attempts > 0 else 0.0
+    fields_by_offer = {
+        str(offer["_id"]): {post_field: offer.get(offer_field) for post_field, offer_field in OFFER_DISPLAY_FIELDS.items()}
+        for offer in offers
+    }
+    if not fields_by_offer:
+        return
     
-    # Atualizar canal
-    channel.total_posts = success_count  # Apenas posts com sucesso
-    channel.success_rate = round(success_rate, 2)
-    channel.updated_at = datetime.utcnow()
-    await channel.save()
+    await Post.get_pymongo_collection().bulk_write(
+        [UpdateMany({"offer_id": offer_id}, {"$set": fields}) for offer_id, fields in fields_by_offer.items()],
+        ordered=False
+    )
+    for post in posts:
+        post.update(fields_by_offer.get(post["offer_id"], {}))
+
 
 @router.get("/")
 async def list_posts(
+    response: Response,
     enviado: Optional[bool] = None, 
     status: Optional[str] = None, 
     offer_id: Optional[str] = None,
-    channel: Optional[str] = None
+    channel: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None
 ):
-    from app.models.offer import Offer
-    from pymongo import DESCENDING
+    """
+    Lista posts do mais recente para o mais antigo, com paginação por cursor.
     
-    # Construir match stage para filtros
-    match_stage = {}
+    O cursor da próxima página é retornado no header X-Next-Cursor (ausente na última página).
+    """
+    # Construir filtros
+    query = {}
     if enviado is not None:
-        match_stage["enviado"] = enviado
+        query["enviado"] = enviado
     if status:
-        match_stage["status"] = status
+        query["status"] = status
     if offer_id:
-        match_stage["offer_id"] = offer_id
+        query["offer_id"] = offer_id
     if channel:
-        match_stage["channel"] = channel
+        query["channel"] = channel
+    
+    if cursor:
+        created_at, last_id = decode_cursor(cursor)
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": last_id}}
+        ]
     
-    # Pipeline de agregação com lookup para pegar título da oferta
-    pipeline = []
+    # Buscar uma linha a mais para saber se existe próxima página
+    posts = await Post.get_pymongo_collection().find(query).sort(
+        [("created_at", DESCENDING), ("_id", DESCENDING)]
+    ).limit(limit + 1).to_list(length=None)
     
-    # Adicionar filtros se existirem
-    if match_stage:
-        pipeline.append({"$match": match_stage})
+    has_more = len(posts) > limit
+    posts = posts[:limit]
     
-    # Fazer lookup com a collection de ofertas
-    pipeline.extend([
-        {
-            "$addFields": {
-                "offer_id_obj": {"$toObjectId": "$offer_id"}
-            }
-        },
-        {
-            "$lookup": {
-                "from": "offers",
-                "localField": "offer_id_obj",
-                "foreignField": "_id",
-                "as": "offer_data"
-            }
-        },
-        # Extrair apenas o título da oferta
-        {
-            "$addFields": {
-                "offer_title": {
-                    "$arrayElemAt": ["$offer_data.title", 0]
-                }
-            }
-        },
-        # Remover campos temporários
-        {
-            "$project": {
-                "offer_data": 0,
-                "offer_id_obj": 0
-            }
-        },
-        # Ordenar por data de criação (mais recente primeiro)
-        {
-            "$sort": {"created_at": -1}
-        }
-    ])
+    if has_more:
+        response.headers["X-Next-Cursor"] = encode_cursor(posts[-1])
     
-    # Executar aggregation
-    posts = await Post.get_pymongo_collection().aggregate(pipeline).to_list(length=None)
+    await fill_missing_offer_fields(posts)
     
     # Converter ObjectId para string no resultado
     for post in posts:
@@ -107,48 +111,71 @@ async def list_posts(
     return posts
 
 
+@router.get("/dispatch/status")
+async def dispatch_status(moderator = Depends(require_moderator)):
+    """Métricas do despacho de posts: enviados, falhas, retries e tamanho das filas por canal"""
+    return dispatcher.get_status()
+
+
+@router.post("/dispatch/run")
+async def dispatch_run(admin = Depends(require_admin)):
+    """Reivindica e enfileira imediatamente um lote de posts pendentes (requer admin)"""
+    try:
+        claimed = await dispatcher.poll_once()
+        return {"status": "success", "claimed": claimed}
+    except Exception as e:
+        raise HTTPException(500, f"Erro ao despachar posts: {e}")
+
+
 @router.patch("/{post_id}")
 async def update_post(post_id: PydanticObjectId, data: dict, moderator = Depends(require_moderator)):
     """Atualiza um post existente (requer permissão de moderador)"""
-    post = await Post.get(post_id)
-    if not post:
+    update_data = {**data, "updated_at": datetime.utcnow()}
+    # Atômico: as estatísticas usam o documento realmente substituído, então PATCHes
+    # concorrentes (ou o flush do despacho) não contam a mesma transição duas vezes
+    before = await Post.get_pymongo_collection().find_one_and_update(
+        {"_id": post_id}, {"$set": update_data}, return_document=ReturnDocument.BEFORE
+    )
+    if not before:
         raise HTTPException(404, "Post não encontrado")
 
-    old_status = post.status
-    update_data = {**data, "updated_at": datetime.utcnow()}
-    await post.set(update_data)
-    
+    old_status = before.get("status")
+    old_channel = before.get("channel")
     new_status = data.get("status", old_status)
+    new_channel = data.get("channel", old_channel)
     
     # Auto-aprovar oferta se o canal tiver auto_approve=True e o status for "success"
     if new_status == "success":
-        from app.models.channel import Channel
         from app.models.offer import Offer
         
-        channel = await Channel.find_one({"name": post.channel})
+        channel = await Channel.find_one({"name": new_channel})
         if channel and channel.auto_approve:
             # Buscar e aprovar a oferta
-            offer = await Offer.get(post.offer_id)
+            offer = await Offer.get(before["offer_id"])
             if offer and offer.status != "approved":
                 offer.status = "approved"
                 offer.updated_at = datetime.utcnow()
                 await offer.save()
     
-    # Atualizar estatísticas do canal se o status mudou
-    if old_status != new_status:
-        await update_channel_statistics(post.channel)
+    # Atualizar estatísticas do canal pela transição de status (incremental)
+    if new_channel != old_channel:
+        await Channel.record_post_transition(old_channel, old_status, None)
+        await Channel.record_post_transition(new_channel, None, new_status)
+    elif old_status != new_status:
+        await Channel.record_post_transition(old_channel, old_status, new_status)
     
-    return {"status": "updated", "id": str(post.id)}
+    return {"status": "updated", "id": str(post_id)}
 
 
 @router.delete("/{post_id}")
 async def delete_post(post_id: PydanticObjectId, moderator = Depends(require_moderator)):
     """Remove um post específico por ID (requer permissão de moderador)"""
-    post = await Post.get(post_id)
+    # Apenas quem de fato removeu o documento desconta das estatísticas
+    post = await Post.get_pymongo_collection().find_one_and_delete({"_id": post_id})
     if not post:
         raise HTTPException(404, "Post não encontrado")
 
-    await post.delete()
+    await Channel.record_post_transition(post["channel"], post.get("status"), None)
     return {"status": "deleted", "id": str(post_id)}
 
 
@@ -158,15 +185,9 @@ async def delete_posts_by_offer(offer_id: str, moderator = Depends(require_moder
 
     Recebe `offer_id` como string (id do Mongo/Beanie salvo em `Post.offer_id`).
     """
-    # Buscar posts relacionados
-    posts = await Post.find({"offer_id": offer_id}).to_list()
+    deleted_ids = await Post.delete_for_offer(offer_id)
 
-    if not posts:
+    if not deleted_ids:
         return {"status": "no_content", "message": "Nenhum post encontrado para essa oferta", "offer_id": offer_id}
 
-    deleted_ids = []
-    for p in posts:
-        deleted_ids.append(str(p.id))
-        await p.delete()
-
     return {"status": "deleted", "offer_id": offer_id, "deleted_count": len(deleted_ids), "deleted_ids": deleted_ids}
@@ -1,25 +1,47 @@
 """
 Rotas de histórico de preços
 """
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Header
+from fastapi.responses import StreamingResponse
 from beanie import PydanticObjectId
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import Optional, List
 from app.models.price_history import PriceHistory
 from app.models.offer import Offer
-from app.core.security import get_current_user, require_moderator
+from app.core.security import get_current_user, require_moderator, require_admin
+from app.services.price_analytics import get_offers_price_stats
+from app.services import price_rescrape
+from app.services import price_events
+from app.core.cache import is_redis_available
 
 router = APIRouter(prefix="/price-history", tags=["Price History"])
 
+
+class PriceStatsBatchRequest(BaseModel):
+    offer_ids: List[str] = Field(..., min_length=1, max_length=200)
+
+
+class PriceHistoryBatchRequest(BaseModel):
+    offer_ids: List[str] = Field(..., min_length=1, max_length=200)
+    days: int = Field(default=30, ge=1, le=365)
+    resolution: str = Field(default="daily", pattern="^(raw|hourly|daily|weekly)$")
+
+
 @router.get("/offer/{offer_id}")
 async def get_offer_price_history(
     offer_id: str,
-    days: int = 30
+    days: int = 30,
+    resolution: str = Query("raw", pattern="^(raw|hourly|daily|weekly)$", description="raw | hourly | daily | weekly")
 ):
     """
     Retorna histórico de preços de uma oferta nos últimos N dias
+    
+    Com resolution diferente de raw, os pontos são agregados no servidor por
+    intervalo: price_discounted/price_original são o último valor do intervalo,
+    acompanhados de price_min, price_max, price_avg e samples.
     """
     try:
-        history = await PriceHistory.get_price_history(offer_id, days)
+        history = await PriceHistory.get_price_series(offer_id, days, resolution)
         
         if not history:
             return {
@@ -28,26 +50,43 @@ async def get_offer_price_history(
                 "history": []
             }
         
+        for point in history:
+            point.pop("offer_id", None)
+        
         return {
             "offer_id": offer_id,
             "total_records": len(history),
             "days": days,
-            "history": [
-                {
-                    "price_original": h.price_original,
-                    "price_discounted": h.price_discounted,
-                    "discount": h.discount,
-                    "currency": h.currency,
-                    "timestamp": h.timestamp,
-                    "source": h.source
-                }
-                for h in history
-            ]
+            "resolution": resolution,
+            "history": history
         }
     except Exception as e:
         raise HTTPException(500, f"Erro ao buscar histórico: {e}")
 
 
+@router.post("/batch")
+async def get_price_history_batch(data: PriceHistoryBatchRequest):
+    """
+    Retorna o histórico de preços de várias ofertas (até 200) em uma única consulta,
+    para sparklines. Formato compacto por oferta: t (epoch em ms) e p (preço),
+    em ordem cronológica. Ofertas sem histórico retornam arrays vazios.
+    """
+    try:
+        offer_ids = list(dict.fromkeys(data.offer_ids))
+        series = await PriceHistory.get_price_series_batch(offer_ids, data.days, data.resolution)
+        
+        return {
+            "days": data.days,
+            "resolution": data.resolution,
+            "data": {
+                offer_id: series.get(offer_id, {"t": [], "p": []})
+                for offer_id in offer_ids
+            }
+        }
+    except Exception as e:
+        raise HTTPException(500, f"Erro ao buscar histórico em lote: {e}")
+
+
 @router.get("/offer/{offer_id}/variation")
 async def get_price_variation(offer_id: str):
     """
@@ -86,14 +125,55 @@ async def get_lowest_price(offer_id: str):
         
         return {
             "offer_id": offer_id,
-            "lowest_price": lowest.price_discounted,
-            "recorded_at": lowest.timestamp,
-            "discount": lowest.discount
+            "lowest_price": lowest["price_discounted"],
+            "recorded_at": lowest["timestamp"],
+            "discount": lowest["discount"]
         }
     except Exception as e:
         raise HTTPException(500, f"Erro ao buscar menor preço: {e}")
 
 
+@router.get("/offer/{offer_id}/stats")
+async def get_price_stats(offer_id: str):
+    """
+    Retorna estatísticas de preço de uma oferta: médias móveis (7 e 30 dias),
+    percentil 10 dos últimos 30 dias, volatilidade, queda frente à média de 7 dias
+    e se o preço atual caracteriza uma oferta real (is_deal / deal_score)
+    """
+    try:
+        stats = (await get_offers_price_stats([offer_id]))[offer_id]
+        
+        if not stats:
+            return {
+                "offer_id": offer_id,
+                "message": "Nenhum histórico de preço encontrado"
+            }
+        
+        return {
+            "offer_id": offer_id,
+            **stats
+        }
+    except Exception as e:
+        raise HTTPException(500, f"Erro ao calcular estatísticas de preço: {e}")
+
+
+@router.post("/stats/batch")
+async def get_price_stats_batch(data: PriceStatsBatchRequest):
+    """
+    Retorna estatísticas de preço de várias ofertas (até 200) calculadas em lote
+    """
+    try:
+        stats = await get_offers_price_stats(data.offer_ids)
+        
+        return {
+            "total": len(stats),
+            "deals": [offer_id for offer_id, item in stats.items() if item and item["is_deal"]],
+            "data": stats
+        }
+    except Exception as e:
+        raise HTTPException(500, f"Erro ao calcular estatísticas de preço: {e}")
+
+
 @router.post("/offer/{offer_id}/record")
 async def record_price(
     offer_id: str,
@@ -109,7 +189,7 @@ async def record_price(
             raise HTTPException(404, "Oferta não encontrada")
         
         # Criar registro no histórico
-        price_record = PriceHistory(
+        price_record = await PriceHistory.record(
             offer_id=str(offer.id),
             price_original=offer.price_original,
             price_discounted=offer.price_discounted,
@@ -117,14 +197,69 @@ async def record_price(
             currency=offer.currency,
             source="manual"
         )
-        await price_record.insert()
         
         return {
             "status": "success",
             "message": "Preço registrado no histórico",
-            "record_id": str(price_record.id)
+            "record_id": str(price_record.id) if price_record else None
         }
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(500, f"Erro ao registrar preço: {e}")
+
+
+@router.get("/rescrape/status")
+async def get_rescrape_status(moderator = Depends(require_moderator)):
+    """
+    Retorna as métricas do re-scraping de preços: vazão, atraso (lag) da oferta
+    mais antiga pendente, backlog e resultados da última execução
+    """
+    return {
+        "enabled": price_rescrape.RESCRAPE_ENABLED,
+        "interval_minutes": price_rescrape.RESCRAPE_INTERVAL_MINUTES,
+        "workers": price_rescrape.RESCRAPE_WORKERS,
+        **price_rescrape.metrics
+    }
+
+
+@router.post("/rescrape/run")
+async def trigger_rescrape(admin = Depends(require_admin)):
+    """
+    Dispara uma execução do re-scraping em segundo plano (requer admin)
+    """
+    if not price_rescrape.start_background_run():
+        return {"status": "running", "message": "Re-scraping já está em execução"}
+    
+    return {"status": "started", "message": "Re-scraping iniciado"}
+
+
+@router.get("/stream")
+async def stream_price_changes(
+    request: Request,
+    from_id: Optional[str] = Query(None, description="Retomar após este id ('0' = desde o início)"),
+    min_change_percent: Optional[float] = Query(None, ge=0, description="Variação mínima absoluta (%)"),
+    direction: Optional[str] = Query(None, pattern="^(up|down)$", description="up | down"),
+    offer_id: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None)
+):
+    """
+    Stream SSE de mudanças de preço (offer_id, old_price, new_price, change_percent)
+    
+    Para retomar, envie o header Last-Event-ID (feito automaticamente pelo EventSource)
+    ou o parâmetro from_id com o último id recebido. Sem ambos, recebe apenas eventos novos.
+    """
+    if not await is_redis_available():
+        raise HTTPException(503, "Stream de eventos indisponível (Redis não conectado)")
+    
+    return StreamingResponse(
+        price_events.stream_price_events(
+            last_id=last_event_id or from_id or "$",
+            min_change_percent=min_change_percent,
+            direction=direction,
+            offer_id=offer_id,
+            is_disconnected=request.is_disconnected
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
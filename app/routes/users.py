@@ -1,11 +1,17 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Request
 from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List
 from datetime import datetime, timedelta
 from beanie import PydanticObjectId
 from app.models.user import User
-from app.core.security import create_access_token, get_current_user, require_admin, require_moderator
+from fastapi.security import HTTPAuthorizationCredentials
+from app.core.security import (
+    AuthenticatedUser, create_access_token, get_current_user, invalidate_user_cache, require_admin, require_moderator,
+    revoke_token, revoke_user_tokens, security, verify_token
+)
 from app.core.logging import get_logger
+from app.core.rate_limit import limiter, RATE_LIMIT_LOGIN
+from app.services.last_login import last_login_writer
 
 router = APIRouter(prefix="/users", tags=["Users"])
 logger = get_logger(__name__)
@@ -45,7 +51,7 @@ class LoginRequest(BaseModel):
 
 # 1️⃣ Criar novo usuário (requer admin)
 @router.post("/", status_code=status.HTTP_201_CREATED)
-async def create_user(data: UserCreate, admin: User = Depends(require_admin)):
+async def create_user(data: UserCreate, admin: AuthenticatedUser = Depends(require_admin)):
     """
     Cria um novo usuário no sistema (requer permissão de admin)
     """
@@ -62,7 +68,7 @@ async def create_user(data: UserCreate, admin: User = Depends(require_admin)):
         user = User(
             name=data.name,
             email=data.email,
-            password_hash=User.hash_password(data.password),
+            password_hash=await User.hash_password(data.password),
             role=data.role,
             avatar=data.avatar,
             bio=data.bio,
@@ -107,7 +113,7 @@ async def list_users(
     is_active: Optional[bool] = None,
     limit: int = 50,
     skip: int = 0,
-    current_user: User = Depends(get_current_user)
+    current_user: AuthenticatedUser = Depends(get_current_user)
 ):
     """
     Lista todos os usuários com filtros opcionais (requer autenticação)
@@ -153,7 +159,7 @@ async def list_users(
 
 # 3️⃣ Buscar usuário por ID (requer autenticação)
 @router.get("/{user_id}")
-async def get_user(user_id: PydanticObjectId, current_user: User = Depends(get_current_user)):
+async def get_user(user_id: PydanticObjectId, current_user: AuthenticatedUser = Depends(get_current_user)):
     """
     Busca um usuário específico por ID (usuário pode ver próprio perfil, admin vê todos)
     """
@@ -195,7 +201,7 @@ async def get_user(user_id: PydanticObjectId, current_user: User = Depends(get_c
 
 # 4️⃣ Atualizar usuário (requer autenticação)
 @router.put("/{user_id}")
-async def update_user(user_id: PydanticObjectId, data: UserUpdate, current_user: User = Depends(get_current_user)):
+async def update_user(user_id: PydanticObjectId, data: UserUpdate, current_user: AuthenticatedUser = Depends(get_current_user)):
     """
     Atualiza um usuário existente (usuário pode editar próprio perfil, admin edita todos)
     """
@@ -234,7 +240,7 @@ async def update_user(user_id: PydanticObjectId, data: UserUpdate, current_user:
         
         # Se está atualizando senha, fazer hash
         if "password" in update_data:
-            update_data["password_hash"] = User.hash_password(update_data.pop("password"))
+            update_data["password_hash"] = await User.hash_password(update_data.pop("password"))
         
         update_data["updated_at"] = datetime.utcnow()
         
@@ -242,6 +248,9 @@ async def update_user(user_id: PydanticObjectId, data: UserUpdate, current_user:
             setattr(user, key, value)
         
         await user.save()
+        invalidate_user_cache(user_id)
+        if update_data.get("is_active") is False:
+            await revoke_user_tokens(user_id)
         
         return {
             "status": "success",
@@ -268,7 +277,7 @@ async def update_user(user_id: PydanticObjectId, data: UserUpdate, current_user:
 
 # 5️⃣ Excluir usuário (requer admin)
 @router.delete("/{user_id}")
-async def delete_user(user_id: PydanticObjectId, admin: User = Depends(require_admin)):
+async def delete_user(user_id: PydanticObjectId, admin: AuthenticatedUser = Depends(require_admin)):
     """
     Remove um usuário do sistema (requer permissão de admin)
     """
@@ -281,6 +290,7 @@ async def delete_user(user_id: PydanticObjectId, admin: User = Depends(require_a
             )
         
         await user.delete()
+        await revoke_user_tokens(user_id)
         
         logger.info("user_deleted", user_id=str(user_id))
         
@@ -300,7 +310,8 @@ async def delete_user(user_id: PydanticObjectId, admin: User = Depends(require_a
 
 # 6️⃣ Login (autenticação básica)
 @router.post("/login")
-async def login(data: LoginRequest):
+@limiter.limit(RATE_LIMIT_LOGIN)
+async def login(request: Request, data: LoginRequest):
     """
     Autentica um usuário
     """
@@ -319,15 +330,14 @@ async def login(data: LoginRequest):
                 detail="Usuário inativo"
             )
         
-        if not user.verify_password(data.password):
+        if not await user.verify_password(data.password):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Email ou senha incorretos"
             )
         
-        # Atualizar last_login
-        user.last_login = datetime.utcnow()
-        await user.save()
+        # last_login é gravado em lote em segundo plano (atualização parcial, sem reescrever o documento)
+        last_login_writer.record(user.id)
         
         logger.info("user_login", user_id=str(user.id), email=user.email, role=user.role)
         
@@ -359,12 +369,37 @@ async def login(data: LoginRequest):
         )
 
 
+# Logout (revoga o token atual)
+@router.post("/logout")
+async def logout(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    current_user: AuthenticatedUser = Depends(get_current_user)
+):
+    """
+    Encerra a sessão: o token usado deixa de ser aceito imediatamente
+    """
+    await revoke_token(verify_token(credentials.credentials))
+    logger.info("user_logout", user_id=str(current_user.id))
+    return {
+        "status": "success",
+        "message": "Logout realizado com sucesso"
+    }
+
+
 # 7️⃣ Endpoint para obter usuário atual (autenticado)
 @router.get("/me")
-async def get_current_user_info(current_user: User = Depends(get_current_user)):
+async def get_current_user_info(current_user = Depends(get_current_user)):
     """
     Retorna informações do usuário autenticado
     """
+    # get_current_user traz apenas id/role/is_active; o perfil vem do banco
+    current_user = await User.get(current_user.id)
+    if not current_user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Usuário não encontrado"
+        )
+    
     return {
         "id": str(current_user.id),
         "name": current_user.name,
@@ -380,7 +415,7 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
 
 # 8️⃣ Desativar/Ativar usuário (requer admin)
 @router.patch("/{user_id}/toggle-active")
-async def toggle_user_active(user_id: PydanticObjectId, admin: User = Depends(require_admin)):
+async def toggle_user_active(user_id: PydanticObjectId, admin: AuthenticatedUser = Depends(require_admin)):
     """
     Ativa ou desativa um usuário
     """
@@ -395,6 +430,10 @@ async def toggle_user_active(user_id: PydanticObjectId, admin: User = Depends(re
         user.is_active = not user.is_active
         user.updated_at = datetime.utcnow()
         await user.save()
+        if user.is_active:
+            invalidate_user_cache(user_id)
+        else:
+            await revoke_user_tokens(user_id)
         
         return {
             "status": "success",
@@ -0,0 +1,139 @@
+"""
+Cache das respostas da IA (categoria e tags) por impressão digital do título
+
+O mesmo produto chega várias vezes (links de afiliados diferentes, re-extrações)
+com títulos quase idênticos. O título é normalizado (minúsculas, sem acentos,
+sem stopwords, números e unidades canônicos, palavras ordenadas) e o hash do
+resultado é a chave no Redis, compartilhada entre os workers com TTL longo.
+"""
+import hashlib
+import os
+import re
+import unicodedata
+from typing import Any, Dict, Optional
+from app.core import cache
+
+# Configurações
+AI_CACHE_ENABLED = os.getenv("AI_CACHE_ENABLED", "true").lower() == "true"
+AI_CACHE_TTL_SECONDS = int(os.getenv("AI_CACHE_TTL_SECONDS", str(30 * 86400)))
+STATS_KEY = "ai_cache:stats"
+
+# Palavras sem valor para identificar o produto (inclui jargão de anúncio).
+# "com" e "sem" ficam de fora: as palavras são ordenadas, então "fone com fio" e
+# "fone sem fio" só se distinguem por elas
+STOPWORDS = {
+    "a", "o", "as", "os", "e", "ou", "de", "da", "do", "das", "dos", "para", "pra",
+    "por", "em", "no", "na", "nos", "nas", "um", "uma",
+    "novo", "nova", "original", "lacrado", "oferta", "promocao", "frete", "gratis", "envio",
+    "imediato", "pronta", "entrega", "oficial", "loja", "cor", "un", "und", "unidade", "unidades",
+}
+
+# Sinônimos de unidade reduzidos a uma forma (ex.: "128 GB" e "128gb" -> "128gb")
+UNIT_ALIASES = {
+    "polegadas": "pol", "polegada": "pol", '"': "pol",
+    "litros": "l", "litro": "l", "gigas": "gb", "giga": "gb", "watts": "w",
+}
+UNITS = {"gb", "tb", "mb", "mah", "w", "v", "hz", "pol", "ml", "l", "kg", "g", "cm", "mm", "m", "mp", "x"}
+
+# Termos alfanuméricos inteiros (modelos como "a15", "4k") e números com separadores
+TOKEN_REGEX = re.compile(r"[a-z0-9]+(?:[.,]\d+)*|\"")
+NUMBER_REGEX = re.compile(r"\d+(?:[.,]\d+)*")
+THOUSANDS_REGEX = re.compile(r"^\d{1,3}(?:\.\d{3})+$")
+
+
+def _canonical_number(token: str) -> str:
+    """1.000 -> 1000; 2,5 -> 2.5; 2,50 -> 2.5"""
+    if THOUSANDS_REGEX.match(token):
+        return token.replace(".", "")
+    token = token.replace(",", ".")
+    if "." in token:
+        token = token.rstrip("0").rstrip(".")
+    return token
+
+
+def normalize_title(title: str) -> str:
+    """Forma canônica do título usada na impressão digital"""
+    text = unicodedata.normalize("NFKD", (title or "").lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+
+    tokens = []
+    for token in TOKEN_REGEX.findall(text):
+        token = UNIT_ALIASES.get(token, token)
+        if NUMBER_REGEX.fullmatch(token):
+            tokens.append(_canonical_number(token))
+        elif token in UNITS and tokens and NUMBER_REGEX.fullmatch(tokens[-1]):
+            tokens[-1] += token  # Número seguido de unidade vira um único termo
+        elif token not in STOPWORDS and len(token) > 1:
+            tokens.append(token)
+
+    return " ".join(sorted(set(tokens)))
+
+
+def title_fingerprint(title: str) -> str:
+    return hashlib.blake2b(normalize_title(title).encode("utf-8"), digest_size=16).hexdigest()
+
+
+class AICache:
+    """Cache compartilhado (Redis) das respostas da IA com métricas de acerto"""
+
+    def __init__(self, ttl: int = AI_CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+
+    @staticmethod
+    def key(kind: str, title: str) -> str:
+        return f"ai:{kind}:{title_fingerprint(title)}"
+
+    async def get(self, kind: str, title: str) -> Optional[Any]:
+        """Busca a resposta em cache ("category" ou "tags"). None em caso de miss"""
+        if not AI_CACHE_ENABLED or not cache.redis_client:
+            return None
+
+        value = await cache.get_cached(self.key(kind, title))
+        outcome = "hits" if value is not None else "misses"
+        counters = self.hits if value is not None else self.misses
+        counters[kind] = counters.get(kind, 0) + 1
+        try:
+            await cache.redis_client.hincrby(STATS_KEY, f"{kind}:{outcome}", 1)
+        except Exception:
+            pass
+        return value
+
+    async def set(self, kind: str, title: str, value: Any):
+        """Armazena uma resposta da IA (nunca resultados de fallback)"""
+        if AI_CACHE_ENABLED and value:
+            await cache.set_cached(self.key(kind, title), value, ttl=self.ttl)
+
+    async def get_stats(self) -> Dict[str, Any]:
+        """Taxa de acerto por tipo (global via Redis e deste processo)"""
+        def summarize(hits: Dict[str, int], misses: Dict[str, int]) -> Dict[str, Any]:
+            summary = {}
+            for kind in sorted(set(hits) | set(misses)):
+                total = hits.get(kind, 0) + misses.get(kind, 0)
+                summary[kind] = {
+                    "hits": hits.get(kind, 0),
+                    "misses": misses.get(kind, 0),
+                    "hit_rate": round(hits.get(kind, 0) / total * 100, 2) if total else None,
+                }
+            return summary
+
+        total = None
+        if cache.redis_client:
+            try:
+                raw = await cache.redis_client.hgetall(STATS_KEY)
+                hits = {field.split(":")[0]: int(v) for field, v in raw.items() if field.endswith(":hits")}
+                misses = {field.split(":")[0]: int(v) for field, v in raw.items() if field.endswith(":misses")}
+                total = summarize(hits, misses)
+            except Exception:
+                total = None
+
+        return {
+            "enabled": AI_CACHE_ENABLED,
+            "ttl_seconds": self.ttl,
+            "total": total,
+            "process": summarize(self.hits, self.misses),
+        }
+
+
+ai_cache = AICache()
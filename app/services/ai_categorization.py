@@ -1,15 +1,35 @@
 """
 Serviço de categorização automática com IA
 """
+import asyncio
+import json
 import os
-from typing import Optional, List
+import re
+import unicodedata
+from typing import Optional, List, Dict, Any, Tuple
+import numpy as np
 from openai import AsyncOpenAI
 from dotenv import load_dotenv
+from app.core.logging import get_logger
+from app.services.ai_cache import ai_cache
+from app.services.local_classifier import predict_category
 
 load_dotenv()
 
+logger = get_logger(__name__)
+
 client = None
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+AI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+
+# Orçamento de latência da IA no extract-and-save: após o prazo, usa keywords
+AI_LATENCY_BUDGET_SECONDS = float(os.getenv("AI_LATENCY_BUDGET_SECONDS", "4"))
+# true = categoria e tags em uma única chamada (JSON); false = duas chamadas concorrentes
+AI_COMBINED_PROMPT = os.getenv("AI_COMBINED_PROMPT", "true").lower() == "true"
+# Categorização em lote (backfills): títulos por chamada, chamadas simultâneas e novas tentativas
+AI_BATCH_SIZE = int(os.getenv("AI_BATCH_SIZE", "25"))
+AI_BATCH_CONCURRENCY = int(os.getenv("AI_BATCH_CONCURRENCY", "3"))
+AI_BATCH_MAX_RETRIES = int(os.getenv("AI_BATCH_MAX_RETRIES", "2"))
 
 # Categorias disponíveis
 CATEGORIES = [
@@ -52,9 +72,18 @@ async def categorize_offer(title: str, description: Optional[str] = None) -> str
     Returns:
         Categoria sugerida
     """
+    # Classificador local confiante dispensa a IA
+    local = predict_category(title)
+    if local:
+        return local[0]
+    
     if not client:
         return "Outros"
     
+    cached = await ai_cache.get("category", title)
+    if cached:
+        return cached
+    
     try:
         # Construir prompt
         text = f"Título: {title}"
@@ -71,7 +100,7 @@ Categorias disponíveis:
 Responda APENAS com o nome exato da categoria, sem explicações."""
 
         response = await client.chat.completions.create(
-            model="gpt-3.5-turbo",
+            model=AI_MODEL,
             messages=[
                 {"role": "system", "content": "Você é um assistente especializado em categorizar produtos."},
                 {"role": "user", "content": prompt}
@@ -80,65 +109,169 @@ Responda APENAS com o nome exato da categoria, sem explicações."""
             max_tokens=50
         )
         
-        category = response.choices[0].message.content.strip()
-        
-        # Validar se a categoria está na lista
-        if category in CATEGORIES:
-            return category
-        
-        # Tentar encontrar categoria similar
-        for cat in CATEGORIES:
-            if cat.lower() in category.lower() or category.lower() in cat.lower():
-                return cat
-        
-        return "Outros"
+        category = match_category(response.choices[0].message.content)
+        await ai_cache.set("category", title, category)
+        return category or "Outros"
         
     except Exception as e:
-        print(f"Erro na categorização com IA: {e}")
+        logger.warning("ai_categorization_failed", error=str(e))
         return "Outros"
 
 
+def match_category(answer: Optional[str]) -> Optional[str]:
+    """Valida a resposta da IA contra CATEGORIES (exata ou por similaridade). None se não reconhecida"""
+    category = (answer or "").strip()
+    if not category:
+        return None
+    
+    # Validar se a categoria está na lista
+    if category in CATEGORIES:
+        return category
+    
+    # Tentar encontrar categoria similar
+    for cat in CATEGORIES:
+        if cat.lower() in category.lower() or category.lower() in cat.lower():
+            return cat
+    
+    return None
+
+
+def clean_tags(tags) -> List[str]:
+    """Normaliza as tags da IA (texto separado por vírgula ou lista): minúsculas, sem vazias, máximo 5"""
+    if isinstance(tags, str):
+        tags = tags.split(',')
+    tags = [str(tag).strip().lower() for tag in tags or []]
+    return list(dict.fromkeys(tag for tag in tags if tag and len(tag) > 1))[:5]
+
+
+def _strip_accents(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+# Palavras-chave por categoria (em caso de empate na pontuação, vale a ordem abaixo)
+CATEGORY_KEYWORDS = {
+    "Celulares e Telefonia": ["celular", "smartphone", "iphone", "samsung galaxy", "telefone", "fone"],
+    "Computadores e Informática": ["notebook", "computador", "pc", "teclado", "mouse", "monitor", "ssd", "hd"],
+    "Games e Consoles": ["playstation", "xbox", "nintendo", "ps5", "ps4", "console", "jogo", "game"],
+    "Casa e Eletrodomésticos": ["geladeira", "fogão", "microondas", "ar condicionado", "ventilador", "tv", "televisão"],
+    "Moda e Beleza": ["roupa", "camisa", "calça", "vestido", "sapato", "tênis", "perfume", "maquiagem"],
+    "Esportes e Fitness": ["bicicleta", "esteira", "musculação", "bola", "raquete", "fitness"],
+    "Livros e Papelaria": ["livro", "caderno", "caneta", "papel"],
+    "Brinquedos e Hobbies": ["brinquedo", "boneca", "carrinho", "lego"],
+    "Automotivo": ["carro", "moto", "pneu", "óleo", "bateria"],
+    "Pet Shop": ["pet", "cachorro", "gato", "ração", "animal"],
+    "Ferramentas e Construção": ["furadeira", "parafusadeira", "martelo", "serra", "ferramenta"],
+}
+KEYWORD_CATEGORIES = list(CATEGORY_KEYWORDS)
+
+# Palavra-chave normalizada -> (índice da categoria, peso). Termos compostos pesam mais
+_KEYWORD_INDEX = {
+    _strip_accents(keyword): (index, len(keyword.split()))
+    for index, keywords in enumerate(CATEGORY_KEYWORDS.values())
+    for keyword in keywords
+}
+
+# Uma única regex para todas as palavras-chave, compilada na importação: termos mais
+# longos primeiro, palavra inteira com plural opcional ("game" casa "games", não "gamer";
+# "hd" não casa "hdmi")
+KEYWORD_REGEX = re.compile(
+    r"(?<!\w)(" + "|".join(re.escape(k) for k in sorted(_KEYWORD_INDEX, key=len, reverse=True)) + r")(?:e?s)?(?!\w)"
+)
+
+
+def _keyword_scores(text: str) -> Dict[int, int]:
+    scores: Dict[int, int] = {}
+    for match in KEYWORD_REGEX.finditer(text):
+        index, weight = _KEYWORD_INDEX[match.group(1)]
+        scores[index] = scores.get(index, 0) + weight
+    return scores
+
+
 def categorize_by_keywords(title: str) -> str:
     """
-    Categorização simples baseada em palavras-chave (fallback quando IA não está disponível)
-    """
-    title_lower = title.lower()
-    
-    keywords_map = {
-        "Celulares e Telefonia": ["celular", "smartphone", "iphone", "samsung galaxy", "telefone", "fone"],
-        "Computadores e Informática": ["notebook", "computador", "pc", "teclado", "mouse", "monitor", "ssd", "hd"],
-        "Games e Consoles": ["playstation", "xbox", "nintendo", "ps5", "ps4", "console", "jogo", "game"],
-        "Casa e Eletrodomésticos": ["geladeira", "fogão", "microondas", "ar condicionado", "ventilador", "tv", "televisão"],
-        "Moda e Beleza": ["roupa", "camisa", "calça", "vestido", "sapato", "tênis", "perfume", "maquiagem"],
-        "Esportes e Fitness": ["bicicleta", "esteira", "musculação", "bola", "raquete", "fitness"],
-        "Livros e Papelaria": ["livro", "caderno", "caneta", "papel"],
-        "Brinquedos e Hobbies": ["brinquedo", "boneca", "carrinho", "lego"],
-        "Automotivo": ["carro", "moto", "pneu", "óleo", "bateria"],
-        "Pet Shop": ["pet", "cachorro", "gato", "ração", "animal"],
-        "Ferramentas e Construção": ["furadeira", "parafusadeira", "martelo", "serra", "ferramenta"],
-    }
-    
-    for category, keywords in keywords_map.items():
-        if any(keyword in title_lower for keyword in keywords):
-            return category
+    Categorização baseada em palavras-chave (fallback quando IA não está disponível).
+    A categoria com mais ocorrências (termos compostos pesam mais) vence.
+    """
+    scores = _keyword_scores(_strip_accents((title or "").lower()))
+    if not scores:
+        return "Outros"
+    best = max(scores, key=lambda index: (scores[index], -index))
+    return KEYWORD_CATEGORIES[best]
+
+
+def categorize_titles_by_keywords(titles: List[str]) -> List[str]:
+    """
+    Categorização por palavras-chave de muitos títulos de uma vez (backfills):
+    uma única varredura da regex sobre todos os títulos e pontuação em uma matriz
+    (títulos x categorias)
+    """
+    if not titles:
+        return []
+
+    texts = [_strip_accents((title or "").lower()).replace("\n", " ") for title in titles]
+    blob = "\n".join(texts)
+    starts = np.cumsum([0] + [len(text) + 1 for text in texts[:-1]])
+
+    positions, categories, weights = [], [], []
+    for match in KEYWORD_REGEX.finditer(blob):
+        index, weight = _KEYWORD_INDEX[match.group(1)]
+        positions.append(match.start())
+        categories.append(index)
+        weights.append(weight)
+
+    scores = np.zeros((len(titles), len(KEYWORD_CATEGORIES)), dtype=np.int32)
+    if positions:
+        rows = np.searchsorted(starts, positions, side="right") - 1
+        np.add.at(scores, (rows, categories), weights)
+
+    # argmax devolve o primeiro máximo: empate resolvido pela ordem de CATEGORY_KEYWORDS
+    best = scores.argmax(axis=1)
+    matched = scores.max(axis=1) > 0
+    return [KEYWORD_CATEGORIES[i] if ok else "Outros" for i, ok in zip(best, matched)]
+
+
+async def generate_tags(
+    title: str,
+    description: Optional[str] = None,
+    category: Optional[str] = None,
+    rate_limiter=None
+) -> List[str]:
+    """
+    Gera tags relevantes para uma oferta usando IA (keywords sem IA ou em caso de erro)
     
-    return "Outros"
+    Returns:
+        Lista de tags (máximo 5)
+    """
+    tags, _ = await generate_tags_with_method(title, description, category, rate_limiter)
+    return tags
 
 
-async def generate_tags(title: str, description: Optional[str] = None, category: Optional[str] = None) -> List[str]:
+async def generate_tags_with_method(
+    title: str,
+    description: Optional[str] = None,
+    category: Optional[str] = None,
+    rate_limiter=None
+) -> Tuple[List[str], str]:
     """
-    Gera tags relevantes para uma oferta usando IA
+    Gera tags relevantes para uma oferta usando IA, informando a origem
     
     Args:
         title: Título da oferta
         description: Descrição da oferta (opcional)
         category: Categoria da oferta (opcional)
+        rate_limiter: objeto com `async acquire()` (ex.: TokenBucket), aguardado
+            apenas antes de uma chamada real à API (cache e keywords não consomem)
     
     Returns:
-        Lista de tags (máximo 5)
+        (tags, método): método "ai" (IA ou cache de respostas da IA) ou "keywords"
     """
     if not client:
-        return generate_tags_by_keywords(title)
+        return generate_tags_by_keywords(title), "keywords"
+    
+    cached = await ai_cache.get("tags", title)
+    if cached:
+        return cached, "ai"
     
     try:
         # Construir contexto
@@ -161,8 +294,10 @@ Gere tags que sejam:
 Responda APENAS com as tags separadas por vírgula, sem numeração ou explicações.
 Exemplo: smartphone, 5g, samsung, 128gb, android"""
 
+        if rate_limiter:
+            await rate_limiter.acquire()
         response = await client.chat.completions.create(
-            model="gpt-3.5-turbo",
+            model=AI_MODEL,
             messages=[
                 {"role": "system", "content": "Você é um assistente especializado em gerar tags para produtos."},
                 {"role": "user", "content": prompt}
@@ -171,45 +306,263 @@ Exemplo: smartphone, 5g, samsung, 128gb, android"""
             max_tokens=100
         )
         
-        tags_text = response.choices[0].message.content.strip()
-        
-        # Processar tags
-        tags = [tag.strip().lower() for tag in tags_text.split(',')]
-        
-        # Limitar a 5 tags e remover vazias
-        tags = [tag for tag in tags if tag and len(tag) > 1][:5]
-        
-        return tags
+        tags = clean_tags(response.choices[0].message.content)
+        await ai_cache.set("tags", title, tags)
+        return tags, "ai"
         
     except Exception as e:
-        print(f"Erro na geração de tags com IA: {e}")
-        return generate_tags_by_keywords(title)
+        logger.warning("ai_tag_generation_failed", error=str(e))
+        return generate_tags_by_keywords(title), "keywords"
+
+
+# Palavras comuns a ignorar na geração de tags
+TAG_STOP_WORDS = frozenset({
+    'de', 'da', 'do', 'com', 'para', 'em', 'a', 'o', 'e', 'ou', 
+    'kit', 'c/', 'pc', 'un', 'cx', 'cor', 'cm', 'mm', 'kg', 'g'
+})
+TAG_PUNCTUATION_REGEX = re.compile(r"[^\w-]")
 
 
 def generate_tags_by_keywords(title: str) -> List[str]:
     """
     Geração simples de tags baseada em palavras-chave (fallback)
     """
-    # Palavras comuns a ignorar
-    stop_words = {
-        'de', 'da', 'do', 'com', 'para', 'em', 'a', 'o', 'e', 'ou', 
-        'kit', 'c/', 'pc', 'un', 'cx', 'cor', 'cm', 'mm', 'kg', 'g'
-    }
-    
-    # Extrair palavras do título
-    words = title.lower().split()
-    
-    # Filtrar palavras relevantes
     tags = []
-    for word in words:
-        # Remover pontuação
-        word = ''.join(c for c in word if c.isalnum() or c in ['-', '_'])
+    for word in title.lower().split():
+        # Remover pontuação (mantém letras, números, "-" e "_")
+        word = TAG_PUNCTUATION_REGEX.sub("", word)
         
         # Adicionar se for relevante
-        if (len(word) > 2 and 
-            word not in stop_words and 
-            not word.isdigit()):
+        if len(word) > 2 and word not in TAG_STOP_WORDS and not word.isdigit():
             tags.append(word)
     
     # Limitar a 5 tags únicas
     return list(dict.fromkeys(tags))[:5]
+
+
+async def categorize_and_tag(title: str, description: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Categoriza e gera tags em uma única chamada com saída estruturada (JSON).
+    Lança exceção se a IA falhar ou a categoria não for reconhecida.
+    """
+    category, tags = await asyncio.gather(ai_cache.get("category", title), ai_cache.get("tags", title))
+    if category and tags:
+        return {"category": category, "tags": tags}
+    
+    text = f"Título: {title}"
+    if description:
+        text += f"\nDescrição: {description}"
+    
+    prompt = f"""Você é um sistema de categorização de produtos. Analise o produto abaixo, escolha UMA categoria da lista e gere de 3 a 5 tags.
+
+{text}
+
+Categorias disponíveis:
+{', '.join(CATEGORIES)}
+
+Tags: palavras-chave curtas (1-3 palavras) com marca, modelo e especificações que usuários buscariam.
+
+Responda APENAS com JSON no formato: {{"category": "<categoria exata da lista>", "tags": ["tag1", "tag2", "tag3"]}}"""
+
+    response = await client.chat.completions.create(
+        model=AI_MODEL,
+        messages=[
+            {"role": "system", "content": "Você é um assistente especializado em categorizar produtos e gerar tags. Responda em JSON."},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.3,
+        max_tokens=150,
+        response_format={"type": "json_object"}
+    )
+    
+    data = json.loads(response.choices[0].message.content)
+    category = match_category(data.get("category"))
+    if not category:
+        raise ValueError(f"Categoria não reconhecida: {data.get('category')}")
+    
+    tags = clean_tags(data.get("tags"))
+    await asyncio.gather(ai_cache.set("category", title, category), ai_cache.set("tags", title, tags))
+    return {"category": category, "tags": tags}
+
+
+async def _categorize_chunk(items: List[Dict[str, Any]]) -> Dict[int, str]:
+    """
+    Uma chamada com vários produtos numerados. Retorna {id: categoria} apenas
+    dos itens com resposta válida (os demais voltam para nova tentativa)
+    """
+    lines = []
+    for item in items:
+        line = f"{item['id']}. {item['title']}"
+        if item.get("description"):
+            line += f" — {item['description'][:200]}"
+        lines.append(line)
+    
+    prompt = f"""Você é um sistema de categorização de produtos. Para CADA produto abaixo, escolha UMA categoria da lista.
+
+Produtos:
+{chr(10).join(lines)}
+
+Categorias disponíveis:
+{', '.join(CATEGORIES)}
+
+Responda APENAS com JSON no formato: {{"results": [{{"id": <número do produto>, "category": "<categoria exata da lista>"}}]}}"""
+
+    response = await client.chat.completions.create(
+        model=AI_MODEL,
+        messages=[
+            {"role": "system", "content": "Você é um assistente especializado em categorizar produtos. Responda em JSON."},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.3,
+        max_tokens=30 + 20 * len(items),
+        response_format={"type": "json_object"}
+    )
+    
+    data = json.loads(response.choices[0].message.content)
+    expected = {item["id"] for item in items}
+    answers = {}
+    for entry in data.get("results") or []:
+        if not isinstance(entry, dict):
+            continue
+        try:
+            item_id = int(entry.get("id"))
+        except (TypeError, ValueError):
+            continue
+        category = match_category(entry.get("category"))
+        if item_id in expected and category:
+            answers[item_id] = category
+    return answers
+
+
+async def categorize_offers_batch(
+    titles: List[str],
+    descriptions: Optional[List[Optional[str]]] = None,
+    batch_size: int = AI_BATCH_SIZE,
+    max_retries: int = AI_BATCH_MAX_RETRIES
+) -> List[Dict[str, str]]:
+    """
+    Categoriza muitas ofertas (backfills) agrupando vários títulos por chamada à IA.
+    Cache e classificador local respondem primeiro; cada resposta da IA é validada
+    contra CATEGORIES e apenas os itens inválidos ou ausentes são reenviados (até
+    `max_retries` vezes). O que sobrar usa keywords.
+    
+    Returns:
+        [{"category", "category_method"}] na ordem dos títulos (method: local | ai | keywords)
+    """
+    descriptions = descriptions or [None] * len(titles)
+    results: List[Optional[Dict[str, str]]] = [None] * len(titles)
+    
+    pending = []
+    for index, title in enumerate(titles):
+        local = predict_category(title)
+        if local:
+            results[index] = {"category": local[0], "category_method": "local"}
+        elif client and title:
+            pending.append({"id": index, "title": title, "description": descriptions[index]})
+    
+    if pending:
+        cached = await asyncio.gather(*(ai_cache.get("category", item["title"]) for item in pending))
+        for item, category in zip(pending, cached):
+            if category:
+                results[item["id"]] = {"category": category, "category_method": "ai"}
+        pending = [item for item in pending if results[item["id"]] is None]
+    
+    semaphore = asyncio.Semaphore(AI_BATCH_CONCURRENCY)
+    
+    async def run_chunk(chunk: List[Dict[str, Any]]) -> Dict[int, str]:
+        async with semaphore:
+            try:
+                return await _categorize_chunk(chunk)
+            except Exception as e:
+                logger.warning("ai_batch_categorization_failed", items=len(chunk), error=str(e))
+                return {}
+    
+    calls = 0
+    for attempt in range(max_retries + 1):
+        if not pending:
+            break
+        chunks = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        calls += len(chunks)
+        answers: Dict[int, str] = {}
+        for chunk_answers in await asyncio.gather(*(run_chunk(chunk) for chunk in chunks)):
+            answers.update(chunk_answers)
+        
+        for index, category in answers.items():
+            results[index] = {"category": category, "category_method": "ai"}
+        await asyncio.gather(*(ai_cache.set("category", titles[index], category) for index, category in answers.items()))
+        pending = [item for item in pending if item["id"] not in answers]
+    
+    if pending:
+        logger.warning("ai_batch_categorization_incomplete", failed=len(pending), retries=max_retries)
+    
+    missing = [index for index, result in enumerate(results) if result is None]
+    for index, category in zip(missing, categorize_titles_by_keywords([titles[i] for i in missing])):
+        results[index] = {"category": category, "category_method": "keywords"}
+    
+    logger.info("ai_batch_categorization_done", offers=len(titles), ai_calls=calls, keywords=len(missing))
+    return results
+
+
+async def classify_offer(
+    title: str,
+    description: Optional[str] = None,
+    budget: float = AI_LATENCY_BUDGET_SECONDS
+) -> Dict[str, Any]:
+    """
+    Categoria e tags de uma oferta dentro de um orçamento de latência.
+    O classificador local responde a categoria quando está confiante; a IA
+    (uma chamada combinada ou duas concorrentes) cobre o restante. O que não
+    ficar pronto no prazo, ou falhar, é preenchido pelas keywords.
+    
+    Returns:
+        {"category", "tags", "category_method", "tags_method"} (method: local | ai | keywords)
+    """
+    result = {
+        "category": None, "tags": None,
+        "category_method": "keywords", "tags_method": "keywords"
+    }
+    
+    local = predict_category(title)
+    if local:
+        result.update(category=local[0], category_method="local")
+    
+    if client and result["category"]:
+        # Categoria já resolvida localmente: apenas as tags dependem da IA
+        try:
+            tags, method = await asyncio.wait_for(
+                generate_tags_with_method(title, description, result["category"]), budget
+            )
+            if tags:
+                result.update(tags=tags, tags_method=method)
+        except asyncio.TimeoutError:
+            logger.warning("ai_latency_budget_exceeded", budget=budget)
+    elif client and AI_COMBINED_PROMPT:
+        try:
+            data = await asyncio.wait_for(categorize_and_tag(title, description), budget)
+            result.update(data, category_method="ai", tags_method="ai" if data["tags"] else "keywords")
+        except asyncio.TimeoutError:
+            logger.warning("ai_latency_budget_exceeded", budget=budget)
+        except Exception as e:
+            logger.warning("ai_classification_failed", error=str(e))
+    elif client:
+        category_task = asyncio.create_task(categorize_offer(title, description))
+        tags_task = asyncio.create_task(generate_tags_with_method(title, description))
+        done, pending = await asyncio.wait({category_task, tags_task}, timeout=budget)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning("ai_latency_budget_exceeded", budget=budget, pending=len(pending))
+        
+        # categorize_offer/generate_tags já tratam erros ("Outros"/keywords)
+        if category_task in done and category_task.result() != "Outros":
+            result.update(category=category_task.result(), category_method="ai")
+        if tags_task in done and tags_task.result()[0]:
+            tags, method = tags_task.result()
+            result.update(tags=tags, tags_method=method)
+    
+    if not result["category"]:
+        result["category"] = categorize_by_keywords(title)
+    if not result["tags"]:
+        result["tags"] = generate_tags_by_keywords(title)
+        result["tags_method"] = "keywords"
+    return result
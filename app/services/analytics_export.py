@@ -0,0 +1,211 @@
+"""
+Serviço de exportação de eventos de analytics (NDJSON, CSV e Parquet)
+
+Os eventos são lidos diretamente de um cursor do MongoDB em lotes de tamanho
+fixo e codificados incrementalmente, de modo que a memória usada não depende
+do número de linhas exportadas.
+"""
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+from app.models.offer_click import OfferClick
+from app.models.page_view import PageView
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet é opcional
+    pa = None
+    pq = None
+
+# Configurações
+EXPORT_BATCH_SIZE = int(os.getenv("ANALYTICS_EXPORT_BATCH_SIZE", "5000"))
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Colunas exportadas por tipo de evento (ordem fixa para CSV/Parquet)
+EXPORT_DATASETS = {
+    "clicks": {
+        "model": OfferClick,
+        "time_field": "clicked_at",
+        "columns": ["id", "offer_id", "source", "ip_address", "user_agent", "clicked_at"],
+    },
+    "pageviews": {
+        "model": PageView,
+        "time_field": "viewed_at",
+        "columns": ["id", "page", "ip_address", "user_agent", "viewed_at"],
+    },
+}
+
+
+def is_parquet_available() -> bool:
+    """Verifica se o pyarrow está instalado"""
+    return pq is not None
+
+
+def build_export_query(
+    dataset: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    offer_id: Optional[str] = None,
+    source: Optional[str] = None,
+    page: Optional[str] = None
+) -> Dict:
+    """Monta o filtro do MongoDB para a exportação"""
+    time_field = EXPORT_DATASETS[dataset]["time_field"]
+    query = {}
+
+    if start or end:
+        query[time_field] = {}
+        if start:
+            query[time_field]["$gte"] = start
+        if end:
+            query[time_field]["$lt"] = end
+
+    if dataset == "clicks":
+        if offer_id:
+            query["offer_id"] = offer_id
+        if source:
+            query["source"] = source
+    elif page:
+        query["page"] = page
+
+    return query
+
+
+async def iter_event_batches(dataset: str, query: Dict) -> AsyncIterator[List[Dict]]:
+    """Percorre o cursor em ordem cronológica, entregando lotes de no máximo EXPORT_BATCH_SIZE linhas"""
+    config = EXPORT_DATASETS[dataset]
+    columns = config["columns"]
+    projection = {col: 1 for col in columns if col != "id"}
+
+    cursor = (
+        config["model"].get_pymongo_collection()
+        .find(query, projection)
+        .sort(config["time_field"], 1)
+        .batch_size(EXPORT_BATCH_SIZE)
+    )
+
+    batch = []
+    async for doc in cursor:
+        doc["id"] = str(doc.pop("_id"))
+        batch.append({col: doc.get(col) for col in columns})
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+async def stream_ndjson(dataset: str, query: Dict) -> AsyncIterator[bytes]:
+    """Gera os eventos como NDJSON (um objeto JSON por linha)"""
+    async for batch in iter_event_batches(dataset, query):
+        lines = [json.dumps(row, default=_json_default, ensure_ascii=False) for row in batch]
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+async def stream_csv(dataset: str, query: Dict) -> AsyncIterator[bytes]:
+    """Gera os eventos como CSV com cabeçalho"""
+    columns = EXPORT_DATASETS[dataset]["columns"]
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns)
+    writer.writeheader()
+
+    async for batch in iter_event_batches(dataset, query):
+        for row in batch:
+            writer.writerow({
+                k: v.isoformat() if isinstance(v, datetime) else v
+                for k, v in row.items()
+            })
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+    # Exportação vazia ainda retorna o cabeçalho
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink:
+    """
+    Destino de escrita para o ParquetWriter que acumula apenas os bytes
+    ainda não enviados, mantendo a posição absoluta para os offsets do rodapé
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _parquet_schema(dataset: str):
+    time_field = EXPORT_DATASETS[dataset]["time_field"]
+    return pa.schema([
+        (col, pa.timestamp("ms") if col == time_field else pa.string())
+        for col in EXPORT_DATASETS[dataset]["columns"]
+    ])
+
+
+async def stream_parquet(dataset: str, query: Dict) -> AsyncIterator[bytes]:
+    """Gera os eventos como Parquet, um row group por lote"""
+    if not is_parquet_available():
+        raise RuntimeError("pyarrow não instalado. Exportação Parquet indisponível.")
+
+    schema = _parquet_schema(dataset)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+
+    try:
+        async for batch in iter_event_batches(dataset, query):
+            table = pa.Table.from_pylist(batch, schema=schema)
+            writer.write_table(table)
+            yield sink.drain()
+    finally:
+        writer.close()
+
+    yield sink.drain()
+
+
+def stream_export(dataset: str, export_format: str, query: Dict) -> AsyncIterator[bytes]:
+    """Retorna o gerador de bytes para o formato solicitado"""
+    if export_format == "ndjson":
+        return stream_ndjson(dataset, query)
+    if export_format == "csv":
+        return stream_csv(dataset, query)
+    if export_format == "parquet":
+        return stream_parquet(dataset, query)
+    raise ValueError(f"Formato não suportado: {export_format}")
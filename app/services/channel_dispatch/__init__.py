@@ -0,0 +1,18 @@
+from .base import BaseTransport, TransportError
+from .factory import get_transport, register_transport
+from .telegram import TelegramTransport
+from .webhook import WebhookTransport
+from .engine import dispatcher, deliver, init_dispatcher, shutdown_dispatcher
+
+__all__ = [
+    'BaseTransport',
+    'TransportError',
+    'get_transport',
+    'register_transport',
+    'TelegramTransport',
+    'WebhookTransport',
+    'dispatcher',
+    'deliver',
+    'init_dispatcher',
+    'shutdown_dispatcher'
+]
@@ -0,0 +1,56 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional
+import httpx
+
+class TransportError(Exception):
+    """Falha no envio. retryable indica se vale tentar novamente (rede, 5xx, 429)"""
+
+    def __init__(self, message: str, retryable: bool = True, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class BaseTransport(ABC):
+    """Envia posts para um canal. Recebe o canal (credenciais/URLs) e um cliente HTTP compartilhado"""
+
+    def __init__(self, channel, client: httpx.AsyncClient):
+        self.channel = channel
+        self.client = client
+
+    @abstractmethod
+    async def send(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Envia o payload e retorna a resposta do canal. Lança TransportError em caso de falha"""
+        pass
+
+    async def post_json(self, url: str, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """POST JSON com classificação de erros (4xx definitivos, 429/5xx/rede temporários)"""
+        try:
+            response = await self.client.post(url, json=body, headers=headers)
+        except httpx.HTTPError as e:
+            raise TransportError(f"Erro de conexão: {e}") from e
+
+        if response.status_code == 429 or response.status_code >= 500:
+            raise TransportError(
+                f"HTTP {response.status_code}",
+                retryable=True,
+                retry_after=self.retry_after(response)
+            )
+        if response.status_code >= 400:
+            raise TransportError(f"HTTP {response.status_code}: {response.text[:200]}", retryable=False)
+
+        try:
+            return response.json()
+        except ValueError:
+            return {"status_code": response.status_code, "body": response.text[:200]}
+
+    @staticmethod
+    def retry_after(response: httpx.Response) -> Optional[float]:
+        """Espera sugerida pelo canal: header Retry-After ou parameters.retry_after (Telegram)"""
+        header = response.headers.get("Retry-After")
+        if header and header.isdigit():
+            return float(header)
+        try:
+            return float(response.json()["parameters"]["retry_after"])
+        except (ValueError, KeyError, TypeError):
+            return None
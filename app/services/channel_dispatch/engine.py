@@ -0,0 +1,429 @@
+"""
+Motor de despacho de posts para os canais
+
+1. Reivindica (lease) posts pendentes dos canais ativos em lotes
+2. Enfileira cada post na fila do seu canal; cada canal tem seus próprios workers
+   (Channel.config["concurrency"] ou DISPATCH_CHANNEL_CONCURRENCY)
+3. Um limite global de envios simultâneos (DISPATCH_MAX_CONCURRENCY) libera vagas
+   primeiro para os canais de maior Channel.priority
+4. Falhas temporárias (rede, 429, 5xx) são repetidas com backoff exponencial
+5. Os resultados são acumulados e gravados em lote (updates guardados pelo
+   dispatch_token), junto com as estatísticas dos canais e a auto-aprovação das
+   ofertas dos posts efetivamente gravados
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import random
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import httpx
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from app.models.channel import Channel, sum_post_deltas
+from app.models.offer import Offer
+from app.models.post import Post
+from app.core.logging import get_logger
+from .base import BaseTransport, TransportError
+from .factory import get_transport
+
+logger = get_logger(__name__)
+
+# Configurações
+DISPATCH_ENABLED = os.getenv("DISPATCH_ENABLED", "false").lower() == "true"
+DISPATCH_POLL_SECONDS = float(os.getenv("DISPATCH_POLL_SECONDS", "10"))
+DISPATCH_BATCH_SIZE = int(os.getenv("DISPATCH_BATCH_SIZE", "100"))
+DISPATCH_MAX_CONCURRENCY = int(os.getenv("DISPATCH_MAX_CONCURRENCY", "8"))
+DISPATCH_CHANNEL_CONCURRENCY = int(os.getenv("DISPATCH_CHANNEL_CONCURRENCY", "2"))
+DISPATCH_MAX_ATTEMPTS = int(os.getenv("DISPATCH_MAX_ATTEMPTS", "4"))
+DISPATCH_BACKOFF_SECONDS = float(os.getenv("DISPATCH_BACKOFF_SECONDS", "2"))
+DISPATCH_BACKOFF_MAX_SECONDS = float(os.getenv("DISPATCH_BACKOFF_MAX_SECONDS", "60"))
+DISPATCH_LEASE_SECONDS = int(os.getenv("DISPATCH_LEASE_SECONDS", "600"))
+DISPATCH_FLUSH_SIZE = int(os.getenv("DISPATCH_FLUSH_SIZE", "50"))
+DISPATCH_FLUSH_SECONDS = float(os.getenv("DISPATCH_FLUSH_SECONDS", "2"))
+DISPATCH_TIMEOUT_SECONDS = float(os.getenv("DISPATCH_TIMEOUT_SECONDS", "15"))
+
+
+# Métricas do despacho
+metrics: Dict[str, Any] = {
+    "running": False,
+    "claimed": 0,
+    "sent": 0,
+    "failed": 0,
+    "retries": 0,
+    "flushes": 0,
+    "last_poll_at": None,
+    "last_flush_at": None,
+    "last_error": None,
+}
+
+
+def backoff_delay(attempt: int, base: float = DISPATCH_BACKOFF_SECONDS, cap: float = DISPATCH_BACKOFF_MAX_SECONDS) -> float:
+    """Espera antes da próxima tentativa: exponencial com jitter (50-100%) e teto"""
+    return min(cap, base * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+
+
+class PriorityGate:
+    """Semáforo que, sob disputa, libera as vagas primeiro para a maior prioridade"""
+
+    def __init__(self, limit: int):
+        self._available = limit
+        self._waiters: List = []
+        self._counter = itertools.count()
+
+    async def acquire(self, priority: int = 0):
+        if self._available > 0 and not self._waiters:
+            self._available -= 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (-priority, next(self._counter), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Vaga já concedida a uma tarefa cancelada: repassar
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._available += 1
+
+    def slot(self, priority: int = 0):
+        gate = self
+
+        class _Slot:
+            async def __aenter__(self):
+                await gate.acquire(priority)
+
+            async def __aexit__(self, *exc):
+                gate.release()
+
+        return _Slot()
+
+
+async def deliver(
+    transport: BaseTransport,
+    payload: Dict[str, Any],
+    priority: int = 0,
+    gate: Optional[PriorityGate] = None,
+    max_attempts: int = DISPATCH_MAX_ATTEMPTS,
+    backoff_base: float = DISPATCH_BACKOFF_SECONDS
+) -> Dict[str, Any]:
+    """
+    Envia um payload com retry. A vaga do limite global só é ocupada durante o envio,
+    não durante a espera do backoff.
+    """
+    error = None
+    for attempt in range(1, max_attempts + 1):
+        try:
+            if gate:
+                async with gate.slot(priority):
+                    response = await transport.send(payload)
+            else:
+                response = await transport.send(payload)
+            return {"status": "success", "attempts": attempt, "response": response, "error": None}
+        except TransportError as e:
+            error = e
+        except Exception as e:
+            error = TransportError(str(e), retryable=False)
+
+        if not error.retryable or attempt == max_attempts:
+            break
+        delay = error.retry_after if error.retry_after is not None else backoff_delay(attempt, backoff_base)
+        metrics["retries"] += 1
+        await asyncio.sleep(delay)
+
+    return {"status": "failed", "attempts": attempt, "response": None, "error": str(error)}
+
+
+def build_payload(post: Dict[str, Any], offer: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Monta o conteúdo enviado ao canal: mensagem otimizada da oferta ou texto padrão"""
+    offer = offer or {}
+    title = offer.get("title") or post.get("offer_title") or ""
+    price = offer.get("price_discounted", post.get("offer_price"))
+
+    message = offer.get("optimized_message")
+    if not message:
+        lines = [title]
+        if price is not None:
+            lines.append(f"💰 R$ {price:,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
+        if offer.get("discount"):
+            lines.append(f"🔥 {offer['discount']}")
+        if offer.get("installments"):
+            lines.append(f"💳 {offer['installments']}")
+        if offer.get("url"):
+            lines.append(f"🔗 {offer['url']}")
+        message = "\n".join(line for line in lines if line)
+
+    return {
+        "post_id": str(post["_id"]),
+        "offer_id": post["offer_id"],
+        "channel": post["channel"],
+        "title": title,
+        "price": price,
+        "url": offer.get("url"),
+        "image": offer.get("image") or post.get("offer_image"),
+        "message": message,
+    }
+
+
+class ChannelDispatcher:
+    """Filas e workers por canal, limite global por prioridade e gravação de status em lote"""
+
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
+        self.client = client
+        self.gate = PriorityGate(DISPATCH_MAX_CONCURRENCY)
+        self.queues: Dict[str, asyncio.PriorityQueue] = {}
+        self.workers: Dict[str, List[asyncio.Task]] = {}
+        self.channels: Dict[str, Channel] = {}
+        self.results: List[Dict[str, Any]] = []
+        self._counter = itertools.count()
+        self._flush_lock = asyncio.Lock()
+        self._tasks: List[asyncio.Task] = []
+
+    # Ciclo de vida
+
+    def _ensure_started(self):
+        if self.client is None:
+            self.client = httpx.AsyncClient(timeout=DISPATCH_TIMEOUT_SECONDS)
+        if not self._tasks:
+            self._tasks.append(asyncio.create_task(self._flush_loop()))
+        metrics["running"] = True
+
+    async def start(self):
+        """Inicia o polling periódico de posts pendentes"""
+        self._ensure_started()
+        self._tasks.append(asyncio.create_task(self._poll_loop()))
+        logger.info("dispatch_started", max_concurrency=DISPATCH_MAX_CONCURRENCY, poll_seconds=DISPATCH_POLL_SECONDS)
+
+    async def stop(self):
+        """Para workers e polling e grava os resultados pendentes (leases expiram para o restante)"""
+        tasks = self._tasks + [task for workers in self.workers.values() for task in workers]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks, self.workers, self.queues = [], {}, {}
+        await self.flush()
+        if self.client:
+            await self.client.aclose()
+            self.client = None
+        metrics["running"] = False
+        logger.info("dispatch_stopped")
+
+    # Polling
+
+    async def _poll_loop(self):
+        while True:
+            try:
+                await self.poll_once()
+            except Exception as e:
+                metrics["last_error"] = str(e)
+                logger.error("dispatch_poll_failed", error=str(e))
+            await asyncio.sleep(DISPATCH_POLL_SECONDS)
+
+    async def poll_once(self) -> int:
+        """Reivindica um lote de posts pendentes e distribui nas filas. Retorna quantos foram enfileirados"""
+        self._ensure_started()
+        metrics["last_poll_at"] = datetime.utcnow()
+
+        channels = await Channel.get_active_channels()
+        # Post.channel guarda o nome ou o slug do canal
+        self.channels = {}
+        for channel in channels:
+            self.channels.setdefault(channel.slug, channel)
+            self.channels.setdefault(channel.name, channel)
+
+        # Não reivindicar além do que as filas conseguem drenar antes do lease expirar
+        queued = sum(queue.qsize() for queue in self.queues.values())
+        limit = DISPATCH_BATCH_SIZE - queued
+        if not self.channels or limit <= 0:
+            return 0
+
+        posts = await Post.claim_pending(list(self.channels), limit, DISPATCH_LEASE_SECONDS)
+        if not posts:
+            return 0
+
+        offer_ids = [ObjectId(p["offer_id"]) for p in posts if ObjectId.is_valid(p["offer_id"])]
+        offers = await Offer.get_pymongo_collection().find(
+            {"_id": {"$in": offer_ids}},
+            {"title": 1, "url": 1, "image": 1, "optimized_message": 1, "price_discounted": 1, "discount": 1, "installments": 1}
+        ).to_list(length=None)
+        offers_by_id = {str(offer["_id"]): offer for offer in offers}
+
+        # Canais de maior prioridade recebem seus posts (e workers) primeiro
+        posts.sort(key=lambda p: -self.channels[p["channel"]].priority)
+        for post in posts:
+            queue = self._queue_for(post["channel"])
+            payload = build_payload(post, offers_by_id.get(post["offer_id"]))
+            queue.put_nowait((post["created_at"], next(self._counter), post, payload))
+
+        metrics["claimed"] += len(posts)
+        logger.info("dispatch_claimed", posts=len(posts))
+        return len(posts)
+
+    def _queue_for(self, channel_key: str) -> asyncio.PriorityQueue:
+        if channel_key not in self.queues:
+            channel = self.channels[channel_key]
+            concurrency = int((channel.config or {}).get("concurrency", DISPATCH_CHANNEL_CONCURRENCY))
+            self.queues[channel_key] = asyncio.PriorityQueue()
+            self.workers[channel_key] = [
+                asyncio.create_task(self._worker(channel_key)) for _ in range(max(1, concurrency))
+            ]
+        return self.queues[channel_key]
+
+    async def _worker(self, channel_key: str):
+        queue = self.queues[channel_key]
+        while True:
+            _, _, post, payload = await queue.get()
+            channel = self.channels.get(channel_key)
+            try:
+                if channel is None:
+                    raise TransportError("Canal inativo ou removido", retryable=False)
+                transport = get_transport(channel, self.client)
+                result = await deliver(transport, payload, priority=channel.priority, gate=self.gate)
+            except Exception as e:
+                result = {"status": "failed", "attempts": 1, "response": None, "error": str(e)}
+            finally:
+                queue.task_done()
+
+            metrics["sent" if result["status"] == "success" else "failed"] += 1
+            self.results.append({
+                **result,
+                "post": post,
+                "channel_type": channel.type if channel else channel_key,
+                "auto_approve": bool(channel and channel.auto_approve),
+            })
+            if len(self.results) >= DISPATCH_FLUSH_SIZE:
+                try:
+                    await self.flush()
+                except Exception as e:
+                    metrics["last_error"] = str(e)
+                    logger.error("dispatch_flush_failed", error=str(e))
+
+    # Gravação em lote
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(DISPATCH_FLUSH_SECONDS)
+            try:
+                await self.flush()
+            except Exception as e:
+                metrics["last_error"] = str(e)
+                logger.error("dispatch_flush_failed", error=str(e))
+
+    async def flush(self) -> int:
+        """
+        Grava os status acumulados com um único bulk_write e atualiza canais e
+        ofertas. Cada update é guardado pelo dispatch_token: estatísticas e
+        aprovação só contam os posts cujo update casou (lease ainda deste worker).
+        Resultados cuja gravação falhou voltam para a fila do próximo flush.
+        """
+        async with self._flush_lock:
+            results, self.results = self.results, []
+            if not results:
+                return 0
+
+            now = datetime.utcnow()
+            collection = Post.get_pymongo_collection()
+            operations = [
+                UpdateOne(
+                    {"_id": r["post"]["_id"], "dispatch_token": r["post"]["dispatch_token"]},
+                    {
+                        "$set": {
+                            "status": r["status"],
+                            "enviado": r["status"] == "success",
+                            "error": r["error"],
+                            f"responses.{r['channel_type']}": r["response"],
+                            "dispatch_lease_until": None,
+                            "updated_at": now,
+                        },
+                        "$inc": {"attempts": r["attempts"]},
+                    }
+                )
+                for r in results
+            ]
+
+            try:
+                outcome = await collection.bulk_write(operations, ordered=False)
+                failed_indexes, matched = set(), outcome.matched_count
+            except BulkWriteError as e:
+                # ordered=False: as demais operações foram aplicadas
+                failed_indexes = {error["index"] for error in e.details.get("writeErrors", [])}
+                matched = e.details.get("nMatched", 0)
+                metrics["last_error"] = str(e)
+            except Exception as e:
+                self.results = results + self.results
+                metrics["last_error"] = str(e)
+                logger.error("dispatch_flush_partial_failure", failed=len(results), written=0)
+                return 0
+
+            failed = [r for i, r in enumerate(results) if i in failed_indexes]
+            applied = [r for i, r in enumerate(results) if i not in failed_indexes]
+
+            if matched == len(applied):
+                written = applied
+            else:
+                # Algum lease foi perdido: uma leitura identifica quais posts ainda são deste worker
+                owners = {
+                    doc["_id"]: doc.get("dispatch_token")
+                    async for doc in collection.find(
+                        {"_id": {"$in": [r["post"]["_id"] for r in applied]}},
+                        {"dispatch_token": 1}
+                    )
+                }
+                written = [r for r in applied if owners.get(r["post"]["_id"]) == r["post"]["dispatch_token"]]
+                logger.warning("dispatch_stale_results_discarded", count=len(applied) - len(written))
+
+            if failed:
+                self.results = failed + self.results
+                logger.error("dispatch_flush_partial_failure", failed=len(failed), written=len(written))
+
+            await Channel.apply_post_deltas(sum_post_deltas(
+                (r["post"]["channel"], r["post"]["status"], r["status"]) for r in written
+            ))
+
+            # Mesma regra do PATCH /posts: canal com auto_approve aprova a oferta enviada
+            approve_ids = {
+                ObjectId(r["post"]["offer_id"]) for r in written
+                if r["status"] == "success" and r["auto_approve"] and ObjectId.is_valid(r["post"]["offer_id"])
+            }
+            if approve_ids:
+                await Offer.get_pymongo_collection().update_many(
+                    {"_id": {"$in": list(approve_ids)}, "status": {"$ne": "approved"}},
+                    {"$set": {"status": "approved", "updated_at": now}}
+                )
+
+            metrics["flushes"] += 1
+            metrics["last_flush_at"] = now
+            return len(written)
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            **metrics,
+            "queues": {key: queue.qsize() for key, queue in self.queues.items()},
+            "pending_results": len(self.results),
+        }
+
+
+dispatcher = ChannelDispatcher()
+
+
+async def init_dispatcher():
+    """Inicia o despacho automático se DISPATCH_ENABLED=true"""
+    if not DISPATCH_ENABLED:
+        logger.info("dispatch_disabled")
+        return
+    await dispatcher.start()
+
+
+async def shutdown_dispatcher():
+    if metrics["running"]:
+        await dispatcher.stop()
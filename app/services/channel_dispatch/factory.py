@@ -0,0 +1,24 @@
+from typing import Dict, Type
+import httpx
+from .base import BaseTransport
+from .telegram import TelegramTransport
+from .webhook import WebhookTransport
+
+# Transporte por Channel.type (novos canais: register_transport)
+TRANSPORTS: Dict[str, Type[BaseTransport]] = {
+    "telegram": TelegramTransport,
+    "whatsapp": WebhookTransport,
+    "instagram": WebhookTransport,
+    "site": WebhookTransport,
+    "discord": WebhookTransport,
+    "email": WebhookTransport,
+}
+
+def register_transport(channel_type: str, transport: Type[BaseTransport]):
+    TRANSPORTS[channel_type.lower()] = transport
+
+def get_transport(channel, client: httpx.AsyncClient) -> BaseTransport:
+    transport = TRANSPORTS.get((channel.type or "").lower())
+    if not transport:
+        raise ValueError(f"Tipo de canal não suportado: {channel.type}")
+    return transport(channel, client)
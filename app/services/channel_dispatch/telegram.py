@@ -0,0 +1,31 @@
+import os
+from typing import Any, Dict
+from .base import BaseTransport, TransportError
+
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+
+class TelegramTransport(BaseTransport):
+    """Publica via Bot API (Channel.api_token) no chat Channel.channel_id, com foto quando houver imagem"""
+
+    async def send(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        if not self.channel.api_token or not self.channel.channel_id:
+            raise TransportError("Canal sem api_token/channel_id configurado", retryable=False)
+
+        base_url = f"{TELEGRAM_API_URL}/bot{self.channel.api_token}"
+        if payload.get("image"):
+            url = f"{base_url}/sendPhoto"
+            # Legendas de foto são limitadas a 1024 caracteres
+            body = {"chat_id": self.channel.channel_id, "photo": payload["image"], "caption": payload["message"][:1024]}
+        else:
+            url = f"{base_url}/sendMessage"
+            body = {"chat_id": self.channel.channel_id, "text": payload["message"]}
+
+        result = await self.post_json(url, body)
+        if not result.get("ok", True):
+            parameters = result.get("parameters") or {}
+            raise TransportError(
+                result.get("description", "Erro da API do Telegram"),
+                retryable="retry_after" in parameters,
+                retry_after=parameters.get("retry_after")
+            )
+        return {"ok": True, "message_id": (result.get("result") or {}).get("message_id")}
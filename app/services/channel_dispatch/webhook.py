@@ -0,0 +1,15 @@
+from typing import Any, Dict
+from .base import BaseTransport, TransportError
+
+class WebhookTransport(BaseTransport):
+    """
+    Envia o post como JSON para Channel.webhook_url (WhatsApp, Instagram, site, etc. via
+    gateway/n8n). Channel.api_key, se presente, vai no header Authorization.
+    """
+
+    async def send(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        if not self.channel.webhook_url:
+            raise TransportError("Canal sem webhook_url configurado", retryable=False)
+
+        headers = {"Authorization": f"Bearer {self.channel.api_key}"} if self.channel.api_key else None
+        return await self.post_json(self.channel.webhook_url, payload, headers=headers)
@@ -0,0 +1,140 @@
+"""
+Filtro de ingestão de cliques: deduplicação e bloqueio de bots
+
+- Deduplicação: cliques repetidos de (ip, user_agent, offer_id) dentro de uma
+  janela deslizante são descartados. Usa uma chave Redis com TTL por evento
+  (a memória é limitada à janela); sem Redis, usa um LRU local de tamanho fixo.
+- Bots: user agents conhecidos (crawlers, prefetchers, ferramentas HTTP) são
+  identificados por uma única regex pré-compilada.
+"""
+import hashlib
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from app.core import cache
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Configurações
+DEDUP_WINDOW_SECONDS = int(os.getenv("CLICK_DEDUP_WINDOW_SECONDS", "30"))
+LOCAL_DEDUP_MAX_KEYS = int(os.getenv("CLICK_DEDUP_LOCAL_MAX_KEYS", "100000"))
+STATS_KEY = "click_filter:suppressed"
+
+# Padrões ancorados: "bot" só como palavra própria ("bot/1.0", "+bot") para não
+# pegar aparelhos como "CUBOT"; crawlers com o nome colado ao "bot" vão explícitos
+BOT_USER_AGENT_PATTERNS = [
+    r"(?<![a-z])bot\b", r"googlebot", r"bingbot", r"yandexbot", r"duckduckbot", r"applebot",
+    r"petalbot", r"ahrefsbot", r"semrushbot", r"mj12bot", r"dotbot", r"gptbot", r"amazonbot",
+    r"telegrambot", r"discordbot", r"twitterbot", r"linkedinbot", r"pinterestbot",
+    r"crawl", r"spider", r"slurp", r"bingpreview", r"facebookexternalhit", r"^whatsapp/",
+    r"embedly", r"quora link preview", r"skypeuripreview", r"headlesschrome",
+    r"phantomjs", r"python-requests", r"python-urllib", r"aiohttp", r"httpx",
+    r"curl/", r"wget/", r"go-http-client", r"okhttp", r"java/", r"libwww-perl",
+    r"scrapy", r"lighthouse", r"pingdom", r"uptimerobot",
+]
+
+# Uma única regex: uma passada sobre o user agent, independente do número de padrões
+BOT_USER_AGENT_REGEX = re.compile("|".join(BOT_USER_AGENT_PATTERNS), re.IGNORECASE)
+
+
+def is_bot_user_agent(user_agent: Optional[str]) -> bool:
+    """Retorna True se o user agent está vazio ou corresponde a um bot conhecido"""
+    if not user_agent:
+        return True
+    return BOT_USER_AGENT_REGEX.search(user_agent) is not None
+
+
+def click_fingerprint(ip_address: Optional[str], user_agent: Optional[str], offer_id: str) -> str:
+    """Gera uma chave compacta para (ip, user_agent, offer_id)"""
+    raw = f"{ip_address or ''}|{user_agent or ''}|{offer_id}"
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=12).hexdigest()
+
+
+class ClickFilter:
+    """Decide se um clique deve ser gravado e contabiliza os descartados"""
+
+    def __init__(self, window_seconds: int = DEDUP_WINDOW_SECONDS, local_max_keys: int = LOCAL_DEDUP_MAX_KEYS):
+        self.window_seconds = window_seconds
+        self.local_max_keys = local_max_keys
+        self._local_seen: "OrderedDict[str, float]" = OrderedDict()
+        self.suppressed: Dict[str, int] = {"bot": 0, "duplicate": 0}
+        self.accepted = 0
+
+    def _seen_locally(self, fingerprint: str, now: float) -> bool:
+        """Janela deslizante em memória (fallback sem Redis), limitada a local_max_keys"""
+        last_seen = self._local_seen.pop(fingerprint, None)
+        self._local_seen[fingerprint] = now
+
+        if len(self._local_seen) > self.local_max_keys:
+            self._local_seen.popitem(last=False)
+
+        return last_seen is not None and now - last_seen < self.window_seconds
+
+    async def _seen_in_redis(self, fingerprint: str) -> Optional[bool]:
+        """
+        SET ... EX GET: grava e renova o TTL (janela deslizante) e retorna o valor
+        anterior em um único comando. None quando o Redis não está disponível.
+        """
+        if not cache.redis_client:
+            return None
+        try:
+            previous = await cache.redis_client.set(
+                f"click_dedup:{fingerprint}", 1, ex=self.window_seconds, get=True
+            )
+            return previous is not None
+        except Exception as e:
+            logger.warning("click_dedup_redis_error", error=str(e))
+            return None
+
+    async def _record_suppressed(self, reason: str):
+        self.suppressed[reason] += 1
+        if cache.redis_client:
+            try:
+                await cache.redis_client.hincrby(STATS_KEY, reason, 1)
+            except Exception:
+                pass
+
+    async def check(self, ip_address: Optional[str], user_agent: Optional[str], offer_id: str) -> Optional[str]:
+        """
+        Retorna o motivo do descarte ("bot" ou "duplicate") ou None se o clique deve ser gravado
+        """
+        if is_bot_user_agent(user_agent):
+            await self._record_suppressed("bot")
+            return "bot"
+
+        fingerprint = click_fingerprint(ip_address, user_agent, offer_id)
+        duplicate = await self._seen_in_redis(fingerprint)
+        if duplicate is None:
+            duplicate = self._seen_locally(fingerprint, time.monotonic())
+
+        if duplicate:
+            await self._record_suppressed("duplicate")
+            return "duplicate"
+
+        self.accepted += 1
+        return None
+
+    async def get_stats(self) -> Dict:
+        """Retorna contadores de eventos descartados (globais via Redis e deste processo)"""
+        total = None
+        if cache.redis_client:
+            try:
+                raw = await cache.redis_client.hgetall(STATS_KEY)
+                total = {"bot": int(raw.get("bot", 0)), "duplicate": int(raw.get("duplicate", 0))}
+            except Exception:
+                total = None
+
+        return {
+            "window_seconds": self.window_seconds,
+            "suppressed_total": total,
+            "process": {
+                "accepted": self.accepted,
+                "suppressed": dict(self.suppressed),
+            },
+        }
+
+
+click_filter = ClickFilter()
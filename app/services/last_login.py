@@ -0,0 +1,106 @@
+"""
+Gravação do last_login em segundo plano
+
+O login apenas registra o horário em memória; um writer grava em lote a cada
+LAST_LOGIN_FLUSH_SECONDS com bulk_write e atualização parcial (só o campo
+last_login, via $max).
+Vários logins do mesmo usuário no intervalo viram uma única escrita, então
+picos de login não se transformam em picos de escrita na collection users.
+"""
+import asyncio
+import os
+from datetime import datetime
+from typing import Any, Dict, Optional
+from bson import ObjectId
+from pymongo import UpdateOne
+from app.core.logging import get_logger
+from app.models.user import User
+
+logger = get_logger(__name__)
+
+# Configurações
+LAST_LOGIN_FLUSH_SECONDS = float(os.getenv("LAST_LOGIN_FLUSH_SECONDS", "5"))
+# Acima disso grava antes do próximo ciclo (limita a memória em picos)
+LAST_LOGIN_MAX_PENDING = int(os.getenv("LAST_LOGIN_MAX_PENDING", "5000"))
+
+
+class LastLoginWriter:
+    """Acumula o último login de cada usuário e grava em lote periodicamente"""
+
+    def __init__(self, interval: float = LAST_LOGIN_FLUSH_SECONDS, max_pending: int = LAST_LOGIN_MAX_PENDING):
+        self.interval = interval
+        self.max_pending = max_pending
+        self.pending: Dict[str, datetime] = {}
+        self.stats = {"recorded": 0, "coalesced": 0, "written": 0, "flushes": 0, "errors": 0}
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        # Flush antecipado (acima de max_pending): no máximo um por vez
+        self._early_flush: Optional[asyncio.Task] = None
+
+    def record(self, user_id: Any, at: Optional[datetime] = None):
+        """Registra um login (não bloqueia: a escrita acontece no próximo flush)"""
+        at = at or datetime.utcnow()
+        key = str(user_id)
+        self.stats["recorded"] += 1
+        if key in self.pending:
+            self.stats["coalesced"] += 1
+        if key not in self.pending or at > self.pending[key]:
+            self.pending[key] = at
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_loop())
+        if len(self.pending) >= self.max_pending and (self._early_flush is None or self._early_flush.done()):
+            self._early_flush = asyncio.create_task(self.flush())
+
+    async def flush(self) -> int:
+        """Grava os logins pendentes. Retorna quantos usuários foram atualizados"""
+        async with self._flush_lock:
+            batch, self.pending = self.pending, {}
+            if not batch:
+                return 0
+
+            # $max: um flush atrasado nunca sobrescreve um login mais recente
+            operations = [
+                UpdateOne({"_id": ObjectId(user_id)}, {"$max": {"last_login": at}})
+                for user_id, at in batch.items()
+            ]
+            try:
+                await User.get_pymongo_collection().bulk_write(operations, ordered=False)
+            except Exception as e:
+                # Devolve o lote para a próxima tentativa (sem perder logins mais novos)
+                for user_id, at in batch.items():
+                    if user_id not in self.pending or at > self.pending[user_id]:
+                        self.pending[user_id] = at
+                self.stats["errors"] += 1
+                logger.error("last_login_flush_failed", users=len(batch), error=str(e))
+                return 0
+
+            self.stats["written"] += len(batch)
+            self.stats["flushes"] += 1
+            return len(batch)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    async def stop(self):
+        """Para o ciclo periódico e grava o que estiver pendente"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._early_flush:
+            await asyncio.gather(self._early_flush, return_exceptions=True)
+            self._early_flush = None
+        await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "pending": len(self.pending), "flush_seconds": self.interval}
+
+
+last_login_writer = LastLoginWriter()
+
+
+async def shutdown_last_login_writer():
+    await last_login_writer.stop()
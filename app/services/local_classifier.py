@@ -0,0 +1,211 @@
+"""
+Classificador local de categorias (camada rápida antes da IA)
+
+Modelo linear (regressão logística multinomial) sobre n-gramas com hashing:
+palavras, pares de palavras e trigramas de caracteres do título, com pesos
+TF-IDF normalizados (L2). Treinado com as ofertas já categorizadas
+(train_category_model.py), salvo em disco e carregado na inicialização.
+
+A predição de um título leva microssegundos e retorna uma confiança
+(probabilidade da classe). A IA só é chamada quando a confiança fica abaixo
+de LOCAL_CLASSIFIER_THRESHOLD.
+"""
+import os
+import re
+import unicodedata
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Configurações
+LOCAL_CLASSIFIER_ENABLED = os.getenv("LOCAL_CLASSIFIER_ENABLED", "true").lower() == "true"
+LOCAL_CLASSIFIER_PATH = os.getenv("LOCAL_CLASSIFIER_PATH", "ml_models/category_classifier.npz")
+LOCAL_CLASSIFIER_THRESHOLD = float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", "0.8"))
+FEATURE_DIM = 2 ** 18
+# Rótulo gravado pelos caminhos de falha (sem IA, erro, sem keyword): não é uma
+# categoria aprendível e uma predição dele não deve dispensar a IA
+FALLBACK_CATEGORY = "Outros"
+
+WORD_REGEX = re.compile(r"[a-z0-9]+")
+
+
+def title_features(title: str) -> List[str]:
+    """Termos do título: palavras, pares de palavras e trigramas de caracteres"""
+    text = unicodedata.normalize("NFKD", (title or "").lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    words = WORD_REGEX.findall(text)
+
+    features = [f"w:{word}" for word in words]
+    features += [f"b:{a}_{b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"^{word}$"
+        features += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+    return features
+
+
+def hash_features(title: str, dim: int = FEATURE_DIM) -> Tuple[np.ndarray, np.ndarray]:
+    """Índices (hash estável crc32) e contagens log(1 + tf) dos termos do título"""
+    counts: Dict[int, int] = {}
+    for feature in title_features(title):
+        index = zlib.crc32(feature.encode("utf-8")) % dim
+        counts[index] = counts.get(index, 0) + 1
+    indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    values = np.log1p(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+    return indices, values
+
+
+class LocalClassifier:
+    """Regressão logística multinomial sobre features esparsas com hashing"""
+
+    def __init__(self, classes: Sequence[str], dim: int = FEATURE_DIM):
+        self.classes = list(classes)
+        self.dim = dim
+        self.weights = np.zeros((dim, len(self.classes)), dtype=np.float32)
+        self.bias = np.zeros(len(self.classes), dtype=np.float32)
+        self.idf = np.ones(dim, dtype=np.float32)
+
+    # Features
+
+    def _vectorize(self, titles: Sequence[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Matriz esparsa (CSR: indptr, índices, valores) com TF-IDF normalizado por linha"""
+        indptr = [0]
+        all_indices, all_values = [], []
+        for title in titles:
+            indices, values = hash_features(title, self.dim)
+            values = values * self.idf[indices]
+            norm = np.linalg.norm(values)
+            all_indices.append(indices)
+            all_values.append(values / norm if norm > 0 else values)
+            indptr.append(indptr[-1] + len(indices))
+
+        indices = np.concatenate(all_indices) if all_indices else np.zeros(0, dtype=np.int64)
+        values = np.concatenate(all_values) if all_values else np.zeros(0, dtype=np.float32)
+        return np.array(indptr, dtype=np.int64), indices, values.astype(np.float32)
+
+    def _logits(self, indptr: np.ndarray, indices: np.ndarray, values: np.ndarray, weights: Optional[np.ndarray] = None) -> np.ndarray:
+        weights = self.weights if weights is None else weights
+        rows = len(indptr) - 1
+        logits = np.tile(self.bias, (rows, 1))
+        if len(indices):
+            contributions = weights[indices] * values[:, None]
+            nonempty = indptr[:-1] < indptr[1:]
+            logits[nonempty] += np.add.reduceat(contributions, indptr[:-1][nonempty], axis=0)
+        return logits
+
+    @staticmethod
+    def _softmax(logits: np.ndarray) -> np.ndarray:
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    # Treino e predição
+
+    def train(
+        self,
+        titles: Sequence[str],
+        labels: Sequence[str],
+        epochs: int = 60,
+        learning_rate: float = 2.0,
+        l2: float = 1e-5
+    ) -> "LocalClassifier":
+        """Treina com gradiente descendente em lote completo (entropia cruzada + L2)"""
+        # IDF suavizado a partir das frequências de documento
+        document_frequency = np.zeros(self.dim, dtype=np.float32)
+        for title in titles:
+            document_frequency[hash_features(title, self.dim)[0]] += 1
+        self.idf = (np.log((1 + len(titles)) / (1 + document_frequency)) + 1).astype(np.float32)
+
+        class_index = {name: i for i, name in enumerate(self.classes)}
+        targets = np.array([class_index[label] for label in labels])
+        one_hot = np.eye(len(self.classes), dtype=np.float32)[targets]
+
+        indptr, indices, values = self._vectorize(titles)
+        row_of_value = np.repeat(np.arange(len(titles)), np.diff(indptr))
+        n = len(titles)
+
+        # Otimiza apenas as colunas presentes no treino (as demais ficam zeradas)
+        active, columns = np.unique(indices, return_inverse=True)
+        weights = self.weights[active]
+        # Valores ordenados por coluna: o gradiente (X^T · erros) vira um único reduceat
+        by_column = np.argsort(columns, kind="stable")
+        column_starts = np.flatnonzero(np.r_[True, np.diff(columns[by_column]) != 0])
+
+        for _ in range(epochs):
+            errors = (self._softmax(self._logits(indptr, columns, values, weights)) - one_hot) / n
+            weighted = values[by_column, None] * errors[row_of_value[by_column]]
+            gradient = np.add.reduceat(weighted, column_starts, axis=0)
+            weights -= learning_rate * (gradient + l2 * weights)
+            self.bias -= learning_rate * errors.sum(axis=0)
+
+        self.weights[active] = weights
+        return self
+
+    def predict_many(self, titles: Sequence[str]) -> List[Tuple[str, float]]:
+        """(categoria, confiança) de vários títulos de uma vez"""
+        if not titles:
+            return []
+        probabilities = self._softmax(self._logits(*self._vectorize(titles)))
+        best = probabilities.argmax(axis=1)
+        return [(self.classes[i], float(probabilities[row, i])) for row, i in enumerate(best)]
+
+    def predict(self, title: str) -> Tuple[str, float]:
+        return self.predict_many([title])[0]
+
+    # Persistência
+
+    def save(self, path: str = LOCAL_CLASSIFIER_PATH):
+        """Salva apenas as linhas não nulas dos pesos (o modelo é esparso)"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        used = np.flatnonzero(np.any(self.weights != 0, axis=1))
+        np.savez_compressed(
+            path,
+            classes=np.array(self.classes),
+            dim=np.array(self.dim),
+            rows=used,
+            weights=self.weights[used],
+            bias=self.bias,
+            idf=self.idf
+        )
+
+    @classmethod
+    def load(cls, path: str = LOCAL_CLASSIFIER_PATH) -> "LocalClassifier":
+        with np.load(path) as data:
+            model = cls([str(name) for name in data["classes"]], int(data["dim"]))
+            model.weights[data["rows"]] = data["weights"]
+            model.bias = data["bias"]
+            model.idf = data["idf"]
+        return model
+
+
+local_classifier: Optional[LocalClassifier] = None
+
+
+def init_local_classifier():
+    """Carrega o modelo salvo (se existir) na inicialização"""
+    global local_classifier
+    if not LOCAL_CLASSIFIER_ENABLED:
+        logger.info("local_classifier_disabled")
+        return
+    if not os.path.exists(LOCAL_CLASSIFIER_PATH):
+        logger.info("local_classifier_not_trained", path=LOCAL_CLASSIFIER_PATH)
+        return
+    try:
+        local_classifier = LocalClassifier.load(LOCAL_CLASSIFIER_PATH)
+        logger.info("local_classifier_loaded", path=LOCAL_CLASSIFIER_PATH, classes=len(local_classifier.classes))
+    except Exception as e:
+        logger.warning("local_classifier_load_failed", path=LOCAL_CLASSIFIER_PATH, error=str(e))
+
+
+def predict_category(title: str, threshold: float = LOCAL_CLASSIFIER_THRESHOLD) -> Optional[Tuple[str, float]]:
+    """
+    (categoria, confiança) se o modelo local estiver carregado e confiante; senão None.
+    FALLBACK_CATEGORY nunca é retornada (modelos antigos podem tê-la aprendido)
+    """
+    if local_classifier is None or not title:
+        return None
+    category, confidence = local_classifier.predict(title)
+    if category == FALLBACK_CATEGORY or confidence < threshold:
+        return None
+    return category, confidence
@@ -1,5 +1,6 @@
 from .factory import get_extractor
 from .base import BaseExtractor
+from .prices import convert_price_to_float
 from .mercadolivre import MercadoLivreExtractor
 from .aliexpress import AliExpressExtractor
 from .shopee import ShopeeExtractor
@@ -9,6 +10,7 @@ from .kabum import KabumExtractor
 __all__ = [
     'get_extractor',
     'BaseExtractor',
+    'convert_price_to_float',
     'MercadoLivreExtractor',
     'AliExpressExtractor',
     'ShopeeExtractor',
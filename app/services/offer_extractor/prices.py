@@ -0,0 +1,39 @@
+"""
+Conversão dos preços extraídos (texto) para número
+"""
+from typing import Optional
+
+
+def convert_price_to_float(price_str: str) -> Optional[float]:
+    """
+    Converte string de preço para float, tratando formatos brasileiros.
+    Exemplos:
+    - "5.950" -> 5950.0
+    - "3.254,99" -> 3254.99
+    - "1.000" -> 1000.0
+    - "10,50" -> 10.5
+    """
+    if not price_str:
+        return None
+    
+    try:
+        # Remove espaços
+        price_str = price_str.strip()
+        
+        # Se tem vírgula, é separador decimal (ex: 3.254,99)
+        if "," in price_str:
+            price_str = price_str.replace(".", "").replace(",", ".")
+        # Se tem apenas ponto, pode ser milhar (5.950) ou decimal (10.5)
+        elif "." in price_str:
+            # Contar quantos dígitos após o último ponto
+            parts = price_str.split(".")
+            last_part = parts[-1]
+            
+            # Se tem 3 dígitos após o ponto, é separador de milhar
+            if len(last_part) == 3 and len(parts) > 1:
+                price_str = price_str.replace(".", "")
+            # Caso contrário, é separador decimal
+        
+        return float(price_str)
+    except (AttributeError, ValueError):
+        return None
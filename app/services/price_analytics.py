@@ -0,0 +1,175 @@
+"""
+Serviço de análise de preços vetorizada (médias móveis, percentis e detecção de quedas)
+
+As séries são carregadas do histórico em uma única agregação e convertidas em
+uma matriz (ofertas x dias) com o último preço conhecido de cada dia. Todas as
+estatísticas são calculadas com NumPy sobre a matriz inteira de uma vez.
+
+Uma oferta é considerada uma "oferta real" quando o preço atual está no ou
+abaixo do percentil DEAL_PERCENTILE dos últimos 30 dias, ou mais de
+DEAL_MA_DROP_PERCENT abaixo da média móvel de 7 dias.
+"""
+import asyncio
+import os
+import warnings
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+import numpy as np
+from app.models.price_history import PriceHistory
+
+# Configurações
+STATS_LOOKBACK_DAYS = int(os.getenv("PRICE_STATS_LOOKBACK_DAYS", "90"))
+DEAL_PERCENTILE = float(os.getenv("DEAL_PERCENTILE", "10"))
+DEAL_MA_DROP_PERCENT = float(os.getenv("DEAL_MA_DROP_PERCENT", "15"))
+
+Series = Tuple[np.ndarray, np.ndarray]  # (datas em datetime64[D], preços float64)
+
+
+async def load_price_series(offer_ids: List[str], days: int = STATS_LOOKBACK_DAYS) -> Dict[str, Series]:
+    """
+    Carrega as séries de preço de várias ofertas em lote: as observações da janela
+    e, para cada oferta, a última observação anterior à janela (ponto de partida
+    do preenchimento, já que preços estáveis não geram novos registros)
+    """
+    start_date = datetime.utcnow() - timedelta(days=days)
+
+    collection, window_pipeline = PriceHistory._points_pipeline(offer_ids, start_date)
+    window_pipeline += [
+        {"$match": {"price_discounted": {"$ne": None}}},
+        {"$sort": {"offer_id": 1, "timestamp": 1}},
+        {"$group": {
+            "_id": "$offer_id",
+            "timestamps": {"$push": "$timestamp"},
+            "prices": {"$push": "$price_discounted"}
+        }}
+    ]
+
+    seed_collection, seed_pipeline = PriceHistory._points_pipeline(offer_ids, datetime(1970, 1, 1))
+    seed_pipeline += [
+        {"$match": {"timestamp": {"$lt": start_date}, "price_discounted": {"$ne": None}}},
+        {"$sort": {"offer_id": 1, "timestamp": -1}},
+        {"$group": {
+            "_id": "$offer_id",
+            "timestamp": {"$first": "$timestamp"},
+            "price": {"$first": "$price_discounted"}
+        }}
+    ]
+
+    rows, seeds = await asyncio.gather(
+        collection.aggregate(window_pipeline).to_list(length=None),
+        seed_collection.aggregate(seed_pipeline).to_list(length=None)
+    )
+
+    points: Dict[str, Tuple[list, list]] = {
+        seed["_id"]: ([seed["timestamp"]], [seed["price"]]) for seed in seeds
+    }
+    for row in rows:
+        timestamps, prices = points.setdefault(row["_id"], ([], []))
+        timestamps.extend(row["timestamps"])
+        prices.extend(row["prices"])
+
+    return {
+        offer_id: (
+            np.array(timestamps, dtype="datetime64[ms]").astype("datetime64[D]"),
+            np.array(prices, dtype=np.float64)
+        )
+        for offer_id, (timestamps, prices) in points.items()
+    }
+
+
+def daily_price_matrix(offer_ids: List[str], series: Dict[str, Series], days: int, today: np.datetime64) -> np.ndarray:
+    """
+    Monta a matriz (ofertas x dias) com o último preço observado em cada dia,
+    propagado para frente. Dias antes da primeira observação ficam NaN.
+    """
+    grid = today - np.arange(days - 1, -1, -1)
+    matrix = np.full((len(offer_ids), days), np.nan)
+
+    for row, offer_id in enumerate(offer_ids):
+        if offer_id not in series:
+            continue
+        dates, prices = series[offer_id]
+        # Índice da última observação até o fim de cada dia da grade
+        idx = np.searchsorted(dates, grid, side="right") - 1
+        valid = idx >= 0
+        matrix[row, valid] = prices[idx[valid]]
+
+    return matrix
+
+
+def compute_price_stats(matrix: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Calcula as estatísticas por oferta (linhas da matriz diária).
+    A última coluna é o dia atual; as janelas são de 7 e 30 dias.
+    """
+    window_7 = matrix[:, -7:]
+    window_30 = matrix[:, -30:]
+    current = matrix[:, -1]
+
+    # Linhas sem observação geram NaN (e avisos de fatia vazia) de forma esperada
+    with np.errstate(all="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        ma_7 = np.nanmean(window_7, axis=1)
+        ma_30 = np.nanmean(window_30, axis=1)
+        min_30 = np.nanmin(window_30, axis=1)
+        max_30 = np.nanmax(window_30, axis=1)
+        std_30 = np.nanstd(window_30, axis=1)
+        p10_30 = np.nanpercentile(window_30, DEAL_PERCENTILE, axis=1)
+
+        observed_30 = np.sum(~np.isnan(window_30), axis=1)
+        # Percentual de dias (30d) com preço menor ou igual ao atual
+        percentile_rank = np.sum(window_30 <= current[:, None], axis=1) / np.maximum(observed_30, 1) * 100
+        drop_vs_ma_7 = (ma_7 - current) / ma_7 * 100
+        volatility_30 = std_30 / ma_30 * 100
+
+        # Preço estável está sempre no próprio percentil: exigir variação na janela
+        at_low_percentile = (current <= p10_30) & (current < max_30)
+        is_deal = at_low_percentile | (drop_vs_ma_7 > DEAL_MA_DROP_PERCENT)
+
+        # Score 0-100: metade pela posição no percentil, metade pela queda frente à MM7
+        drop_component = np.clip(np.nan_to_num(drop_vs_ma_7) / DEAL_MA_DROP_PERCENT, 0, 1) * 50
+        rank_component = (100 - percentile_rank) / 2
+        deal_score = np.where(np.isnan(current), np.nan, drop_component + rank_component)
+
+    return {
+        "current_price": current,
+        "moving_avg_7d": ma_7,
+        "moving_avg_30d": ma_30,
+        "min_30d": min_30,
+        "max_30d": max_30,
+        "p10_30d": p10_30,
+        "volatility_30d": volatility_30,
+        "percentile_rank_30d": percentile_rank,
+        "drop_vs_ma7_percent": drop_vs_ma_7,
+        "deal_score": deal_score,
+        "is_deal": is_deal & ~np.isnan(current),
+        "days_observed_30d": observed_30,
+    }
+
+
+def _to_python(value):
+    """Converte escalares NumPy para tipos JSON (NaN vira None)"""
+    if isinstance(value, (np.bool_, bool)):
+        return bool(value)
+    if isinstance(value, (np.integer,)):
+        return int(value)
+    value = float(value)
+    return None if np.isnan(value) else round(value, 2)
+
+
+async def get_offers_price_stats(offer_ids: List[str]) -> Dict[str, Dict]:
+    """Calcula as estatísticas de preço de várias ofertas de uma vez"""
+    offer_ids = list(dict.fromkeys(offer_ids))
+    series = await load_price_series(offer_ids)
+
+    today = np.datetime64(datetime.utcnow().date(), "D")
+    matrix = daily_price_matrix(offer_ids, series, STATS_LOOKBACK_DAYS, today)
+    stats = compute_price_stats(matrix)
+
+    result = {}
+    for row, offer_id in enumerate(offer_ids):
+        if offer_id not in series:
+            result[offer_id] = None
+            continue
+        result[offer_id] = {name: _to_python(values[row]) for name, values in stats.items()}
+    return result
@@ -0,0 +1,144 @@
+"""
+Stream de eventos de mudança de preço (Redis Streams)
+
+Cada mudança de preço (re-scraping ou update_offer) é publicada com XADD no
+stream PRICE_EVENTS_STREAM. Consumidores (bot do Telegram, site) podem ler
+diretamente do Redis ou via SSE em GET /price-history/stream, retomando a
+partir do último id recebido.
+"""
+import json
+import os
+from datetime import datetime
+from typing import AsyncIterator, Dict, Optional
+from app.core import cache
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Configurações
+PRICE_EVENTS_STREAM = os.getenv("PRICE_EVENTS_STREAM", "price_changes")
+PRICE_EVENTS_MAXLEN = int(os.getenv("PRICE_EVENTS_MAXLEN", "100000"))
+SSE_BLOCK_MS = 15000  # Tempo máximo de espera por eventos antes de enviar keep-alive
+
+
+def change_percent(old_price: Optional[float], new_price: Optional[float]) -> Optional[float]:
+    """Variação percentual entre dois preços"""
+    if not old_price or new_price is None:
+        return None
+    return round((new_price - old_price) / old_price * 100, 2)
+
+
+async def publish_price_change(
+    offer_id: str,
+    old_price: Optional[float],
+    new_price: Optional[float],
+    source: str = ""
+) -> Optional[str]:
+    """
+    Publica uma mudança de preço no stream. Retorna o id do evento
+    (None se o preço não mudou ou o Redis não está disponível)
+    """
+    if new_price is None or old_price == new_price or not cache.redis_client:
+        return None
+
+    percent = change_percent(old_price, new_price)
+    event = {
+        "offer_id": offer_id,
+        "old_price": "" if old_price is None else str(old_price),
+        "new_price": str(new_price),
+        "change_percent": "" if percent is None else str(percent),
+        "source": source,
+        "timestamp": datetime.utcnow().isoformat(),
+    }
+
+    try:
+        # MAXLEN aproximado (~) mantém o stream limitado sem custo de corte exato
+        return await cache.redis_client.xadd(
+            PRICE_EVENTS_STREAM, event, maxlen=PRICE_EVENTS_MAXLEN, approximate=True
+        )
+    except Exception as e:
+        logger.warning("price_event_publish_failed", offer_id=offer_id, error=str(e))
+        return None
+
+
+def parse_event(fields: Dict[str, str]) -> Dict:
+    """Converte os campos do stream (strings) para tipos JSON"""
+    def to_float(value):
+        return float(value) if value not in (None, "") else None
+
+    return {
+        "offer_id": fields.get("offer_id"),
+        "old_price": to_float(fields.get("old_price")),
+        "new_price": to_float(fields.get("new_price")),
+        "change_percent": to_float(fields.get("change_percent")),
+        "source": fields.get("source", ""),
+        "timestamp": fields.get("timestamp"),
+    }
+
+
+def matches_filters(
+    event: Dict,
+    min_change_percent: Optional[float] = None,
+    direction: Optional[str] = None,
+    offer_id: Optional[str] = None
+) -> bool:
+    """Filtro aplicado no servidor antes de enviar o evento ao consumidor"""
+    if offer_id and event["offer_id"] != offer_id:
+        return False
+
+    percent = event["change_percent"]
+    if min_change_percent is not None and (percent is None or abs(percent) < min_change_percent):
+        return False
+    if direction == "down" and (percent is None or percent >= 0):
+        return False
+    if direction == "up" and (percent is None or percent <= 0):
+        return False
+
+    return True
+
+
+async def stream_price_events(
+    last_id: str = "$",
+    min_change_percent: Optional[float] = None,
+    direction: Optional[str] = None,
+    offer_id: Optional[str] = None,
+    is_disconnected=None
+) -> AsyncIterator[str]:
+    """
+    Gera eventos no formato SSE a partir de last_id ("$" = apenas novos, "0" = desde o início).
+    O campo id de cada evento é o id do stream, usado para retomar (Last-Event-ID).
+    """
+    yield "retry: 5000\n\n"
+
+    # Resolver "$" para o último id atual: eventos publicados entre duas leituras não se perdem
+    if last_id == "$":
+        try:
+            latest = await cache.redis_client.xrevrange(PRICE_EVENTS_STREAM, count=1)
+            last_id = latest[0][0] if latest else "0-0"
+        except Exception:
+            last_id = "0-0"
+
+    while True:
+        if is_disconnected and await is_disconnected():
+            return
+
+        try:
+            response = await cache.redis_client.xread(
+                {PRICE_EVENTS_STREAM: last_id}, count=100, block=SSE_BLOCK_MS
+            )
+        except Exception as e:
+            logger.warning("price_event_stream_error", error=str(e))
+            yield f"event: error\ndata: {json.dumps({'error': 'stream indisponível'})}\n\n"
+            return
+
+        if not response:
+            # Keep-alive para proxies não encerrarem a conexão ociosa
+            yield ": keep-alive\n\n"
+            continue
+
+        for _stream, entries in response:
+            for entry_id, fields in entries:
+                last_id = entry_id
+                event = parse_event(fields)
+                if matches_filters(event, min_change_percent, direction, offer_id):
+                    yield f"id: {entry_id}\nevent: price_change\ndata: {json.dumps(event)}\n\n"
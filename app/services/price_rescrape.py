@@ -0,0 +1,258 @@
+"""
+Serviço de re-scraping periódico de preços
+
+A cada execução:
+1. Seleciona ofertas aprovadas cuja última verificação é mais antiga que
+   RESCRAPE_MIN_INTERVAL_HOURS, priorizadas por cliques e recência
+2. Processa a fila com um pool limitado de workers (RESCRAPE_WORKERS),
+   respeitando um intervalo mínimo entre requisições ao mesmo marketplace
+3. Grava no histórico (PriceHistory) apenas quando o preço mudou
+4. Registra métricas de vazão e atraso (lag) da execução
+"""
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from app.models.offer import Offer
+from app.models.post import Post
+from app.models.price_history import PriceHistory
+from app.services.offer_extractor.factory import get_extractor
+from app.services.offer_extractor.prices import convert_price_to_float
+from app.services.price_events import publish_price_change
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Configurações
+RESCRAPE_ENABLED = os.getenv("PRICE_RESCRAPE_ENABLED", "false").lower() == "true"
+RESCRAPE_INTERVAL_MINUTES = int(os.getenv("PRICE_RESCRAPE_INTERVAL_MINUTES", "30"))
+RESCRAPE_BATCH_SIZE = int(os.getenv("PRICE_RESCRAPE_BATCH_SIZE", "200"))
+RESCRAPE_MIN_INTERVAL_HOURS = float(os.getenv("PRICE_RESCRAPE_MIN_INTERVAL_HOURS", "6"))
+RESCRAPE_WORKERS = int(os.getenv("PRICE_RESCRAPE_WORKERS", "4"))
+RESCRAPE_MARKETPLACE_DELAY = float(os.getenv("PRICE_RESCRAPE_MARKETPLACE_DELAY_SECONDS", "2"))
+RESCRAPE_TIMEOUT_SECONDS = float(os.getenv("PRICE_RESCRAPE_TIMEOUT_SECONDS", "60"))
+
+# Peso da recência na prioridade: uma oferta criada hoje vale RECENCY_WEIGHT cliques
+RECENCY_WEIGHT = float(os.getenv("PRICE_RESCRAPE_RECENCY_WEIGHT", "50"))
+
+# Métricas da última execução
+metrics: Dict = {
+    "running": False,
+    "runs": 0,
+    "last_run_started_at": None,
+    "last_run_finished_at": None,
+    "last_run_duration_seconds": None,
+    "processed": 0,
+    "changed": 0,
+    "unchanged": 0,
+    "failed": 0,
+    "throughput_per_minute": None,
+    "lag_seconds": None,
+    "backlog": None,
+}
+
+
+# Referência à execução disparada manualmente (evita coleta pelo GC)
+_background_run: Optional[asyncio.Task] = None
+
+
+class MarketplaceRateLimiter:
+    """Garante um intervalo mínimo entre requisições ao mesmo marketplace"""
+
+    def __init__(self, min_delay: float = RESCRAPE_MARKETPLACE_DELAY):
+        self.min_delay = min_delay
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._next_allowed: Dict[str, float] = {}
+
+    async def wait(self, marketplace: str):
+        lock = self._locks.setdefault(marketplace, asyncio.Lock())
+        async with lock:
+            now = time.monotonic()
+            delay = self._next_allowed.get(marketplace, now) - now
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_allowed[marketplace] = time.monotonic() + self.min_delay
+
+
+def _stale_filter(now: datetime) -> Dict:
+    checked_before = now - timedelta(hours=RESCRAPE_MIN_INTERVAL_HOURS)
+    return {
+        "status": "approved",
+        "$or": [
+            {"price_checked_at": None},
+            {"price_checked_at": {"$lt": checked_before}}
+        ]
+    }
+
+
+async def select_offers(now: datetime, limit: int = RESCRAPE_BATCH_SIZE) -> List[Dict]:
+    """
+    Seleciona as ofertas a verificar, ordenadas por prioridade:
+    total_clicks + RECENCY_WEIGHT / (1 + dias desde a criação)
+    """
+    pipeline = [
+        {"$match": _stale_filter(now)},
+        {"$addFields": {
+            "age_days": {"$divide": [{"$subtract": [now, "$created_at"]}, 86400000]}
+        }},
+        {"$addFields": {
+            "priority": {"$add": [
+                {"$ifNull": ["$total_clicks", 0]},
+                {"$divide": [RECENCY_WEIGHT, {"$add": [1, {"$max": ["$age_days", 0]}]}]}
+            ]}
+        }},
+        {"$sort": {"priority": -1}},
+        {"$limit": limit},
+        {"$project": {
+            "source": 1, "url": 1, "extract_url": 1, "price_original": 1,
+            "price_discounted": 1, "discount": 1, "currency": 1, "priority": 1
+        }}
+    ]
+    return await Offer.get_pymongo_collection().aggregate(pipeline).to_list(length=None)
+
+
+async def _oldest_pending_check(now: datetime) -> Tuple[Optional[datetime], int]:
+    """Data de referência da oferta pendente mais atrasada (verificação anterior ou criação)"""
+    pipeline = [
+        {"$match": _stale_filter(now)},
+        {"$group": {
+            "_id": None,
+            "oldest": {"$min": {"$ifNull": ["$price_checked_at", "$created_at"]}},
+            "backlog": {"$sum": 1}
+        }}
+    ]
+    rows = await Offer.get_pymongo_collection().aggregate(pipeline).to_list(length=1)
+    return (rows[0]["oldest"], rows[0]["backlog"]) if rows else (None, 0)
+
+
+async def rescrape_offer(offer: Dict, limiter: MarketplaceRateLimiter) -> str:
+    """
+    Re-extrai o preço de uma oferta. Retorna "changed", "unchanged" ou "failed".
+    """
+    url = offer.get("extract_url") or offer["url"]
+    now = datetime.utcnow()
+    collection = Offer.get_pymongo_collection()
+
+    try:
+        await limiter.wait(offer.get("source") or "unknown")
+        extractor = get_extractor(url)
+        # Extratores são síncronos (requests): executar fora do event loop
+        data = await asyncio.wait_for(asyncio.to_thread(extractor.extract), RESCRAPE_TIMEOUT_SECONDS)
+    except Exception as e:
+        logger.warning("price_rescrape_failed", offer_id=str(offer["_id"]), error=str(e))
+        await collection.update_one({"_id": offer["_id"]}, {"$set": {"price_checked_at": now}})
+        return "failed"
+
+    new_price = convert_price_to_float(data.get("price", ""))
+    new_original = convert_price_to_float(data.get("original_price", ""))
+
+    if new_price is None or new_price == offer.get("price_discounted"):
+        await collection.update_one({"_id": offer["_id"]}, {"$set": {"price_checked_at": now}})
+        return "unchanged" if new_price is not None else "failed"
+
+    discount = data.get("discount") or offer.get("discount")
+    await collection.update_one(
+        {"_id": offer["_id"]},
+        {"$set": {
+            "price_discounted": new_price,
+            "price_original": new_original if new_original is not None else offer.get("price_original"),
+            "discount": discount,
+            "price_checked_at": now,
+            "updated_at": now
+        }}
+    )
+    await Post.sync_offer_fields(str(offer["_id"]), {"offer_price": new_price})
+    await PriceHistory.record(
+        offer_id=str(offer["_id"]),
+        price_original=new_original if new_original is not None else offer.get("price_original"),
+        price_discounted=new_price,
+        discount=discount,
+        currency=offer.get("currency") or "BRL",
+        source="rescrape"
+    )
+    await publish_price_change(str(offer["_id"]), offer.get("price_discounted"), new_price, source="rescrape")
+    logger.info(
+        "price_rescrape_changed",
+        offer_id=str(offer["_id"]),
+        old_price=offer.get("price_discounted"),
+        new_price=new_price
+    )
+    return "changed"
+
+
+async def run_price_rescrape() -> Dict:
+    """Executa um ciclo completo de re-scraping e atualiza as métricas"""
+    if metrics["running"]:
+        logger.info("price_rescrape_skipped", reason="already_running")
+        return metrics
+
+    started = time.monotonic()
+    now = datetime.utcnow()
+    metrics.update({"running": True, "last_run_started_at": now})
+    counts = {"changed": 0, "unchanged": 0, "failed": 0}
+
+    try:
+        offers = await select_offers(now)
+        queue: asyncio.Queue = asyncio.Queue()
+        for offer in offers:
+            queue.put_nowait(offer)
+
+        limiter = MarketplaceRateLimiter()
+
+        async def worker():
+            while True:
+                try:
+                    offer = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    result = await rescrape_offer(offer, limiter)
+                except Exception as e:
+                    # Erros fora da extração (gravação, histórico, publicação) não interrompem o ciclo
+                    logger.error("price_rescrape_offer_error", offer_id=str(offer.get("_id")), error=str(e))
+                    result = "failed"
+                counts[result] += 1
+
+        await asyncio.gather(*(worker() for _ in range(max(1, min(RESCRAPE_WORKERS, len(offers))))))
+
+        finished = datetime.utcnow()
+        duration = time.monotonic() - started
+        processed = sum(counts.values())
+        oldest, backlog = await _oldest_pending_check(finished)
+
+        metrics.update({
+            "runs": metrics["runs"] + 1,
+            "last_run_finished_at": finished,
+            "last_run_duration_seconds": round(duration, 2),
+            "processed": processed,
+            **counts,
+            "throughput_per_minute": round(processed / duration * 60, 2) if duration > 0 else None,
+            # Lag: há quanto tempo a oferta mais atrasada aguarda verificação
+            "lag_seconds": round((finished - oldest).total_seconds(), 0) if oldest else 0,
+            "backlog": backlog,
+        })
+        logger.info(
+            "price_rescrape_completed",
+            processed=processed,
+            duration_seconds=metrics["last_run_duration_seconds"],
+            throughput_per_minute=metrics["throughput_per_minute"],
+            lag_seconds=metrics["lag_seconds"],
+            backlog=backlog,
+            **counts
+        )
+    except Exception as e:
+        logger.error("price_rescrape_error", error=str(e))
+    finally:
+        metrics["running"] = False
+
+    return metrics
+
+
+def start_background_run() -> bool:
+    """Dispara uma execução em segundo plano. Retorna False se já houver uma em andamento"""
+    global _background_run
+    if metrics["running"] or (_background_run and not _background_run.done()):
+        return False
+    _background_run = asyncio.create_task(run_price_rescrape())
+    return True
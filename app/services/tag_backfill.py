@@ -0,0 +1,199 @@
+"""
+Geração de tags em lote como job em segundo plano
+
+As ofertas sem tags são lidas por um cursor (sem carregar tudo em memória) e
+processadas por TAG_BACKFILL_CONCURRENCY workers. As chamadas à IA passam por um
+token bucket (TAG_BACKFILL_RATE_PER_MINUTE) e as tags são gravadas em lote com
+bulk_write. O progresso fica disponível pelo ID do job (também no Redis, para
+consultas atendidas por outro worker).
+"""
+import asyncio
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from pymongo import UpdateOne
+from app.core.cache import get_cached, set_cached
+from app.core.logging import get_logger
+from app.models.offer import Offer
+from app.services.ai_categorization import generate_tags
+
+logger = get_logger(__name__)
+
+# Configurações
+TAG_BACKFILL_CONCURRENCY = int(os.getenv("TAG_BACKFILL_CONCURRENCY", "4"))
+TAG_BACKFILL_RATE_PER_MINUTE = float(os.getenv("TAG_BACKFILL_RATE_PER_MINUTE", "120"))
+TAG_BACKFILL_WRITE_BATCH = int(os.getenv("TAG_BACKFILL_WRITE_BATCH", "50"))
+JOB_TTL_SECONDS = 7 * 86400
+
+UNTAGGED_QUERY = {"$or": [{"tags": []}, {"tags": None}]}
+
+
+class TokenBucket:
+    """Limita a taxa média (rate por segundo) permitindo rajadas de até `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+# Jobs deste processo (a task mantém a referência viva até o fim)
+jobs: Dict[str, Dict[str, Any]] = {}
+_tasks: Dict[str, asyncio.Task] = {}
+
+
+def _job_key(job_id: str) -> str:
+    return f"tag_backfill:job:{job_id}"
+
+
+async def _publish(job: Dict[str, Any]):
+    """Atualiza as métricas derivadas e replica o estado no Redis"""
+    elapsed = ((job["finished_at"] or datetime.utcnow()) - job["started_at"]).total_seconds()
+    job["rate_per_minute"] = round(job["processed"] / elapsed * 60, 2) if elapsed > 0 else None
+    remaining = max(job["total"] - job["processed"], 0)
+    job["eta_seconds"] = (
+        round(remaining / (job["processed"] / elapsed)) if job["status"] == "running" and job["processed"] and elapsed > 0 else None
+    )
+    await set_cached(_job_key(job["job_id"]), job, ttl=JOB_TTL_SECONDS)
+
+
+async def run_tag_backfill(job: Dict[str, Any]):
+    """Executa o job: cursor -> fila -> workers limitados -> bulk_write"""
+    collection = Offer.get_pymongo_collection()
+    bucket = TokenBucket(TAG_BACKFILL_RATE_PER_MINUTE / 60, capacity=TAG_BACKFILL_CONCURRENCY)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=TAG_BACKFILL_CONCURRENCY * 2)
+    pending_writes: List[UpdateOne] = []
+    write_lock = asyncio.Lock()
+
+    async def flush():
+        async with write_lock:
+            operations = pending_writes[:]
+            pending_writes.clear()
+            if not operations:
+                return
+            result = await collection.bulk_write(operations, ordered=False)
+            job["updated"] += result.modified_count
+            await _publish(job)
+
+    async def worker():
+        while True:
+            offer = await queue.get()
+            if offer is None:
+                return
+            try:
+                # O bucket só é consumido quando a IA é de fato chamada (não em cache/keywords)
+                tags = await generate_tags(
+                    offer.get("title", ""), offer.get("description"), offer.get("category"), rate_limiter=bucket
+                )
+                if tags:
+                    pending_writes.append(UpdateOne(
+                        {"_id": offer["_id"], **UNTAGGED_QUERY},
+                        {"$set": {"tags": tags, "updated_at": datetime.utcnow()}}
+                    ))
+            except Exception as e:
+                job["errors"] += 1
+                if len(job["error_details"]) < 10:
+                    job["error_details"].append({"offer_id": str(offer["_id"]), "error": str(e)})
+                logger.error("batch_tags_generation_failed", offer_id=str(offer["_id"]), error=str(e))
+            finally:
+                job["processed"] += 1
+            if len(pending_writes) >= TAG_BACKFILL_WRITE_BATCH:
+                await flush()
+
+    workers = [asyncio.create_task(worker()) for _ in range(TAG_BACKFILL_CONCURRENCY)]
+    try:
+        job["total"] = await collection.count_documents(UNTAGGED_QUERY)
+        await _publish(job)
+
+        cursor = collection.find(UNTAGGED_QUERY, {"title": 1, "description": 1, "category": 1})
+        async for offer in cursor:
+            await queue.put(offer)
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+        await flush()
+        job["status"] = "completed"
+    except asyncio.CancelledError:
+        for task in workers:
+            task.cancel()
+        await flush()
+        job["status"] = "cancelled"
+    except Exception as e:
+        for task in workers:
+            task.cancel()
+        job["status"] = "failed"
+        job["error_details"].append({"error": str(e)})
+        logger.error("batch_tags_generation_error", job_id=job["job_id"], error=str(e))
+    finally:
+        job["finished_at"] = datetime.utcnow()
+        await _publish(job)
+        _tasks.pop(job["job_id"], None)
+        logger.info(
+            "batch_tags_job_finished",
+            job_id=job["job_id"],
+            status=job["status"],
+            processed=job["processed"],
+            updated=job["updated"],
+            errors=job["errors"]
+        )
+
+
+def get_running_job() -> Optional[Dict[str, Any]]:
+    return next((jobs[job_id] for job_id in _tasks), None)
+
+
+async def start_tag_backfill() -> Dict[str, Any]:
+    """Inicia um job (ou retorna o que já está em execução neste processo)"""
+    running = get_running_job()
+    if running:
+        return running
+
+    job = {
+        "job_id": uuid.uuid4().hex,
+        "status": "running",
+        "total": 0,
+        "processed": 0,
+        "updated": 0,
+        "errors": 0,
+        "error_details": [],
+        "concurrency": TAG_BACKFILL_CONCURRENCY,
+        "rate_limit_per_minute": TAG_BACKFILL_RATE_PER_MINUTE,
+        "started_at": datetime.utcnow(),
+        "finished_at": None,
+        "rate_per_minute": None,
+        "eta_seconds": None,
+    }
+    jobs[job["job_id"]] = job
+    _tasks[job["job_id"]] = asyncio.create_task(run_tag_backfill(job))
+    logger.info("batch_tags_job_started", job_id=job["job_id"])
+    return job
+
+
+async def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Estado do job: deste processo ou, se iniciado em outro worker, do Redis"""
+    if job_id in jobs:
+        return jobs[job_id]
+    return await get_cached(_job_key(job_id))
+
+
+def cancel_job(job_id: str) -> bool:
+    task = _tasks.get(job_id)
+    if not task:
+        return False
+    task.cancel()
+    return True
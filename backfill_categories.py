@@ -0,0 +1,79 @@
+"""
+Script para categorizar em lote as ofertas sem categoria.
+
+1. Lê as ofertas sem categoria (opcionalmente também as marcadas como "Outros")
+2. Categoriza em lotes com categorize_offers_batch (vários títulos por chamada à IA)
+3. Grava as categorias com bulk_write
+
+Uso:
+    python backfill_categories.py [--include-outros] [--page-size 500] [--batch-size 25] [--dry-run]
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime
+import motor.motor_asyncio
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+
+load_dotenv()
+
+from app.services.ai_categorization import categorize_offers_batch, init_ai
+from app.services.local_classifier import init_local_classifier
+
+
+async def main(args):
+    mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+    mongo_db = os.getenv("MONGO_DB", "ecosystem_db")
+    offers = motor.motor_asyncio.AsyncIOMotorClient(mongo_uri)[mongo_db].offers
+
+    init_ai()
+    init_local_classifier()
+
+    missing = [None, ""] + (["Outros"] if args.include_outros else [])
+    query = {"category": {"$in": missing}}
+    total = await offers.count_documents(query)
+    print(f"📦 {total} ofertas para categorizar")
+
+    started = time.perf_counter()
+    processed, updated, methods = 0, 0, {}
+    cursor = offers.find(query, {"title": 1, "description": 1})
+    while True:
+        page = await cursor.to_list(length=args.page_size)
+        if not page:
+            break
+
+        results = await categorize_offers_batch(
+            [offer.get("title") or "" for offer in page],
+            [offer.get("description") for offer in page],
+            batch_size=args.batch_size
+        )
+
+        operations = []
+        for offer, result in zip(page, results):
+            methods[result["category_method"]] = methods.get(result["category_method"], 0) + 1
+            if result["category"] != "Outros" or not args.include_outros:
+                operations.append(UpdateOne(
+                    {"_id": offer["_id"]},
+                    {"$set": {"category": result["category"], "updated_at": datetime.utcnow()}}
+                ))
+        if operations and not args.dry_run:
+            updated += (await offers.bulk_write(operations, ordered=False)).modified_count
+
+        processed += len(page)
+        elapsed = time.perf_counter() - started
+        print(f"   {processed}/{total} ({processed / elapsed:.1f} ofertas/s)")
+
+    print(f"\n✅ {processed} ofertas processadas, {updated} atualizadas" + (" (dry-run)" if args.dry_run else ""))
+    for method, count in sorted(methods.items()):
+        print(f"   {method}: {count}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Categoriza em lote as ofertas sem categoria")
+    parser.add_argument("--include-outros", action="store_true", help="Recategoriza também as ofertas em \"Outros\"")
+    parser.add_argument("--page-size", type=int, default=500, help="Ofertas lidas do banco por vez")
+    parser.add_argument("--batch-size", type=int, default=25, help="Títulos por chamada à IA")
+    parser.add_argument("--dry-run", action="store_true", help="Não grava as categorias")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,120 @@
+"""
+Benchmark: latência de endpoints não relacionados durante uma rajada de logins.
+
+Enquanto N logins concorrentes verificam senha (bcrypt), um endpoint leve é
+chamado a cada poucos milissegundos e sua latência (p50/p99/máx) é medida.
+
+Modos:
+- local (padrão): app mínima em processo comparando bcrypt no event loop
+  (comportamento antigo) com o pool de threads de app/core/passwords.py
+- --base-url: contra um servidor em execução (POST /users/login + GET /health/)
+
+Uso:
+    python benchmark_login_storm.py [--logins 20] [--concurrency 10]
+    python benchmark_login_storm.py --base-url http://localhost:8000 --email admin@x.com --password ...
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import bcrypt
+import httpx
+from fastapi import FastAPI
+from app.core import passwords
+
+PASSWORD = "senha-de-teste"
+
+
+def build_local_app() -> FastAPI:
+    app = FastAPI()
+    password_hash = bcrypt.hashpw(PASSWORD.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+
+    @app.post("/login/inline")
+    async def login_inline(data: dict):
+        return {"ok": bcrypt.checkpw(data["password"].encode("utf-8"), password_hash.encode("utf-8"))}
+
+    @app.post("/login/pool")
+    async def login_pool(data: dict):
+        return {"ok": await passwords.verify_password(data["password"], password_hash)}
+
+    @app.get("/ping")
+    async def ping():
+        return {"pong": True}
+
+    return app
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def storm(client: httpx.AsyncClient, login_path: str, login_body: dict, probe_path: str, logins: int, concurrency: int):
+    """Dispara os logins e mede a latência do endpoint leve até a rajada terminar"""
+    semaphore = asyncio.Semaphore(concurrency)
+    login_times, probe_times = [], []
+    done = asyncio.Event()
+
+    async def login():
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post(login_path, json=login_body)
+            response.raise_for_status()
+            login_times.append((time.perf_counter() - started) * 1000)
+
+    async def probe():
+        # Uma chamada a cada 10 ms; a latência conta a partir do horário previsto, então
+        # chamadas que deveriam ter saído enquanto o event loop estava bloqueado também contam
+        interval = 0.01
+        next_at = time.perf_counter()
+        while not done.is_set():
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await client.get(probe_path)
+            finished = time.perf_counter()
+            while next_at <= finished:
+                probe_times.append((finished - next_at) * 1000)
+                next_at += interval
+
+    prober = asyncio.create_task(probe())
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await prober
+    return login_times, probe_times, elapsed
+
+
+def report(label: str, login_times, probe_times, elapsed: float):
+    print(f"\n📊 {label}")
+    print(f"   Logins: {len(login_times)} em {elapsed:.2f}s ({len(login_times) / elapsed:.1f}/s), "
+          f"p50 {statistics.median(login_times):.0f}ms")
+    print(f"   Endpoint leve ({len(probe_times)} chamadas previstas): p50 {statistics.median(probe_times):.1f}ms, "
+          f"p99 {percentile(probe_times, 0.99):.1f}ms, máx {max(probe_times):.1f}ms")
+
+
+async def main(args):
+    if args.base_url:
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=60) as client:
+            body = {"email": args.email, "password": args.password}
+            report(args.base_url, *await storm(client, "/users/login", body, "/health/", args.logins, args.concurrency))
+        return
+
+    transport = httpx.ASGITransport(app=build_local_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=60) as client:
+        body = {"password": PASSWORD}
+        for label, path in [("bcrypt no event loop (antes)", "/login/inline"), ("bcrypt no pool de threads", "/login/pool")]:
+            report(label, *await storm(client, path, body, "/ping", args.logins, args.concurrency))
+
+    print(f"\n🧵 Pool: {passwords.get_password_metrics()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latência de endpoints durante uma rajada de logins")
+    parser.add_argument("--logins", type=int, default=20, help="Total de logins da rajada")
+    parser.add_argument("--concurrency", type=int, default=10, help="Logins simultâneos")
+    parser.add_argument("--base-url", help="Servidor em execução (sem isso, usa uma app local)")
+    parser.add_argument("--email", help="Email para login (com --base-url)")
+    parser.add_argument("--password", help="Senha para login (com --base-url)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,110 @@
+"""
+Script para migrar offer_clicks, page_views e price_history para time-series collections.
+
+Para cada collection que ainda não é time-series:
+1. Renomeia a collection atual para <nome>_legacy
+2. Cria a nova time-series collection (timeField/metaField/expireAfterSeconds do modelo)
+3. Copia os documentos existentes em lotes
+4. Remove a collection legada (apenas com --drop-legacy)
+
+Uso:
+    python migrate_timeseries.py [--batch-size 5000] [--drop-legacy]
+"""
+import argparse
+import asyncio
+import os
+import motor.motor_asyncio
+from dotenv import load_dotenv
+from app.models.offer_click import OfferClick
+from app.models.page_view import PageView
+from app.models.price_history import PriceHistory
+
+load_dotenv()
+
+MODELS = [OfferClick, PageView, PriceHistory]
+
+
+async def is_timeseries(db, name: str) -> bool:
+    """Verifica se a collection já é time-series"""
+    async for info in db.list_collections(filter={"name": name}):
+        return info.get("type") == "timeseries"
+    return False
+
+
+async def migrate_collection(db, model, batch_size: int, drop_legacy: bool):
+    settings = model.Settings
+    name = settings.name
+    legacy_name = f"{name}_legacy"
+    existing = await db.list_collection_names()
+    renamed = False
+
+    if name in existing and await is_timeseries(db, name):
+        print(f"✅ {name}: já é time-series")
+    elif name in existing:
+        print(f"🔧 {name}: renomeando para {legacy_name}")
+        await db[name].rename(legacy_name)
+        existing.append(legacy_name)
+        renamed = True
+
+    if name not in await db.list_collection_names():
+        await db.create_collection(**settings.timeseries.build_query(name))
+        print(f"🆕 {name}: time-series criada (timeField={settings.timeseries.time_field})")
+
+    if legacy_name not in existing:
+        return
+
+    legacy = db[legacy_name]
+    target = db[name]
+
+    # Evita duplicar dados ao reexecutar após uma migração concluída
+    if not renamed and await target.estimated_document_count() > 0:
+        print(f"⚠️  {name}: {legacy_name} já existe e a time-series não está vazia, pulando cópia")
+        return
+
+    time_field = settings.timeseries.time_field
+    total = await legacy.count_documents({})
+    copied = 0
+    batch = []
+
+    print(f"📦 {name}: copiando {total} documentos em lotes de {batch_size}")
+    async for doc in legacy.find({}).sort(time_field, 1).batch_size(batch_size):
+        # Documentos sem campo de tempo não podem ser inseridos em time-series
+        if doc.get(time_field) is None:
+            continue
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            await target.insert_many(batch, ordered=False)
+            copied += len(batch)
+            batch = []
+            print(f"   {copied}/{total}")
+
+    if batch:
+        await target.insert_many(batch, ordered=False)
+        copied += len(batch)
+
+    print(f"✨ {name}: {copied} documentos migrados")
+
+    if drop_legacy:
+        await legacy.drop()
+        print(f"🧹 {legacy_name} removida")
+
+
+async def migrate(batch_size: int, drop_legacy: bool):
+    mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+    mongo_db = os.getenv("MONGO_DB", "ecosystem_db")
+
+    client = motor.motor_asyncio.AsyncIOMotorClient(mongo_uri)
+    db = client[mongo_db]
+
+    for model in MODELS:
+        await migrate_collection(db, model, batch_size, drop_legacy)
+
+    print("\n💡 Reinicie a aplicação para recriar os índices nas novas collections.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migra eventos brutos para time-series collections")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Documentos por lote de inserção")
+    parser.add_argument("--drop-legacy", action="store_true", help="Remove as collections legadas após a cópia")
+    args = parser.parse_args()
+    asyncio.run(migrate(args.batch_size, args.drop_legacy))
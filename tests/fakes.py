@@ -0,0 +1,97 @@
+"""
+Dublês compartilhados pelos testes (sem MongoDB nem Redis reais)
+"""
+import asyncio
+from types import SimpleNamespace
+from fastapi.security import HTTPAuthorizationCredentials
+from app.core import security
+from app.models.user import User
+from app.services import ai_categorization
+
+USER_ID = "65f000000000000000000001"
+
+
+class MemoryRedis:
+    """Subconjunto do cliente Redis usado pela aplicação, em memória"""
+
+    def __init__(self):
+        self.data = {}
+        self.hashes = {}
+        self.streams = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def mget(self, *keys):
+        return [self.data.get(key) for key in keys]
+
+    async def setex(self, key, ttl, value):
+        self.data[key] = value
+
+    async def hincrby(self, key, field, amount):
+        values = self.hashes.setdefault(key, {})
+        values[field] = str(int(values.get(field, 0)) + amount)
+
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    async def xadd(self, name, fields, maxlen=None, approximate=True):
+        entries = self.streams.setdefault(name, [])
+        entry_id = f"{len(entries) + 1}-0"
+        entries.append((entry_id, dict(fields)))
+        if maxlen:
+            del entries[:-maxlen]
+        return entry_id
+
+    async def xrevrange(self, name, count=None):
+        return list(reversed(self.streams.get(name, [])))[:count]
+
+    async def xread(self, streams, count=None, block=None):
+        def sequence(entry_id):
+            return tuple(int(part) for part in entry_id.split("-"))
+
+        response = []
+        for name, last_id in streams.items():
+            entries = [entry for entry in self.streams.get(name, []) if sequence(entry[0]) > sequence(last_id)]
+            if entries:
+                response.append([name, entries[:count]])
+        return response
+
+
+class FakeCompletions:
+    """Cliente OpenAI simulado: responde `content` após `delay` segundos"""
+
+    def __init__(self, content: str, delay: float = 0):
+        self.content = content
+        self.delay = delay
+        self.calls = []
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        await asyncio.sleep(self.delay)
+        message = SimpleNamespace(content=self.content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def fake_client(monkeypatch, content: str, delay: float = 0) -> FakeCompletions:
+    completions = FakeCompletions(content, delay)
+    monkeypatch.setattr(ai_categorization, "client", SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+    return completions
+
+
+def fake_users(monkeypatch) -> SimpleNamespace:
+    """User.get simulado: conta as leituras do banco"""
+    store = {USER_ID: SimpleNamespace(id=USER_ID, role="moderator", is_active=True)}
+    reads = []
+
+    async def fake_get(user_id):
+        reads.append(user_id)
+        return store.get(str(user_id))
+
+    monkeypatch.setattr(User, "get", fake_get)
+    monkeypatch.setattr(security, "_user_cache", {})
+    return SimpleNamespace(store=store, reads=reads)
+
+
+def credentials(user_id: str = USER_ID) -> HTTPAuthorizationCredentials:
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=security.create_access_token({"sub": user_id}))
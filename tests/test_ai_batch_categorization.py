@@ -0,0 +1,104 @@
+"""
+Testes da categorização em lote contra um servidor local compatível com a API da OpenAI (stand-in)
+"""
+import json
+import re
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+from openai import AsyncOpenAI
+from app.services import ai_categorization
+
+ITEM_REGEX = re.compile(r"^(\d+)\. (.+)$", re.MULTILINE)
+
+
+def make_standin(answers, broken_first_call: bool = False):
+    """
+    Endpoint /v1/chat/completions que categoriza os produtos numerados do prompt
+    com `answers` (título -> categoria). Na primeira chamada (se `broken_first_call`)
+    inventa uma categoria para o primeiro item e omite o segundo
+    """
+    standin = FastAPI()
+    standin.state.calls = []
+
+    @standin.post("/v1/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        items = ITEM_REGEX.findall(body["messages"][-1]["content"])
+        standin.state.calls.append([title for _, title in items])
+
+        results = [{"id": int(item_id), "category": answers[title]} for item_id, title in items]
+        if broken_first_call and len(standin.state.calls) == 1:
+            results[0]["category"] = "Categoria Inventada"
+            del results[1]
+
+        return {
+            "id": "chatcmpl-standin",
+            "object": "chat.completion",
+            "created": 0,
+            "model": body["model"],
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": json.dumps({"results": results})}
+            }]
+        }
+
+    return standin
+
+
+@pytest.fixture
+def use_standin(monkeypatch):
+    def use(standin: FastAPI):
+        http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=standin))
+        client = AsyncOpenAI(api_key="test", base_url="http://standin/v1", http_client=http_client, max_retries=0)
+        monkeypatch.setattr(ai_categorization, "client", client)
+        monkeypatch.setattr(ai_categorization, "predict_category", lambda title: None)
+    return use
+
+
+ANSWERS = {
+    "Smartphone Galaxy A15": "Celulares e Telefonia",
+    "Notebook Ideapad 3": "Computadores e Informática",
+    "Ração Golden 15kg": "Pet Shop",
+    "Whey Protein 900g": "Saúde e Cuidados Pessoais",
+    "Cafeteira Expresso": "Casa e Eletrodomésticos",
+}
+
+
+@pytest.mark.asyncio
+async def test_batch_packs_titles_into_few_calls(use_standin):
+    standin = make_standin(ANSWERS)
+    use_standin(standin)
+    titles = list(ANSWERS)
+
+    results = await ai_categorization.categorize_offers_batch(titles, batch_size=2)
+
+    assert [r["category"] for r in results] == list(ANSWERS.values())
+    assert all(r["category_method"] == "ai" for r in results)
+    assert [len(call) for call in standin.state.calls] == [2, 2, 1]
+
+
+@pytest.mark.asyncio
+async def test_batch_retries_only_invalid_and_missing_items(use_standin):
+    standin = make_standin(ANSWERS, broken_first_call=True)
+    use_standin(standin)
+    titles = list(ANSWERS)
+
+    results = await ai_categorization.categorize_offers_batch(titles)
+
+    assert [r["category"] for r in results] == list(ANSWERS.values())
+    assert len(standin.state.calls) == 2
+    assert standin.state.calls[1] == titles[:2]
+
+
+@pytest.mark.asyncio
+async def test_batch_falls_back_to_keywords_after_retries(use_standin):
+    standin = make_standin({**ANSWERS, "Pneu aro 15": "Categoria Inventada"})
+    use_standin(standin)
+
+    results = await ai_categorization.categorize_offers_batch(["Pneu aro 15", "Notebook Ideapad 3"], max_retries=1)
+
+    assert results[0] == {"category": "Automotivo", "category_method": "keywords"}
+    assert results[1] == {"category": "Computadores e Informática", "category_method": "ai"}
+    assert standin.state.calls == [["Pneu aro 15", "Notebook Ideapad 3"], ["Pneu aro 15"]]
@@ -0,0 +1,42 @@
+"""
+Testes do cache de respostas da IA por título normalizado
+"""
+import json
+import pytest
+from app.core import cache
+from app.services import ai_categorization
+from app.services.ai_cache import AICache, normalize_title, title_fingerprint
+from tests.fakes import MemoryRedis, fake_client
+
+
+def test_near_identical_titles_share_fingerprint():
+    a = "Smartphone Samsung Galaxy A15 128GB 4GB RAM - Preto"
+    b = "Samsung Galaxy A15 Smartphone 128 GB, 4 GB RAM Preto | Frete Grátis"
+    assert title_fingerprint(a) == title_fingerprint(b)
+    assert normalize_title('Smart TV 50" 4K') == normalize_title("Smart TV 50 polegadas 4K")
+    assert normalize_title("Óleo 2,50 litros") == "2.5l oleo"
+
+
+def test_different_products_do_not_collide():
+    assert title_fingerprint("Samsung Galaxy A15") != title_fingerprint("Samsung Galaxy M15")
+    assert title_fingerprint("SSD 1TB") != title_fingerprint("SSD 2TB")
+    # Negação/preposição com significado não pode ser descartada
+    assert title_fingerprint("Fone com fio") != title_fingerprint("Fone sem fio")
+
+
+@pytest.mark.asyncio
+async def test_ai_called_only_for_new_titles(monkeypatch):
+    monkeypatch.setattr(cache, "redis_client", MemoryRedis())
+    monkeypatch.setattr(ai_categorization, "ai_cache", AICache())
+    answer = json.dumps({"category": "Celulares e Telefonia", "tags": ["samsung", "a15"]})
+    completions = fake_client(monkeypatch, answer)
+
+    first = await ai_categorization.classify_offer("Samsung Galaxy A15 128GB")
+    second = await ai_categorization.classify_offer("SAMSUNG Galaxy A15 - 128 GB (Frete Grátis)")
+
+    assert len(completions.calls) == 1
+    assert first["category"] == second["category"] == "Celulares e Telefonia"
+    assert second["tags"] == ["samsung", "a15"]
+
+    stats = await ai_categorization.ai_cache.get_stats()
+    assert stats["total"]["category"] == {"hits": 1, "misses": 1, "hit_rate": 50.0}
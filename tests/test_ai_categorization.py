@@ -0,0 +1,96 @@
+"""
+Testes da categorização de ofertas (IA com orçamento de latência e fallback)
+"""
+import asyncio
+import json
+import pytest
+from app.services import ai_categorization
+from tests.fakes import fake_client
+
+
+@pytest.mark.asyncio
+async def test_combined_prompt_single_call(monkeypatch):
+    answer = json.dumps({"category": "Games e Consoles", "tags": ["PS5", "sony", "console"]})
+    completions = fake_client(monkeypatch, answer)
+
+    result = await ai_categorization.classify_offer("Console PlayStation 5 Slim")
+
+    assert len(completions.calls) == 1
+    assert result["category"] == "Games e Consoles"
+    assert result["tags"] == ["ps5", "sony", "console"]
+    assert result["category_method"] == result["tags_method"] == "ai"
+
+
+@pytest.mark.asyncio
+async def test_latency_budget_falls_back_to_keywords(monkeypatch):
+    fake_client(monkeypatch, json.dumps({"category": "Eletrônicos", "tags": []}), delay=1)
+
+    result = await ai_categorization.classify_offer("Smartphone Samsung Galaxy A15", budget=0.05)
+
+    assert result["category"] == "Celulares e Telefonia"
+    assert result["category_method"] == "keywords"
+    assert "smartphone" in result["tags"]
+
+
+@pytest.mark.asyncio
+async def test_unknown_category_falls_back_to_keywords(monkeypatch):
+    fake_client(monkeypatch, json.dumps({"category": "Categoria Inventada", "tags": ["x"]}))
+
+    result = await ai_categorization.classify_offer("Ração para gato 10kg")
+
+    assert result["category"] == "Pet Shop"
+    assert result["category_method"] == "keywords"
+
+
+@pytest.mark.asyncio
+async def test_separate_calls_run_concurrently(monkeypatch):
+    monkeypatch.setattr(ai_categorization, "AI_COMBINED_PROMPT", False)
+    completions = fake_client(monkeypatch, "Automotivo", delay=0.2)
+
+    started = asyncio.get_running_loop().time()
+    result = await ai_categorization.classify_offer("Pneu aro 15", budget=1)
+    elapsed = asyncio.get_running_loop().time() - started
+
+    assert len(completions.calls) == 2
+    assert elapsed < 0.35
+    assert result["category"] == "Automotivo"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("local", [None, ("Games e Consoles", 0.95)])
+async def test_ai_error_labels_tags_as_keywords(monkeypatch, local):
+    monkeypatch.setattr(ai_categorization, "AI_COMBINED_PROMPT", False)
+    monkeypatch.setattr(ai_categorization, "predict_category", lambda title: local)
+    completions = fake_client(monkeypatch, "")
+
+    async def failing_create(**kwargs):
+        raise RuntimeError("openai indisponível")
+
+    completions.create = failing_create
+
+    result = await ai_categorization.classify_offer("Console PlayStation 5 Slim", budget=1)
+
+    # generate_tags caiu nas keywords internamente: não pode ser contado como "ai"
+    assert result["tags"]
+    assert result["tags_method"] == "keywords"
+
+
+def test_keywords_match_whole_words_only():
+    assert ai_categorization.categorize_by_keywords("Cabo HDMI 2 metros") == "Outros"
+    assert ai_categorization.categorize_by_keywords("Carpete para sala") == "Outros"
+    assert ai_categorization.categorize_by_keywords("Kit 3 games PS5") == "Games e Consoles"
+    assert ai_categorization.categorize_by_keywords("Fogao 4 bocas") == "Casa e Eletrodomésticos"
+
+
+def test_keywords_score_categories():
+    # "mouse" e "teclado" (informática) superam "game" (games)
+    assert ai_categorization.categorize_by_keywords("Kit teclado e mouse game") == "Computadores e Informática"
+
+
+def test_batch_keywords_match_single_title():
+    titles = ["Smartphone Samsung Galaxy A15", "Ração para gatos", "", "Cabo HDMI", "Tênis\nde corrida"]
+
+    assert ai_categorization.categorize_titles_by_keywords(titles) == [
+        ai_categorization.categorize_by_keywords(title) for title in titles
+    ]
+    assert ai_categorization.categorize_titles_by_keywords([]) == []
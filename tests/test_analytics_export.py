@@ -0,0 +1,50 @@
+"""
+Testes para exportação de analytics
+"""
+import pytest
+from datetime import datetime
+from httpx import AsyncClient
+from app.services import analytics_export
+
+
+def test_build_export_query_clicks():
+    """Testa filtro de exportação de cliques"""
+    start = datetime(2025, 1, 1)
+    end = datetime(2025, 2, 1)
+    query = analytics_export.build_export_query(
+        "clicks", start=start, end=end, offer_id="abc", source="home", page="ignored"
+    )
+    assert query == {
+        "clicked_at": {"$gte": start, "$lt": end},
+        "offer_id": "abc",
+        "source": "home"
+    }
+
+
+def test_build_export_query_pageviews():
+    """Testa filtro de exportação de visualizações"""
+    query = analytics_export.build_export_query("pageviews", page="home", offer_id="ignored")
+    assert query == {"page": "home"}
+
+
+@pytest.mark.asyncio
+async def test_stream_csv_batches(monkeypatch):
+    """Testa que o CSV é gerado lote a lote com um único cabeçalho"""
+    async def fake_batches(dataset, query):
+        yield [{"id": "1", "page": "home", "ip_address": None, "user_agent": "ua", "viewed_at": datetime(2025, 1, 1)}]
+        yield [{"id": "2", "page": "ofertas", "ip_address": None, "user_agent": "ua", "viewed_at": datetime(2025, 1, 2)}]
+
+    monkeypatch.setattr(analytics_export, "iter_event_batches", fake_batches)
+    chunks = [chunk async for chunk in analytics_export.stream_csv("pageviews", {})]
+
+    assert len(chunks) == 2
+    content = b"".join(chunks).decode()
+    assert content.count("id,page,ip_address,user_agent,viewed_at") == 1
+    assert "2,ofertas,,ua,2025-01-02T00:00:00" in content
+
+
+@pytest.mark.asyncio
+async def test_export_requires_auth(client: AsyncClient):
+    """Testa que a exportação exige autenticação"""
+    response = await client.get("/analytics/export?dataset=clicks&format=csv")
+    assert response.status_code == 403
@@ -0,0 +1,130 @@
+"""
+Testes das métricas agregadas de analytics ($facet com agregação simulada)
+"""
+from types import SimpleNamespace
+import pytest
+from app.models.offer import Offer
+from app.models.offer_click import OfferClick
+from app.models.page_view import PageView
+from app.routes import analytics
+from app.routes.analytics import _facet_count
+
+
+class FakeAggregate:
+    """Coleção que devolve o documento de $facet informado e guarda o pipeline recebido"""
+
+    def __init__(self, facets):
+        self.facets = facets
+        self.pipelines = []
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        return self
+
+    async def to_list(self, length=None):
+        return [self.facets] if self.facets is not None else []
+
+
+@pytest.fixture
+def no_cache(monkeypatch):
+    stored = {}
+
+    async def get_cached(key):
+        return None
+
+    async def set_cached(key, value, ttl=None):
+        stored[key] = value
+
+    monkeypatch.setattr(analytics, "get_cached", get_cached)
+    monkeypatch.setattr(analytics, "set_cached", set_cached)
+    monkeypatch.setattr(analytics.limiter, "enabled", False)
+    return stored
+
+
+def use_collection(monkeypatch, model, facets) -> FakeAggregate:
+    collection = FakeAggregate(facets)
+    monkeypatch.setattr(model, "get_pymongo_collection", classmethod(lambda cls: collection))
+    return collection
+
+
+def test_facet_count():
+    assert _facet_count({"total": [{"count": 7}]}, "total") == 7
+    # $count não emite documento quando não há resultados
+    assert _facet_count({"total": []}, "total") == 0
+    assert _facet_count({}, "total") == 0
+
+
+@pytest.mark.asyncio
+async def test_summary_maps_facets(monkeypatch, no_cache):
+    clicks = use_collection(monkeypatch, OfferClick, {
+        "total": [{"count": 12}],
+        "last_7_days": [{"count": 5}],
+        "most_clicked": [{"offer_id": "a", "title": "Console", "clicks": 9}],
+    })
+    views = use_collection(monkeypatch, PageView, {
+        "total": [{"count": 40}],
+        "last_7_days": [],
+        "by_page": [{"_id": "home", "views": 30}, {"_id": "ofertas", "views": 10}],
+    })
+
+    summary = await analytics.get_analytics_summary(request=None)
+
+    assert summary == {
+        "total_offer_clicks": 12,
+        "total_page_views": 40,
+        "most_clicked_offers": [{"offer_id": "a", "title": "Console", "clicks": 9}],
+        "most_viewed_pages": {"home": 30, "ofertas": 10},
+        "clicks_last_7_days": 5,
+        "views_last_7_days": 0,
+    }
+    # Uma ida ao banco por coleção
+    assert len(clicks.pipelines) == len(views.pipelines) == 1
+    assert no_cache["analytics:summary"] == summary
+
+
+@pytest.mark.asyncio
+async def test_summary_without_events(monkeypatch, no_cache):
+    use_collection(monkeypatch, OfferClick, None)
+    use_collection(monkeypatch, PageView, None)
+
+    summary = await analytics.get_analytics_summary(request=None)
+
+    assert summary["total_offer_clicks"] == summary["total_page_views"] == 0
+    assert summary["most_clicked_offers"] == [] and summary["most_viewed_pages"] == {}
+
+
+@pytest.mark.asyncio
+async def test_offer_metrics_maps_facets(monkeypatch, no_cache):
+    async def get_offer(offer_id):
+        return SimpleNamespace(id=offer_id, title="Console")
+
+    monkeypatch.setattr(Offer, "get", get_offer)
+    use_collection(monkeypatch, OfferClick, {
+        "total": [{"count": 8}],
+        "by_source": [{"_id": "home", "count": 6}, {"_id": "telegram", "count": 2}],
+        "by_day": [{"_id": "2026-01-01", "clicks": 2}, {"_id": "2026-01-02", "clicks": 3}],
+    })
+
+    metrics = await analytics.get_offer_metrics(request=None, offer_id="a")
+
+    assert metrics == {
+        "offer_id": "a",
+        "offer_title": "Console",
+        "total_clicks": 8,
+        "clicks_by_source": {"home": 6, "telegram": 2},
+        "clicks_by_day": [{"date": "2026-01-01", "clicks": 2}, {"date": "2026-01-02", "clicks": 3}],
+        "last_30_days": 5,
+    }
+    assert no_cache["analytics:offer:a"] == metrics
+
+
+@pytest.mark.asyncio
+async def test_offer_metrics_unknown_offer(monkeypatch, no_cache):
+    async def get_offer(offer_id):
+        return None
+
+    monkeypatch.setattr(Offer, "get", get_offer)
+
+    with pytest.raises(analytics.HTTPException) as error:
+        await analytics.get_offer_metrics(request=None, offer_id="a")
+    assert error.value.status_code == 404
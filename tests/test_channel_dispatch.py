@@ -0,0 +1,257 @@
+"""
+Testes do despacho de posts contra um webhook/Bot API local (stand-in)
+"""
+import asyncio
+from types import SimpleNamespace
+import httpx
+import pytest
+from pymongo.errors import BulkWriteError
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from app.services.channel_dispatch import TelegramTransport, WebhookTransport, deliver
+from app.models.channel import Channel
+from app.models.offer import Offer
+from app.models.post import Post
+from app.services.channel_dispatch import engine
+from app.services.channel_dispatch.engine import ChannelDispatcher, PriorityGate, backoff_delay, build_payload
+
+
+def make_standin(fail_times: int = 0, fail_status: int = 503):
+    """Webhook local que falha as primeiras `fail_times` chamadas"""
+    standin = FastAPI()
+    standin.state.calls = []
+
+    @standin.post("/hook")
+    async def hook(request: Request):
+        standin.state.calls.append(await request.json())
+        if len(standin.state.calls) <= fail_times:
+            return JSONResponse({"error": "indisponível"}, status_code=fail_status)
+        return {"delivered": True}
+
+    @standin.post("/bot{token}/sendMessage")
+    async def send_message(token: str, request: Request):
+        standin.state.calls.append(await request.json())
+        if len(standin.state.calls) <= fail_times:
+            return JSONResponse(
+                {"ok": False, "description": "Too Many Requests", "parameters": {"retry_after": 0}},
+                status_code=429
+            )
+        return {"ok": True, "result": {"message_id": 42}}
+
+    return standin
+
+
+def make_client(standin: FastAPI) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=standin), base_url="http://standin")
+
+
+def webhook_channel(**overrides):
+    data = {"type": "whatsapp", "webhook_url": "http://standin/hook", "api_key": None}
+    return SimpleNamespace(**{**data, **overrides})
+
+
+PAYLOAD = {"post_id": "p1", "offer_id": "o1", "channel": "whatsapp", "message": "Oferta", "image": None}
+
+
+@pytest.mark.asyncio
+async def test_webhook_retries_temporary_failures():
+    standin = make_standin(fail_times=2)
+    async with make_client(standin) as client:
+        result = await deliver(WebhookTransport(webhook_channel(), client), PAYLOAD, backoff_base=0)
+
+    assert result["status"] == "success"
+    assert result["attempts"] == 3
+    assert result["response"] == {"delivered": True}
+    assert standin.state.calls[-1]["post_id"] == "p1"
+
+
+@pytest.mark.asyncio
+async def test_webhook_client_error_is_not_retried():
+    standin = make_standin(fail_times=10, fail_status=400)
+    async with make_client(standin) as client:
+        result = await deliver(WebhookTransport(webhook_channel(), client), PAYLOAD, backoff_base=0)
+
+    assert result["status"] == "failed"
+    assert result["attempts"] == 1
+    assert "400" in result["error"]
+
+
+@pytest.mark.asyncio
+async def test_webhook_without_url_fails():
+    async with make_client(make_standin()) as client:
+        result = await deliver(WebhookTransport(webhook_channel(webhook_url=None), client), PAYLOAD)
+
+    assert result["status"] == "failed"
+    assert result["attempts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_telegram_respects_retry_after(monkeypatch):
+    monkeypatch.setattr("app.services.channel_dispatch.telegram.TELEGRAM_API_URL", "http://standin")
+    standin = make_standin(fail_times=1)
+    channel = SimpleNamespace(type="telegram", api_token="123:abc", channel_id="@ofertas")
+    async with make_client(standin) as client:
+        result = await deliver(TelegramTransport(channel, client), PAYLOAD, backoff_base=60)
+
+    assert result["status"] == "success"
+    assert result["response"]["message_id"] == 42
+    assert standin.state.calls[0] == {"chat_id": "@ofertas", "text": "Oferta"}
+
+
+@pytest.mark.asyncio
+async def test_priority_gate_serves_higher_priority_first():
+    gate = PriorityGate(1)
+    order = []
+
+    async def job(name, priority):
+        async with gate.slot(priority):
+            order.append(name)
+            await asyncio.sleep(0)
+
+    await gate.acquire()
+    tasks = [asyncio.create_task(job(name, priority)) for name, priority in [("low", 0), ("high", 10), ("mid", 5)]]
+    await asyncio.sleep(0)
+    gate.release()
+    await asyncio.gather(*tasks)
+
+    assert order == ["high", "mid", "low"]
+
+
+def test_backoff_is_exponential_and_capped():
+    assert 1 <= backoff_delay(1, base=2, cap=60) <= 2
+    assert 4 <= backoff_delay(3, base=2, cap=60) <= 8
+    assert backoff_delay(20, base=2, cap=60) <= 60
+
+
+def test_payload_falls_back_to_default_message():
+    post = {"_id": "p1", "offer_id": "o1", "channel": "site", "offer_title": "Fone", "offer_price": 1299.9}
+    payload = build_payload(post, {"url": "https://loja/fone", "discount": "20% OFF"})
+
+    assert payload["message"] == "Fone\n💰 R$ 1.299,90\n🔥 20% OFF\n🔗 https://loja/fone"
+    assert build_payload(post, {"optimized_message": "Pronta"})["message"] == "Pronta"
+
+
+class FakePosts:
+    """bulk_write/find simulados: `owned` = posts cujo dispatch_token ainda é deste worker"""
+
+    def __init__(self, owned, failing=()):
+        self.owned = set(owned)
+        self.failing = set(failing)
+        self.bulk_writes = 0
+
+    async def bulk_write(self, operations, ordered=True):
+        self.bulk_writes += 1
+        ids = [op._filter["_id"] for op in operations]
+        errors = [{"index": i, "errmsg": "falha"} for i, post_id in enumerate(ids) if post_id in self.failing]
+        matched = sum(1 for post_id in ids if post_id in self.owned and post_id not in self.failing)
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nMatched": matched})
+        return SimpleNamespace(matched_count=matched)
+
+    async def find(self, query, projection=None):
+        for post_id in query["_id"]["$in"]:
+            yield {"_id": post_id, "dispatch_token": "t" if post_id in self.owned else "outro-worker"}
+
+
+class FakeOffers:
+    def __init__(self):
+        self.approved = []
+
+    async def update_many(self, query, update):
+        self.approved += query["_id"]["$in"]
+
+
+def dispatch_result(post_id: str, offer_id: str):
+    post = {"_id": post_id, "dispatch_token": "t", "channel": "Telegram", "status": "pending", "offer_id": offer_id}
+    return {
+        "status": "success", "attempts": 1, "response": {}, "error": None,
+        "post": post, "channel_type": "telegram", "auto_approve": True,
+    }
+
+
+@pytest.fixture
+def stores(monkeypatch):
+    deltas = []
+
+    async def fake_apply(changes):
+        deltas.append(changes)
+
+    offers = FakeOffers()
+    monkeypatch.setattr(Channel, "apply_post_deltas", fake_apply)
+    monkeypatch.setattr(Offer, "get_pymongo_collection", classmethod(lambda cls: offers))
+
+    def use_posts(posts):
+        state.posts = posts
+        monkeypatch.setattr(Post, "get_pymongo_collection", classmethod(lambda cls: posts))
+
+    state = SimpleNamespace(deltas=deltas, offers=offers, use_posts=use_posts, posts=None)
+    return state
+
+
+@pytest.mark.asyncio
+async def test_flush_counts_only_posts_still_owned(stores):
+    stores.use_posts(FakePosts(owned={"p1"}))
+    dispatcher = ChannelDispatcher()
+    dispatcher.results = [
+        dispatch_result("p1", "65f000000000000000000001"),
+        dispatch_result("p2", "65f000000000000000000002"),  # lease perdido
+    ]
+
+    assert await dispatcher.flush() == 1
+
+    assert stores.posts.bulk_writes == 1
+    assert stores.deltas == [{"Telegram": (0, 1)}]
+    assert [str(offer_id) for offer_id in stores.offers.approved] == ["65f000000000000000000001"]
+    assert dispatcher.results == []
+
+
+@pytest.mark.asyncio
+async def test_failed_writes_are_kept_for_next_flush(stores):
+    stores.use_posts(FakePosts(owned={"p1", "p2"}, failing={"p2"}))
+    dispatcher = ChannelDispatcher()
+    dispatcher.results = [dispatch_result("p1", "x"), dispatch_result("p2", "y")]
+
+    assert await dispatcher.flush() == 1
+    assert [r["post"]["_id"] for r in dispatcher.results] == ["p2"]
+
+    stores.use_posts(FakePosts(owned={"p2"}))
+    assert await dispatcher.flush() == 1
+    assert dispatcher.results == []
+
+
+@pytest.mark.asyncio
+async def test_unreachable_database_keeps_every_result(stores):
+    class DownPosts(FakePosts):
+        async def bulk_write(self, operations, ordered=True):
+            raise RuntimeError("mongo indisponível")
+
+    stores.use_posts(DownPosts(owned={"p1"}))
+    dispatcher = ChannelDispatcher()
+    dispatcher.results = [dispatch_result("p1", "x"), dispatch_result("p2", "y")]
+
+    assert await dispatcher.flush() == 0
+    assert [r["post"]["_id"] for r in dispatcher.results] == ["p1", "p2"]
+    assert stores.deltas == []
+
+
+@pytest.mark.asyncio
+async def test_worker_survives_flush_errors(monkeypatch):
+    monkeypatch.setattr(engine, "DISPATCH_FLUSH_SIZE", 1)
+    dispatcher = ChannelDispatcher()
+
+    async def failing_flush():
+        raise RuntimeError("mongo indisponível")
+
+    monkeypatch.setattr(dispatcher, "flush", failing_flush)
+    queue = dispatcher.queues["removido"] = asyncio.PriorityQueue()
+    for i in range(2):
+        queue.put_nowait((0, i, {"_id": f"p{i}"}, PAYLOAD))
+
+    worker = asyncio.create_task(dispatcher._worker("removido"))
+    await asyncio.wait_for(queue.join(), 1)
+    await asyncio.sleep(0)
+
+    # O flush do primeiro resultado falhou e o worker seguiu para o segundo
+    assert not worker.done()
+    assert len(dispatcher.results) == 2
+    worker.cancel()
@@ -0,0 +1,135 @@
+"""
+Testes da variação incremental das estatísticas dos canais
+"""
+import asyncio
+from types import SimpleNamespace
+import pytest
+from fastapi import HTTPException
+from app.models.channel import Channel, post_status_delta, sum_post_deltas
+from app.models.post import Post
+from app.routes.posts import delete_post, update_post
+
+
+def test_created_post_counts_as_attempt():
+    assert post_status_delta(None, "pending") == (1, 0)
+    assert post_status_delta(None, "success") == (1, 1)
+
+
+def test_status_transitions_only_move_successes():
+    assert post_status_delta("pending", "success") == (0, 1)
+    assert post_status_delta("success", "failed") == (0, -1)
+    assert post_status_delta("pending", "failed") == (0, 0)
+    assert post_status_delta("success", "success") == (0, 0)
+
+
+def test_deleted_post_is_removed_from_counters():
+    assert post_status_delta("success", None) == (-1, -1)
+    assert post_status_delta("failed", None) == (-1, 0)
+
+
+def test_bulk_deltas_are_summed_per_channel():
+    deltas = sum_post_deltas([
+        ("telegram", "success", None),
+        ("telegram", "pending", None),
+        ("site", None, "pending"),
+    ])
+    assert deltas == {"telegram": (-2, -1), "site": (1, 0)}
+
+
+class FakeChannels:
+    """Collection de canais simulada: `legacy` = canais sem total_attempts"""
+
+    def __init__(self, current=(), legacy=()):
+        self.current = set(current)
+        self.legacy = set(legacy)
+
+    async def update_one(self, query, pipeline):
+        return SimpleNamespace(matched_count=int(query["name"] in self.current))
+
+    async def count_documents(self, query, limit=0):
+        return int(query["name"] in self.legacy)
+
+
+@pytest.fixture
+def reconciled(monkeypatch):
+    names = []
+
+    async def fake_reconcile(channel_names=None):
+        names.extend(channel_names)
+
+    monkeypatch.setattr(Channel, "reconcile_statistics", fake_reconcile)
+    return names
+
+
+def use_channels(monkeypatch, fake):
+    monkeypatch.setattr(Channel, "get_pymongo_collection", classmethod(lambda cls: fake))
+
+
+@pytest.mark.asyncio
+async def test_delta_reconciles_only_legacy_channels(monkeypatch, reconciled):
+    use_channels(monkeypatch, FakeChannels(current={"Telegram"}, legacy={"WhatsApp"}))
+
+    await Channel.apply_post_delta("Telegram", 1, 1)
+    await Channel.apply_post_delta("WhatsApp", 1, 0)
+    await Channel.apply_post_delta("instagram", 1, 0)  # Sem documento (canal padrão/slug)
+
+    assert reconciled == ["WhatsApp"]
+
+
+class FakePosts:
+    """find_one_and_update/delete atômicos sobre um único post em memória"""
+
+    def __init__(self, post):
+        self.post = post
+
+    async def find_one_and_update(self, query, update, return_document=None):
+        if self.post is None:
+            return None
+        before, self.post = dict(self.post), {**self.post, **update["$set"]}
+        return before
+
+    async def find_one_and_delete(self, query):
+        before, self.post = self.post, None
+        return before
+
+
+@pytest.fixture
+def transitions(monkeypatch):
+    recorded = []
+
+    async def record(name, old_status, new_status):
+        recorded.append((name, old_status, new_status))
+
+    async def no_channel(query):
+        return None
+
+    monkeypatch.setattr(Channel, "record_post_transition", record)
+    monkeypatch.setattr(Channel, "find_one", no_channel)
+
+    def use_post(post):
+        collection = FakePosts(post)
+        monkeypatch.setattr(Post, "get_pymongo_collection", classmethod(lambda cls: collection))
+
+    return SimpleNamespace(recorded=recorded, use_post=use_post)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_patches_count_a_transition_once(transitions):
+    transitions.use_post({"_id": "p", "channel": "telegram", "status": "pending", "offer_id": "o"})
+
+    await asyncio.gather(*(update_post("p", {"status": "success"}, moderator=None) for _ in range(2)))
+
+    # O segundo PATCH substituiu um post já em success: nenhuma transição
+    assert transitions.recorded == [("telegram", "pending", "success")]
+
+
+@pytest.mark.asyncio
+async def test_delete_counts_only_the_removed_post(transitions):
+    transitions.use_post({"_id": "p", "channel": "telegram", "status": "success", "offer_id": "o"})
+
+    await delete_post("p", moderator=None)
+    with pytest.raises(HTTPException) as error:
+        await delete_post("p", moderator=None)
+
+    assert error.value.status_code == 404
+    assert transitions.recorded == [("telegram", "success", None)]
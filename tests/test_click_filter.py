@@ -0,0 +1,104 @@
+"""
+Testes para o filtro de ingestão de cliques
+"""
+import ipaddress
+from types import SimpleNamespace
+import pytest
+from starlette.requests import Request
+from app.core import cache, rate_limit
+from app.routes import analytics
+from app.services.click_filter import ClickFilter, is_bot_user_agent
+
+BROWSER_UA = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+
+
+def test_bot_user_agents():
+    """Testa detecção de bots conhecidos"""
+    assert is_bot_user_agent("Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)")
+    assert is_bot_user_agent("facebookexternalhit/1.1")
+    assert is_bot_user_agent("python-requests/2.32.3")
+    assert is_bot_user_agent(None)
+    assert not is_bot_user_agent(BROWSER_UA)
+
+
+@pytest.mark.parametrize("user_agent", [
+    "Mozilla/5.0 (compatible; bingbot/2.0; +http://www.bing.com/bingbot.htm)",
+    "Mozilla/5.0 AppleWebKit/537.36 (KHTML, like Gecko; compatible; GPTBot/1.0; +https://openai.com/gptbot)",
+    "WhatsApp/2.23.20.0 A",
+    "TelegramBot (like TwitterBot)",
+    "Mozilla/5.0 (compatible; Bot/1.0)",
+])
+def test_crawlers_and_link_previews_are_bots(user_agent):
+    assert is_bot_user_agent(user_agent)
+
+
+@pytest.mark.parametrize("user_agent", [
+    "Mozilla/5.0 (Linux; Android 10; CUBOT X30) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Mobile Safari/537.36",
+    "Mozilla/5.0 (Linux; Android 12; CUBOT KINGKONG 7 Build/SP1A.210812.016; wv) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Version/4.0 Chrome/119.0.6045.163 Mobile Safari/537.36",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_1 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) "
+    "Version/17.1 Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (Linux; Android 13; SM-A135M Build/TP1A.220624.014; wv) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Version/4.0 Chrome/120.0.6099.43 Mobile Safari/537.36 Instagram 309.0.0.40.113 Android",
+    "Mozilla/5.0 (Linux; Android 13; SAMSUNG SM-S911B) AppleWebKit/537.36 (KHTML, like Gecko) "
+    "SamsungBrowser/23.0 Chrome/115.0.0.0 Mobile Safari/537.36",
+])
+def test_real_mobile_browsers_are_not_bots(user_agent):
+    assert not is_bot_user_agent(user_agent)
+
+
+@pytest.mark.asyncio
+async def test_duplicate_clicks_suppressed_locally(monkeypatch):
+    """Testa deduplicação em memória quando Redis não está disponível"""
+    monkeypatch.setattr(cache, "redis_client", None)
+    click_filter = ClickFilter(window_seconds=60)
+
+    assert await click_filter.check("1.2.3.4", BROWSER_UA, "offer1") is None
+    assert await click_filter.check("1.2.3.4", BROWSER_UA, "offer1") == "duplicate"
+    assert await click_filter.check("1.2.3.4", BROWSER_UA, "offer2") is None
+    assert await click_filter.check("1.2.3.4", "curl/8.0", "offer3") == "bot"
+
+    stats = await click_filter.get_stats()
+    assert stats["process"] == {"accepted": 2, "suppressed": {"bot": 1, "duplicate": 1}}
+
+
+@pytest.mark.asyncio
+async def test_local_dedup_is_bounded(monkeypatch):
+    """Testa que o fallback local não cresce além do limite"""
+    monkeypatch.setattr(cache, "redis_client", None)
+    click_filter = ClickFilter(window_seconds=60, local_max_keys=10)
+
+    for i in range(50):
+        await click_filter.check(f"10.0.0.{i}", BROWSER_UA, "offer1")
+
+    assert len(click_filter._local_seen) == 10
+
+
+@pytest.mark.asyncio
+async def test_visitors_behind_trusted_proxy_are_not_merged(monkeypatch):
+    """Dois visitantes atrás do mesmo proxy confiável não são deduplicados como um só"""
+    monkeypatch.setattr(cache, "redis_client", None)
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_TRUSTED_PROXIES", [ipaddress.ip_network("10.0.0.0/8")])
+    monkeypatch.setattr(analytics, "click_filter", ClickFilter(window_seconds=60))
+    inserted = []
+
+    async def get_offer(offer_id):
+        async def update(changes):
+            return None
+        return SimpleNamespace(update=update)
+
+    class FakeClick(SimpleNamespace):
+        async def insert(self):
+            inserted.append(self.ip_address)
+
+    monkeypatch.setattr(analytics.Offer, "get", get_offer)
+    monkeypatch.setattr(analytics, "OfferClick", FakeClick)
+
+    def request(visitor):
+        headers = [(b"user-agent", BROWSER_UA.encode()), (b"x-forwarded-for", visitor.encode())]
+        return Request({"type": "http", "method": "POST", "path": "/analytics/click", "headers": headers, "client": ("10.0.0.2", 1)})
+
+    for visitor in ["198.51.100.1", "198.51.100.2", "198.51.100.1"]:
+        await analytics.track_offer_click({"offer_id": "o"}, request(visitor))
+
+    assert inserted == ["198.51.100.1", "198.51.100.2"]
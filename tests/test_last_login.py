@@ -0,0 +1,96 @@
+"""
+Testes da gravação em lote do last_login
+"""
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from app.models.user import User
+from app.services.last_login import LastLoginWriter
+
+USER_A = "65f000000000000000000001"
+USER_B = "65f000000000000000000002"
+
+
+class FakeCollection:
+    def __init__(self, fail_times: int = 0):
+        self.batches = []
+        self.fail_times = fail_times
+
+    async def bulk_write(self, operations, ordered=True):
+        if self.fail_times:
+            self.fail_times -= 1
+            raise RuntimeError("mongo indisponível")
+        self.batches.append([(op._filter["_id"], op._doc) for op in operations])
+
+
+@pytest.fixture
+def collection(monkeypatch):
+    fake = FakeCollection()
+    monkeypatch.setattr(User, "get_pymongo_collection", classmethod(lambda cls: fake))
+    return fake
+
+
+@pytest.mark.asyncio
+async def test_logins_are_coalesced_into_one_partial_write(collection):
+    writer = LastLoginWriter(interval=60)
+    now = datetime.utcnow()
+
+    writer.record(USER_A, now - timedelta(seconds=2))
+    writer.record(USER_A, now)
+    writer.record(USER_B, now)
+    assert await writer.flush() == 2
+    await writer.stop()
+
+    assert len(collection.batches) == 1
+    updates = {str(_id): doc for _id, doc in collection.batches[0]}
+    assert updates[USER_A] == {"$max": {"last_login": now}}
+    assert writer.get_stats()["coalesced"] == 1
+
+
+@pytest.mark.asyncio
+async def test_background_loop_flushes_periodically(collection):
+    writer = LastLoginWriter(interval=0.01)
+
+    writer.record(USER_A)
+    await asyncio.sleep(0.05)
+    await writer.stop()
+
+    assert len(collection.batches) == 1
+    assert writer.get_stats()["pending"] == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_logins_for_retry(collection):
+    collection.fail_times = 1
+    writer = LastLoginWriter(interval=60)
+    older, newer = datetime.utcnow() - timedelta(seconds=5), datetime.utcnow()
+
+    writer.record(USER_A, older)
+    assert await writer.flush() == 0
+    writer.record(USER_A, newer)
+    assert await writer.flush() == 1
+    await writer.stop()
+
+    assert len(collection.batches) == 1
+    assert collection.batches[0][0][1] == {"$max": {"last_login": newer}}
+    assert writer.get_stats()["errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_burst_above_max_pending_spawns_one_early_flush(collection):
+    writer = LastLoginWriter(interval=60, max_pending=1)
+    flushes = []
+    flush = writer.flush
+
+    async def counting_flush():
+        flushes.append(1)
+        return await flush()
+
+    writer.flush = counting_flush
+    for index in range(5):
+        writer.record(f"65f00000000000000000001{index}")
+    await writer.stop()
+
+    # Um flush antecipado para a rajada inteira + o flush final do stop
+    assert len(flushes) == 2
+    assert len(collection.batches) == 1 and len(collection.batches[0]) == 5
@@ -0,0 +1,67 @@
+"""
+Testes do hash de senhas no pool de threads (fora do event loop)
+"""
+import asyncio
+import bcrypt
+import pytest
+from fastapi import HTTPException
+from app.core import passwords
+
+
+@pytest.mark.asyncio
+async def test_hash_and_verify_roundtrip():
+    password_hash = await passwords.hash_password("segredo123")
+
+    assert await passwords.verify_password("segredo123", password_hash)
+    assert not await passwords.verify_password("outra", password_hash)
+
+
+@pytest.mark.asyncio
+async def test_verification_does_not_block_event_loop():
+    password_hash = bcrypt.hashpw(b"segredo123", bcrypt.gensalt(rounds=12)).decode("utf-8")
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.005)
+
+    task = asyncio.create_task(ticker())
+    await passwords.verify_password("segredo123", password_hash)
+    task.cancel()
+
+    # bcrypt (custo 12) leva centenas de ms; com o loop livre o ticker roda várias vezes
+    assert ticks > 5
+
+
+@pytest.mark.asyncio
+async def test_saturated_pool_rejects_with_503(monkeypatch):
+    monkeypatch.setattr(passwords, "PASSWORD_HASH_MAX_PENDING", 0)
+    rejected = passwords.metrics["rejected"]
+
+    with pytest.raises(HTTPException) as error:
+        await passwords.verify_password("x", "hash")
+
+    assert error.value.status_code == 503
+    assert passwords.metrics["rejected"] == rejected + 1
+    assert passwords.get_password_metrics()["rejected"] == rejected + 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_request_keeps_slot_until_job_finishes():
+    password_hash = bcrypt.hashpw(b"segredo123", bcrypt.gensalt(rounds=12)).decode("utf-8")
+    pending = passwords.metrics["pending"]
+
+    task = asyncio.create_task(passwords.verify_password("segredo123", password_hash))
+    await asyncio.sleep(0.02)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    # O bcrypt continua no executor: a vaga só é liberada quando ele termina
+    assert passwords.metrics["pending"] == pending + 1
+    for _ in range(200):
+        if passwords.metrics["pending"] == pending:
+            break
+        await asyncio.sleep(0.01)
+    assert passwords.metrics["pending"] == pending
@@ -0,0 +1,100 @@
+"""
+Testes da paginação por cursor da listagem de posts
+"""
+from datetime import datetime, timedelta
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException, Response
+from app.models.post import Post
+from app.routes.posts import decode_cursor, encode_cursor, list_posts
+
+START = datetime(2026, 1, 1, 12, 0, 0, 123000)
+
+
+class FakeCursor:
+    def __init__(self, documents, query):
+        self.documents = documents
+        self.query = query
+
+    def sort(self, keys):
+        self.documents = sorted(self.documents, key=lambda d: (d["created_at"], d["_id"]), reverse=True)
+        return self
+
+    def limit(self, count):
+        self.documents = self.documents[:count]
+        return self
+
+    async def to_list(self, length=None):
+        return [dict(document) for document in self.documents]
+
+
+class FakePosts:
+    """find com o filtro de keyset ($or em created_at, _id) usado pela listagem"""
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.queries = []
+
+    def find(self, query):
+        self.queries.append(query)
+        documents = self.documents
+        if "$or" in query:
+            before, tie = query["$or"]
+            created_at, last_id = tie["created_at"], tie["_id"]["$lt"]
+            documents = [
+                d for d in documents
+                if d["created_at"] < created_at or (d["created_at"] == created_at and d["_id"] < last_id)
+            ]
+        return FakeCursor(documents, query)
+
+
+@pytest.fixture
+def stored_posts(monkeypatch):
+    # Dois posts com o mesmo created_at: o desempate por _id não pode pular nem repetir
+    documents = [
+        {"_id": ObjectId(), "offer_id": "a", "offer_title": f"Oferta {i}", "created_at": START - timedelta(minutes=i // 2)}
+        for i in range(5)
+    ]
+    collection = FakePosts(documents)
+    monkeypatch.setattr(Post, "get_pymongo_collection", classmethod(lambda cls: collection))
+    return collection
+
+
+def test_cursor_round_trip():
+    post = {"_id": ObjectId(), "created_at": START}
+
+    assert decode_cursor(encode_cursor(post)) == (START, post["_id"])
+
+
+@pytest.mark.parametrize("cursor", ["", "nao-e-base64!", "bWFsZm9ybWFkbw==", encode_cursor({"_id": "x", "created_at": START})])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_pages_follow_next_cursor_header(stored_posts):
+    seen, cursor, pages = [], None, 0
+    while True:
+        response = Response()
+        page = await list_posts(response, limit=2, cursor=cursor)
+        seen += [post["_id"] for post in page]
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert pages == 3
+    expected = sorted(stored_posts.documents, key=lambda d: (d["created_at"], d["_id"]), reverse=True)
+    assert seen == [str(d["_id"]) for d in expected]
+
+
+@pytest.mark.asyncio
+async def test_last_page_has_no_next_cursor(stored_posts):
+    response = Response()
+    page = await list_posts(response, status="pending", limit=10, cursor=None)
+
+    assert len(page) == 5
+    assert "X-Next-Cursor" not in response.headers
+    assert stored_posts.queries[-1] == {"status": "pending"}
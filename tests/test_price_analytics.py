@@ -0,0 +1,38 @@
+"""
+Testes para o serviço de análise de preços
+"""
+import numpy as np
+from app.services.price_analytics import daily_price_matrix, compute_price_stats
+
+TODAY = np.datetime64("2025-03-31", "D")
+
+
+def _series(*points):
+    dates = np.array([d for d, _ in points], dtype="datetime64[D]")
+    prices = np.array([p for _, p in points], dtype=np.float64)
+    return dates, prices
+
+
+def test_daily_price_matrix_forward_fills():
+    """Testa preenchimento diário com o último preço conhecido"""
+    series = {"a": _series(("2025-03-28", 100.0), ("2025-03-30", 90.0))}
+    matrix = daily_price_matrix(["a", "missing"], series, 5, TODAY)
+
+    assert np.isnan(matrix[0, 0])  # 27/03: antes da primeira observação
+    assert list(matrix[0, 1:]) == [100.0, 100.0, 90.0, 90.0]
+    assert np.isnan(matrix[1]).all()
+
+
+def test_price_drop_is_flagged_as_deal():
+    """Testa que uma queda acima de 15% frente à MM7 é marcada como oferta real"""
+    series = {
+        "drop": _series(("2025-01-01", 100.0), ("2025-03-31", 70.0)),
+        "stable": _series(("2025-01-01", 100.0), ("2025-03-01", 120.0)),
+    }
+    matrix = daily_price_matrix(["drop", "stable"], series, 90, TODAY)
+    stats = compute_price_stats(matrix)
+
+    assert stats["current_price"].tolist() == [70.0, 120.0]
+    assert stats["is_deal"].tolist() == [True, False]
+    assert stats["drop_vs_ma7_percent"][0] > 15
+    assert stats["deal_score"][0] > stats["deal_score"][1]
@@ -0,0 +1,91 @@
+"""
+Testes do stream de eventos de mudança de preço (Redis em memória)
+"""
+import json
+import pytest
+from app.core import cache
+from app.services import price_events
+from app.services.price_events import matches_filters, parse_event, publish_price_change, stream_price_events
+from tests.fakes import MemoryRedis
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = MemoryRedis()
+    monkeypatch.setattr(cache, "redis_client", client)
+    return client
+
+
+def event(offer_id="a", change_percent=-10.0):
+    return {"offer_id": offer_id, "old_price": 100.0, "new_price": 90.0, "change_percent": change_percent}
+
+
+def test_parse_event_converts_numbers_and_empty_fields():
+    parsed = parse_event({
+        "offer_id": "a", "old_price": "", "new_price": "89.9",
+        "change_percent": "", "source": "rescrape", "timestamp": "2026-01-01T00:00:00"
+    })
+
+    assert parsed["old_price"] is None
+    assert parsed["new_price"] == 89.9
+    assert parsed["change_percent"] is None
+    assert parsed["source"] == "rescrape"
+
+
+def test_matches_filters_by_offer():
+    assert matches_filters(event("a"), offer_id="a")
+    assert not matches_filters(event("b"), offer_id="a")
+
+
+def test_matches_filters_by_min_change_and_direction():
+    assert matches_filters(event(change_percent=-10.0), min_change_percent=5)
+    assert not matches_filters(event(change_percent=-2.0), min_change_percent=5)
+    # Sem preço anterior não há variação: não passa em filtros de variação
+    assert not matches_filters(event(change_percent=None), min_change_percent=0)
+
+    assert matches_filters(event(change_percent=-10.0), direction="down")
+    assert not matches_filters(event(change_percent=-10.0), direction="up")
+    assert matches_filters(event(change_percent=15.0), direction="up")
+    assert not matches_filters(event(change_percent=None), direction="down")
+
+
+@pytest.mark.asyncio
+async def test_publish_price_change_writes_stream_entry(redis):
+    entry_id = await publish_price_change("a", 100.0, 80.0, source="rescrape")
+
+    (stored_id, fields), = redis.streams[price_events.PRICE_EVENTS_STREAM]
+    assert stored_id == entry_id
+    assert parse_event(fields)["change_percent"] == -20.0
+    assert fields["source"] == "rescrape"
+
+
+@pytest.mark.asyncio
+async def test_publish_skips_unchanged_price_and_missing_redis(redis, monkeypatch):
+    assert await publish_price_change("a", 100.0, 100.0) is None
+    assert await publish_price_change("a", 100.0, None) is None
+    assert redis.streams == {}
+
+    monkeypatch.setattr(cache, "redis_client", None)
+    assert await publish_price_change("a", 100.0, 80.0) is None
+
+
+@pytest.mark.asyncio
+async def test_stream_resumes_from_last_id_and_applies_filters(redis):
+    first = await publish_price_change("a", 100.0, 90.0)
+    await publish_price_change("b", 100.0, 50.0)
+    await publish_price_change("a", 90.0, 99.0)
+
+    calls = []
+
+    async def is_disconnected():
+        calls.append(1)
+        return len(calls) > 1
+
+    messages = [message async for message in stream_price_events(
+        last_id=first, direction="down", is_disconnected=is_disconnected
+    )]
+
+    events = [message for message in messages if message.startswith("id:")]
+    assert len(events) == 1
+    data = json.loads(events[0].split("data: ", 1)[1])
+    assert (data["offer_id"], data["change_percent"]) == ("b", -50.0)
@@ -0,0 +1,61 @@
+"""
+Testes dos pipelines de leitura e reamostragem do histórico de preços
+"""
+from datetime import datetime
+import pytest
+from app.models import price_history
+from app.models.price_history import PriceHistory
+
+START = datetime(2026, 3, 10, 15, 30)
+
+
+def test_raw_resolution_only_sorts_newest_first():
+    assert PriceHistory._downsample_stages("raw") == [{"$sort": {"timestamp": -1}}]
+
+
+@pytest.mark.parametrize("resolution, unit", [("hourly", "hour"), ("daily", "day"), ("weekly", "week")])
+def test_downsample_groups_by_truncated_timestamp(resolution, unit):
+    sort, group, project, final_sort = PriceHistory._downsample_stages(resolution)
+
+    # Ordem cronológica antes do $group: $last é o último preço do intervalo
+    assert sort == {"$sort": {"timestamp": 1}}
+    bucket = group["$group"]["_id"]["bucket"]["$dateTrunc"]
+    assert bucket["unit"] == unit
+    assert ("startOfWeek" in bucket) == (resolution == "weekly")
+    assert group["$group"]["price_discounted"] == {"$last": "$price_discounted"}
+    assert group["$group"]["price_min"] == {"$min": "$price_discounted"}
+    assert group["$group"]["price_max"] == {"$max": "$price_discounted"}
+    assert project["$project"]["timestamp"] == "$_id.bucket"
+    assert final_sort == {"$sort": {"timestamp": -1}}
+
+
+def test_unknown_resolution_is_rejected():
+    with pytest.raises(KeyError):
+        PriceHistory._downsample_stages("monthly")
+
+
+@pytest.mark.parametrize("storage", ["raw", "both"])
+def test_points_pipeline_reads_raw_collection(monkeypatch, storage):
+    monkeypatch.setattr(price_history, "PRICE_HISTORY_STORAGE", storage)
+    monkeypatch.setattr(PriceHistory, "get_pymongo_collection", classmethod(lambda cls: "price_history"))
+
+    collection, pipeline = PriceHistory._points_pipeline(["a"], START)
+
+    assert collection == "price_history"
+    assert pipeline[0] == {"$match": {"offer_id": {"$in": ["a"]}, "timestamp": {"$gte": START}}}
+
+
+def test_points_pipeline_unwinds_buckets_from_start_of_day(monkeypatch):
+    from app.models.price_history_bucket import PriceHistoryBucket
+
+    monkeypatch.setattr(price_history, "PRICE_HISTORY_STORAGE", "bucket")
+    monkeypatch.setattr(PriceHistoryBucket, "get_pymongo_collection", classmethod(lambda cls: "buckets"))
+
+    collection, pipeline = PriceHistory._points_pipeline(["a"], START)
+
+    assert collection == "buckets"
+    # O bucket do dia inicial é lido inteiro; as observações anteriores ao início são descartadas depois
+    assert pipeline[0]["$match"]["day"] == {"$gte": datetime(2026, 3, 10)}
+    assert pipeline[1] == {"$unwind": "$prices"}
+    assert pipeline[2] == {"$match": {"prices.t": {"$gte": START}}}
+    assert pipeline[3]["$project"]["timestamp"] == "$prices.t"
@@ -0,0 +1,95 @@
+"""
+Testes do histórico de preços em lote (sparklines)
+"""
+import httpx
+import pytest
+from fastapi import FastAPI
+from app.models.price_history import PriceHistory
+from app.routes import price_history as price_history_routes
+
+
+class FakeAggregate:
+    def __init__(self, rows):
+        self.rows = rows
+        self.pipelines = []
+
+    def aggregate(self, pipeline, **kwargs):
+        self.pipelines.append(pipeline)
+        return self
+
+    async def to_list(self, length=None):
+        return self.rows
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(price_history_routes.router)
+    transport = httpx.ASGITransport(app=app)
+    return httpx.AsyncClient(transport=transport, base_url="http://test")
+
+
+@pytest.fixture
+def series_calls(monkeypatch):
+    calls = []
+
+    async def get_price_series_batch(cls, offer_ids, days, resolution):
+        calls.append((offer_ids, days, resolution))
+        return {"a": {"t": [1767225600000], "p": [99.9]}}
+
+    monkeypatch.setattr(PriceHistory, "get_price_series_batch", classmethod(get_price_series_batch))
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_get_price_series_batch_single_aggregation(monkeypatch):
+    history = FakeAggregate([{"_id": "a", "t": [1, 2], "p": [100.0, 90.0]}])
+    monkeypatch.setattr(PriceHistory, "_points_pipeline", classmethod(lambda cls, ids, start: (history, [])))
+
+    series = await PriceHistory.get_price_series_batch(["a", "b"], days=7, resolution="daily")
+
+    assert series == {"a": {"t": [1, 2], "p": [100.0, 90.0]}}
+    (pipeline,) = history.pipelines
+    # Agrupado por oferta em ordem cronológica, com o timestamp em epoch ms
+    assert pipeline[-2] == {"$sort": {"offer_id": 1, "timestamp": 1}}
+    assert pipeline[-1]["$group"]["t"] == {"$push": {"$toLong": "$timestamp"}}
+
+
+@pytest.mark.asyncio
+async def test_batch_returns_empty_series_for_offers_without_history(client, series_calls):
+    async with client:
+        response = await client.post("/price-history/batch", json={"offer_ids": ["a", "b", "a"], "days": 7})
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "days": 7,
+        "resolution": "daily",
+        "data": {"a": {"t": [1767225600000], "p": [99.9]}, "b": {"t": [], "p": []}},
+    }
+    # Ids repetidos são consultados uma única vez
+    assert series_calls == [(["a", "b"], 7, "daily")]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("body", [
+    {"offer_ids": []},
+    {"offer_ids": [f"id{i}" for i in range(201)]},
+    {"offer_ids": "a"},
+    {"offer_ids": ["a"], "days": 0},
+    {"offer_ids": ["a"], "resolution": "monthly"},
+])
+async def test_batch_rejects_invalid_requests(client, series_calls, body):
+    async with client:
+        response = await client.post("/price-history/batch", json=body)
+
+    assert response.status_code == 422
+    assert series_calls == []
+
+
+@pytest.mark.asyncio
+async def test_batch_accepts_max_ids(client, series_calls):
+    async with client:
+        response = await client.post("/price-history/batch", json={"offer_ids": [f"id{i}" for i in range(200)]})
+
+    assert response.status_code == 200
+    assert len(response.json()["data"]) == 200
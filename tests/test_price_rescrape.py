@@ -0,0 +1,174 @@
+"""
+Testes do re-scraping de preços (sem MongoDB: coleções e extrator falsos)
+"""
+import asyncio
+import time
+import pytest
+from bson import ObjectId
+from app.services import price_rescrape
+from app.services.offer_extractor import convert_price_to_float
+from app.services.price_rescrape import MarketplaceRateLimiter, rescrape_offer, run_price_rescrape
+
+
+class FakeOffers:
+    def __init__(self):
+        self.updates = []
+
+    async def update_one(self, filter, update):
+        self.updates.append((filter, update))
+
+
+class FakeExtractor:
+    def __init__(self, data=None, error=None):
+        self.data = data
+        self.error = error
+
+    def extract(self):
+        if self.error:
+            raise self.error
+        return self.data
+
+
+@pytest.fixture
+def offers(monkeypatch):
+    collection = FakeOffers()
+    monkeypatch.setattr(price_rescrape.Offer, "get_pymongo_collection", classmethod(lambda cls: collection))
+    return collection
+
+
+@pytest.fixture
+def side_effects(monkeypatch):
+    calls = {"sync": [], "history": [], "published": []}
+
+    async def sync_offer_fields(offer_id, fields):
+        calls["sync"].append((offer_id, fields))
+
+    async def record(**kwargs):
+        calls["history"].append(kwargs)
+
+    async def publish(offer_id, old_price, new_price, source):
+        calls["published"].append((offer_id, old_price, new_price))
+
+    monkeypatch.setattr(price_rescrape.Post, "sync_offer_fields", sync_offer_fields)
+    monkeypatch.setattr(price_rescrape.PriceHistory, "record", record)
+    monkeypatch.setattr(price_rescrape, "publish_price_change", publish)
+    return calls
+
+
+def use_extractor(monkeypatch, extractor):
+    monkeypatch.setattr(price_rescrape, "get_extractor", lambda url: extractor)
+
+
+def make_offer(price=100.0):
+    return {"_id": ObjectId(), "url": "https://loja.example/p/1", "source": "amazon", "price_discounted": price}
+
+
+def test_convert_price_to_float_brazilian_formats():
+    assert convert_price_to_float("5.950") == 5950.0
+    assert convert_price_to_float("3.254,99") == 3254.99
+    assert convert_price_to_float("10,50") == 10.5
+    assert convert_price_to_float("") is None
+    assert convert_price_to_float("abc") is None
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_spaces_same_marketplace():
+    limiter = MarketplaceRateLimiter(min_delay=0.05)
+    moments = []
+
+    async def request(marketplace):
+        await limiter.wait(marketplace)
+        moments.append((marketplace, time.monotonic()))
+
+    await asyncio.gather(*(request("amazon") for _ in range(3)), request("shopee"))
+
+    amazon = [at for marketplace, at in moments if marketplace == "amazon"]
+    gaps = [later - earlier for earlier, later in zip(amazon, amazon[1:])]
+    assert len(gaps) == 2
+    assert all(gap >= 0.045 for gap in gaps)
+    # Outro marketplace não espera a fila da amazon
+    shopee = next(at for marketplace, at in moments if marketplace == "shopee")
+    assert shopee - amazon[0] < 0.045
+
+
+@pytest.mark.asyncio
+async def test_rescrape_offer_changed(monkeypatch, offers, side_effects):
+    use_extractor(monkeypatch, FakeExtractor({"price": "89,90", "original_price": "120,00"}))
+    offer = make_offer(100.0)
+
+    assert await rescrape_offer(offer, MarketplaceRateLimiter(0)) == "changed"
+    update = offers.updates[0][1]["$set"]
+    assert update["price_discounted"] == 89.9
+    assert update["price_original"] == 120.0
+    assert side_effects["history"][0]["price_discounted"] == 89.9
+    assert side_effects["published"] == [(str(offer["_id"]), 100.0, 89.9)]
+
+
+@pytest.mark.asyncio
+async def test_rescrape_offer_unchanged(monkeypatch, offers, side_effects):
+    use_extractor(monkeypatch, FakeExtractor({"price": "100,00"}))
+
+    assert await rescrape_offer(make_offer(100.0), MarketplaceRateLimiter(0)) == "unchanged"
+    assert list(offers.updates[0][1]["$set"]) == ["price_checked_at"]
+    assert side_effects == {"sync": [], "history": [], "published": []}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("extractor", [
+    FakeExtractor(error=RuntimeError("página fora do ar")),
+    FakeExtractor({"price": ""}),
+])
+async def test_rescrape_offer_failed(monkeypatch, offers, side_effects, extractor):
+    use_extractor(monkeypatch, extractor)
+
+    assert await rescrape_offer(make_offer(), MarketplaceRateLimiter(0)) == "failed"
+    # A verificação é registrada mesmo na falha (não volta para o topo da fila)
+    assert list(offers.updates[0][1]["$set"]) == ["price_checked_at"]
+    assert side_effects["history"] == []
+
+
+@pytest.fixture
+def run_metrics(monkeypatch):
+    monkeypatch.setattr(price_rescrape, "metrics", {**price_rescrape.metrics, "running": False, "runs": 0})
+
+    async def oldest_pending_check(now):
+        return None, 0
+
+    monkeypatch.setattr(price_rescrape, "_oldest_pending_check", oldest_pending_check)
+    return price_rescrape.metrics
+
+
+@pytest.mark.asyncio
+async def test_run_skips_when_already_running(monkeypatch, run_metrics):
+    run_metrics["running"] = True
+
+    async def select_offers(now):
+        raise AssertionError("não deveria selecionar ofertas")
+
+    monkeypatch.setattr(price_rescrape, "select_offers", select_offers)
+
+    result = await run_price_rescrape()
+    assert result["running"] is True
+    assert result["runs"] == 0
+
+
+@pytest.mark.asyncio
+async def test_run_counts_unexpected_errors_as_failed(monkeypatch, run_metrics):
+    batch = [make_offer() for _ in range(3)]
+
+    async def select_offers(now):
+        return batch
+
+    async def flaky_rescrape(offer, limiter):
+        if offer is batch[1]:
+            raise RuntimeError("falha ao gravar histórico")
+        return "changed"
+
+    monkeypatch.setattr(price_rescrape, "select_offers", select_offers)
+    monkeypatch.setattr(price_rescrape, "rescrape_offer", flaky_rescrape)
+
+    result = await run_price_rescrape()
+    assert result["processed"] == 3
+    assert result["changed"] == 2
+    assert result["failed"] == 1
+    assert result["running"] is False
@@ -0,0 +1,164 @@
+"""
+Testes do resumo incremental de preços (pipelines avaliados em memória)
+"""
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import pytest
+from app.models.price_history import PriceHistory
+from app.models.price_summary import PriceSummary
+
+START = datetime(2026, 1, 1)
+
+
+def bson_key(value):
+    # Ordem de comparação do BSON: null vem antes de qualquer número
+    return (value is not None, value if value is not None else 0)
+
+
+def evaluate(expression, document):
+    """Avalia o subconjunto de expressões de agregação usado em apply_observation"""
+    if isinstance(expression, str):
+        if expression == "$$NOW":
+            return START
+        return document.get(expression[1:]) if expression.startswith("$") else expression
+    if not isinstance(expression, dict):
+        return expression
+
+    (operator, args), = expression.items()
+    if operator == "$literal":
+        return args
+    values = [evaluate(arg, document) for arg in args]
+    if operator == "$ifNull":
+        return values[0] if values[0] is not None else values[1]
+    if operator == "$cond":
+        return values[1] if values[0] else values[2]
+    return {
+        "$eq": lambda: values[0] == values[1],
+        "$ne": lambda: values[0] != values[1],
+        "$lt": lambda: bson_key(values[0]) < bson_key(values[1]),
+        "$gt": lambda: bson_key(values[0]) > bson_key(values[1]),
+        "$or": lambda: any(values),
+        "$and": lambda: all(values),
+        "$add": lambda: sum(values),
+    }[operator]()
+
+
+class FakeSummaries:
+    def __init__(self):
+        self.documents = {}
+
+    async def update_one(self, filter, pipeline, upsert=False):
+        current = self.documents.get(filter["offer_id"], dict(filter))
+        (stage,) = pipeline
+        # Todas as expressões do $set leem o estado anterior do documento
+        current.update({field: evaluate(value, current) for field, value in stage["$set"].items()})
+        self.documents[filter["offer_id"]] = current
+
+    async def replace_one(self, filter, document, upsert=False):
+        self.documents[filter["offer_id"]] = document
+
+
+class FakeAggregate:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def aggregate(self, pipeline, **kwargs):
+        self.pipeline = pipeline
+        return self
+
+    async def to_list(self, length=None):
+        return self.rows
+
+
+@pytest.fixture
+def summaries(monkeypatch):
+    collection = FakeSummaries()
+    monkeypatch.setattr(PriceSummary, "get_pymongo_collection", classmethod(lambda cls: collection))
+    return collection.documents
+
+
+@pytest.mark.asyncio
+async def test_apply_observation_tracks_extremes_and_last_change(summaries):
+    for minutes, price in enumerate([100.0, 90.0, 90.0, 120.0]):
+        await PriceSummary.apply_observation("a", price, START + timedelta(minutes=minutes), discount=f"{minutes}%")
+
+    summary = summaries["a"]
+    assert summary["samples"] == 4
+    assert (summary["first_price"], summary["last_price"]) == (100.0, 120.0)
+    assert (summary["min_price"], summary["min_price_at"]) == (90.0, START + timedelta(minutes=1))
+    # Empate no mínimo mantém a primeira ocorrência
+    assert summary["min_price_discount"] == "1%"
+    assert (summary["max_price"], summary["max_price_at"]) == (120.0, START + timedelta(minutes=3))
+    assert (summary["last_change_from"], summary["last_change_at"]) == (90.0, START + timedelta(minutes=3))
+
+
+@pytest.mark.asyncio
+async def test_apply_observation_first_sample_has_no_change(summaries):
+    await PriceSummary.apply_observation("a", 50.0, START)
+
+    summary = summaries["a"]
+    assert summary["samples"] == 1
+    assert summary["min_price"] == summary["max_price"] == 50.0
+    assert summary["last_change_at"] is None and summary["last_change_from"] is None
+
+
+@pytest.mark.asyncio
+async def test_rebuild_maps_aggregated_rows(summaries, monkeypatch):
+    history = FakeAggregate([{
+        "_id": "a",
+        "samples": 3,
+        "currency": None,
+        "first_price": 100.0, "first_timestamp": START,
+        "last_price": 80.0, "last_timestamp": START + timedelta(days=2),
+        "min": {"price": 80.0, "at": START + timedelta(days=2), "discount": "20%"},
+        "max": {"price": 110.0, "at": START + timedelta(days=1)},
+        "changes": [{"at": START + timedelta(days=1), "from": 100.0}, {"at": START + timedelta(days=2), "from": 110.0}],
+    }])
+    monkeypatch.setattr(PriceHistory, "_points_pipeline", classmethod(lambda cls, ids, start: (history, [])))
+
+    assert await PriceSummary.rebuild(["a"]) == 1
+
+    summary = summaries["a"]
+    assert summary["currency"] == "BRL"
+    assert (summary["min_price"], summary["min_price_discount"]) == (80.0, "20%")
+    assert summary["max_price_at"] == START + timedelta(days=1)
+    assert (summary["last_change_from"], summary["last_change_at"]) == (110.0, START + timedelta(days=2))
+
+
+def use_summary(monkeypatch, **fields):
+    async def get_for_offer(cls, offer_id):
+        return SimpleNamespace(**fields) if fields else None
+
+    monkeypatch.setattr(PriceSummary, "get_for_offer", classmethod(get_for_offer))
+
+
+@pytest.mark.asyncio
+async def test_price_variation_from_summary(monkeypatch):
+    use_summary(
+        monkeypatch, samples=3, first_price=100.0, last_price=85.0,
+        min_price=80.0, max_price=110.0, last_change_at=START
+    )
+
+    variation = await PriceHistory.get_price_variation("a")
+
+    assert variation == {
+        "current_price": 85.0,
+        "initial_price": 100.0,
+        "variation_percent": -15.0,
+        "trend": "down",
+        "lowest_price": 80.0,
+        "highest_price": 110.0,
+        "last_change_at": START,
+    }
+
+
+@pytest.mark.asyncio
+async def test_lowest_price_and_variation_without_history(monkeypatch):
+    use_summary(monkeypatch)
+    assert await PriceHistory.get_lowest_price("a") is None
+    assert await PriceHistory.get_price_variation("a") is None
+
+    use_summary(monkeypatch, samples=1, first_price=50.0, last_price=50.0, min_price=50.0,
+                min_price_at=START, min_price_discount=None)
+    assert await PriceHistory.get_lowest_price("a") == {"price_discounted": 50.0, "timestamp": START, "discount": None}
+    assert await PriceHistory.get_price_variation("a") is None
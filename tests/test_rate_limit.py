@@ -0,0 +1,60 @@
+"""
+Testes do rate limiting (slowapi) nas rotas caras
+"""
+import ipaddress
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from slowapi import _rate_limit_exceeded_handler
+from slowapi.errors import RateLimitExceeded
+import app.main  # noqa: F401 (registra as rotas no limiter)
+from app.core import rate_limit
+
+
+def test_expensive_routes_are_limited():
+    limits = {name: [str(group.limit) for group in groups] for name, groups in rate_limit.limiter._route_limits.items()}
+
+    assert "app.routes.users.login" in limits
+    assert "app.routes.offers.extract_offer" in limits
+    assert "app.routes.offers.extract_and_save_offer" in limits
+    analytics = {name.rsplit(".", 1)[1] for name in limits if name.startswith("app.routes.analytics.")}
+    assert {"get_analytics_summary", "export_events"} <= analytics
+    # Beacons do frontend não são limitados
+    assert not {"track_offer_click", "track_page_view"} & analytics
+
+
+def make_request(remote: str, forwarded: str = None) -> Request:
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers, "client": (remote, 1234)})
+
+
+@pytest.mark.parametrize("remote, forwarded, expected", [
+    # Sem proxy confiável o cabeçalho é ignorado (o cliente poderia forjá-lo)
+    ("203.0.113.9", "198.51.100.1", "203.0.113.9"),
+    ("10.0.0.5", None, "10.0.0.5"),
+    ("10.0.0.5", "198.51.100.1", "198.51.100.1"),
+    # Valores à esquerda podem ter sido forjados: vale o mais à direita não confiável
+    ("10.0.0.5", "1.1.1.1, 198.51.100.1, 10.0.0.7", "198.51.100.1"),
+    ("10.0.0.5", "10.0.0.7", "10.0.0.5"),
+])
+def test_client_ip_uses_forwarded_header_only_from_trusted_proxies(monkeypatch, remote, forwarded, expected):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_TRUSTED_PROXIES", [ipaddress.ip_network("10.0.0.0/8")])
+
+    assert rate_limit.client_ip(make_request(remote, forwarded)) == expected
+
+
+def test_limit_enforced_with_memory_fallback_when_redis_is_down():
+    limiter = rate_limit.create_limiter("redis://127.0.0.1:1")
+    demo = FastAPI()
+    demo.state.limiter = limiter
+    demo.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+
+    @demo.post("/users/login")
+    @limiter.limit("3/minute")
+    async def login(request: Request):
+        return {"ok": True}
+
+    client = TestClient(demo)
+    statuses = [client.post("/users/login").status_code for _ in range(5)]
+
+    assert statuses == [200, 200, 200, 429, 429]
@@ -0,0 +1,132 @@
+"""
+Testes da geração de tags em lote (limitador de taxa e job de backfill)
+"""
+import asyncio
+from types import SimpleNamespace
+import pytest
+from bson import ObjectId
+from app.core import cache
+from app.models.offer import Offer
+from app.services import ai_categorization, tag_backfill
+from app.services.ai_cache import AICache
+from app.services.tag_backfill import TokenBucket
+from tests.fakes import MemoryRedis, fake_client
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_allows_burst_then_limits_rate():
+    bucket = TokenBucket(rate=20, capacity=2)
+    loop = asyncio.get_running_loop()
+
+    started = loop.time()
+    await asyncio.gather(*(bucket.acquire() for _ in range(2)))
+    assert loop.time() - started < 0.03
+
+    started = loop.time()
+    await asyncio.gather(*(bucket.acquire() for _ in range(4)))
+    # 4 tokens a 20/s depois de esgotar a rajada: ~0,2s
+    assert 0.15 <= loop.time() - started < 0.4
+
+
+class FakeOffers:
+    """Collection de ofertas: find/count sobre as sem tags, bulk_write registra as operações"""
+
+    def __init__(self, offers):
+        self.offers = offers
+        self.operations = []
+
+    async def count_documents(self, query):
+        assert query == tag_backfill.UNTAGGED_QUERY
+        return len(self.offers)
+
+    async def find(self, query, projection=None):
+        assert query == tag_backfill.UNTAGGED_QUERY
+        for offer in self.offers:
+            yield offer
+
+    async def bulk_write(self, operations, ordered=True):
+        self.operations += operations
+        return SimpleNamespace(modified_count=len(operations))
+
+
+class CountingBucket(TokenBucket):
+    acquired = 0
+
+    async def acquire(self):
+        CountingBucket.acquired += 1
+        await super().acquire()
+
+
+@pytest.fixture
+def backfill(monkeypatch):
+    redis = MemoryRedis()
+    monkeypatch.setattr(cache, "redis_client", redis)
+    monkeypatch.setattr(ai_categorization, "ai_cache", AICache())
+    monkeypatch.setattr(tag_backfill, "TokenBucket", CountingBucket)
+    monkeypatch.setattr(tag_backfill, "TAG_BACKFILL_CONCURRENCY", 1)
+    monkeypatch.setattr(tag_backfill, "jobs", {})
+    monkeypatch.setattr(tag_backfill, "_tasks", {})
+    CountingBucket.acquired = 0
+
+    def use_offers(titles):
+        collection = FakeOffers([{"_id": ObjectId(), "title": title} for title in titles])
+        monkeypatch.setattr(Offer, "get_pymongo_collection", classmethod(lambda cls: collection))
+        return collection
+
+    return SimpleNamespace(redis=redis, use_offers=use_offers)
+
+
+async def run_job():
+    job = await tag_backfill.start_tag_backfill()
+    await tag_backfill._tasks[job["job_id"]]
+    return job
+
+
+@pytest.mark.asyncio
+async def test_backfill_writes_guarded_updates_and_progress(monkeypatch, backfill):
+    offers = backfill.use_offers(["Console PS5 Slim", "Console PS5 Slim", "Notebook Dell"])
+    completions = fake_client(monkeypatch, "console, ps5, sony")
+
+    job = await run_job()
+
+    assert (job["status"], job["total"], job["processed"], job["updated"], job["errors"]) == ("completed", 3, 3, 3, 0)
+    assert all(op._filter == {"_id": op._filter["_id"], **tag_backfill.UNTAGGED_QUERY} for op in offers.operations)
+    assert offers.operations[0]._doc["$set"]["tags"] == ["console", "ps5", "sony"]
+    # Título repetido vem do cache: só as chamadas reais à IA consomem o bucket
+    assert len(completions.calls) == CountingBucket.acquired == 2
+    assert f"tag_backfill:job:{job['job_id']}" in backfill.redis.data
+
+
+@pytest.mark.asyncio
+async def test_keyword_fallback_does_not_consume_rate(monkeypatch, backfill):
+    backfill.use_offers(["Console PlayStation 5", "Notebook Dell Inspiron"])
+    monkeypatch.setattr(ai_categorization, "client", None)
+
+    job = await run_job()
+
+    assert (job["status"], job["processed"]) == ("completed", 2)
+    assert CountingBucket.acquired == 0
+
+
+@pytest.mark.asyncio
+async def test_cancel_flushes_processed_offers(monkeypatch, backfill):
+    offers = backfill.use_offers(["Console PS5", "Notebook Dell", "Monitor LG"])
+    blocked = asyncio.Event()
+
+    async def generate_tags(title, description=None, category=None, rate_limiter=None):
+        if title != "Console PS5":
+            blocked.set()
+            await asyncio.Event().wait()
+        return ["ps5"]
+
+    monkeypatch.setattr(tag_backfill, "generate_tags", generate_tags)
+
+    job = await tag_backfill.start_tag_backfill()
+    task = tag_backfill._tasks[job["job_id"]]
+    await asyncio.wait_for(blocked.wait(), 1)
+    assert tag_backfill.cancel_job(job["job_id"])
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert job["status"] == "cancelled"
+    assert job["updated"] == 1 and len(offers.operations) == 1
+    assert job["finished_at"] is not None
@@ -0,0 +1,106 @@
+"""
+Testes do cache de tokens JWT verificados e da lista de revogação
+"""
+from datetime import timedelta
+from types import SimpleNamespace
+import pytest
+from fastapi import HTTPException
+from app.core import cache, security
+from tests.fakes import USER_ID, MemoryRedis, credentials, fake_users
+
+
+@pytest.fixture
+def users(monkeypatch):
+    return fake_users(monkeypatch)
+
+
+@pytest.fixture(autouse=True)
+def clean_state(monkeypatch):
+    monkeypatch.setattr(security, "_token_cache", {})
+    monkeypatch.setattr(security, "_revoked_tokens", {})
+    monkeypatch.setattr(security, "_revoked_users", {})
+    monkeypatch.setattr(cache, "redis_client", None)
+
+
+def count_decodes(monkeypatch):
+    calls = []
+    decode = security.jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        calls.append(1)
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(security.jwt, "decode", counting_decode)
+    return calls
+
+
+def test_verified_token_skips_decode_until_exp(monkeypatch):
+    calls = count_decodes(monkeypatch)
+    token = security.create_access_token({"sub": USER_ID})
+
+    first = security.verify_token(token)
+    second = security.verify_token(token)
+
+    assert first == second
+    assert first["jti"] and first["iat"]
+    assert len(calls) == 1
+
+
+def test_expired_token_is_rejected_and_not_cached(monkeypatch):
+    token = security.create_access_token({"sub": USER_ID}, expires_delta=timedelta(seconds=-1))
+
+    with pytest.raises(HTTPException) as error:
+        security.verify_token(token)
+
+    assert error.value.status_code == 401
+    assert security._token_cache == {}
+
+
+def test_tampered_token_is_rejected():
+    token = security.create_access_token({"sub": USER_ID})
+    security.verify_token(token)
+
+    with pytest.raises(HTTPException):
+        security.verify_token(token[:-2] + ("AA" if not token.endswith("AA") else "BB"))
+
+
+@pytest.mark.asyncio
+async def test_logout_revokes_only_that_token(users):
+    revoked, other = credentials(), credentials()
+    await security.get_current_user(revoked)
+
+    await security.revoke_token(security.verify_token(revoked.credentials))
+
+    with pytest.raises(HTTPException) as error:
+        await security.get_current_user(revoked)
+    assert error.value.status_code == 401
+    assert (await security.get_current_user(other)).id == USER_ID
+
+
+@pytest.mark.asyncio
+async def test_deactivation_revokes_tokens_on_other_workers(users, monkeypatch):
+    redis = MemoryRedis()
+    monkeypatch.setattr(cache, "redis_client", redis)
+    token = credentials()
+    await security.get_current_user(token)
+
+    await security.revoke_user_tokens(USER_ID)
+    # Outro worker: só enxerga o Redis
+    monkeypatch.setattr(security, "_revoked_users", {})
+
+    with pytest.raises(HTTPException) as error:
+        await security.get_current_user(token)
+    assert error.value.status_code == 401
+    assert f"auth:revoked_user:{USER_ID}" in redis.data
+
+
+@pytest.mark.asyncio
+async def test_token_issued_after_revocation_in_same_second_is_accepted(users, monkeypatch):
+    clock = iter([1700000000.2, 1700000000.7])
+    monkeypatch.setattr(security, "time", SimpleNamespace(time=lambda: next(clock)))
+    await security.revoke_user_tokens(USER_ID)
+    token = security.create_access_token({"sub": USER_ID})
+
+    payload = security.jwt.decode(token, security.SECRET_KEY, algorithms=[security.ALGORITHM], options={"verify_exp": False})
+    assert payload["iat"] == 1700000000
+    assert not await security.is_token_revoked(payload)
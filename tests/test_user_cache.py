@@ -0,0 +1,76 @@
+"""
+Testes do cache do usuário autenticado em get_current_user
+"""
+import pytest
+from fastapi import HTTPException
+from app.core import security
+from tests.fakes import USER_ID, credentials, fake_users
+
+
+@pytest.fixture
+def users(monkeypatch):
+    return fake_users(monkeypatch)
+
+
+@pytest.mark.asyncio
+async def test_repeated_requests_read_database_once(users):
+    first = await security.get_current_user(credentials())
+    second = await security.get_current_user(credentials())
+
+    assert first == second
+    assert (first.role, first.is_active) == ("moderator", True)
+    assert users.reads == [USER_ID]
+
+
+@pytest.mark.asyncio
+async def test_invalidation_reloads_role_and_status(users):
+    await security.get_current_user(credentials())
+
+    users.store[USER_ID].is_active = False
+    security.invalidate_user_cache(USER_ID)
+
+    with pytest.raises(HTTPException) as error:
+        await security.get_current_user(credentials())
+    assert error.value.status_code == 403
+    assert len(users.reads) == 2
+
+
+@pytest.mark.asyncio
+async def test_entries_expire_after_ttl(users, monkeypatch):
+    monkeypatch.setattr(security, "USER_CACHE_TTL_SECONDS", 0)
+
+    await security.get_current_user(credentials())
+    await security.get_current_user(credentials())
+
+    assert len(users.reads) == 2
+
+
+@pytest.mark.asyncio
+async def test_deleted_user_is_rejected(users):
+    await security.get_current_user(credentials())
+    del users.store[USER_ID]
+    security.invalidate_user_cache(USER_ID)
+
+    with pytest.raises(HTTPException) as error:
+        await security.get_current_user(credentials())
+    assert error.value.status_code == 401
+
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("route, service", [
+    ("cleanup_expired", "cleanup_expired_files"),
+    ("cleanup_orphans", "cleanup_orphan_files"),
+])
+async def test_admin_cleanup_routes_accept_authenticated_user(monkeypatch, route, service):
+    from app.routes import files
+
+    async def fake_cleanup():
+        return {"deleted": 3, "failed": 0, "freed_mb": 1.5}
+
+    monkeypatch.setattr(files.storage_service, service, fake_cleanup)
+    admin = security.AuthenticatedUser(id=USER_ID, role="admin", is_active=True)
+
+    result = await getattr(files, route)(admin)
+
+    assert result.deleted == 3
@@ -0,0 +1,125 @@
+"""
+Script para (re)treinar o classificador local de categorias a partir das ofertas já categorizadas.
+
+1. Carrega título/categoria das ofertas (títulos quase idênticos contam uma vez)
+2. Treina com 80% e avalia nos 20% restantes: acurácia geral, cobertura e acurácia
+   acima do limiar de confiança, comparação com as keywords e latência de predição
+3. Retreina com todos os dados e salva o modelo (carregado na próxima inicialização)
+
+Uso:
+    python train_category_model.py [--output ml_models/category_classifier.npz] [--epochs 60]
+    python train_category_model.py --benchmark-only   # avalia o modelo salvo sem retreinar
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+import motor.motor_asyncio
+from dotenv import load_dotenv
+from app.services.ai_cache import normalize_title
+from app.services.ai_categorization import CATEGORIES, categorize_titles_by_keywords
+from app.services.local_classifier import FALLBACK_CATEGORY, LocalClassifier, LOCAL_CLASSIFIER_PATH, LOCAL_CLASSIFIER_THRESHOLD
+
+load_dotenv()
+
+
+async def load_samples(min_per_class: int):
+    mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+    mongo_db = os.getenv("MONGO_DB", "ecosystem_db")
+    db = motor.motor_asyncio.AsyncIOMotorClient(mongo_uri)[mongo_db]
+
+    # "Outros" é o rótulo das falhas de categorização, não uma classe: fica fora do treino
+    categories = [category for category in CATEGORIES if category != FALLBACK_CATEGORY]
+    samples = {}
+    cursor = db.offers.find({"category": {"$in": categories}, "title": {"$nin": [None, ""]}}, {"title": 1, "category": 1})
+    async for offer in cursor:
+        # Mesmo produto repetido inflaria a acurácia no conjunto de teste
+        samples.setdefault(normalize_title(offer["title"]), (offer["title"], offer["category"]))
+
+    counts = {}
+    for _, category in samples.values():
+        counts[category] = counts.get(category, 0) + 1
+    kept = [sample for sample in samples.values() if counts[sample[1]] >= min_per_class]
+
+    print(f"📦 {len(kept)} títulos únicos em {sum(1 for c in counts.values() if c >= min_per_class)} categorias")
+    for category, count in sorted(counts.items(), key=lambda item: -item[1]):
+        flag = "" if count >= min_per_class else " (ignorada: poucas amostras)"
+        print(f"   {category}: {count}{flag}")
+    return kept
+
+
+def evaluate(model: LocalClassifier, samples, threshold: float):
+    titles = [title for title, _ in samples]
+    labels = [category for _, category in samples]
+
+    predictions = model.predict_many(titles)
+    correct = [predicted == label for (predicted, _), label in zip(predictions, labels)]
+    confident = [confidence >= threshold for _, confidence in predictions]
+    confident_correct = [c for c, ok in zip(correct, confident) if ok]
+    keywords_correct = [predicted == label for predicted, label in zip(categorize_titles_by_keywords(titles), labels)]
+
+    print(f"\n🎯 Acurácia ({len(samples)} títulos de teste)")
+    print(f"   Modelo local:        {sum(correct) / len(correct) * 100:.1f}%")
+    print(f"   Keywords:            {sum(keywords_correct) / len(keywords_correct) * 100:.1f}%")
+    print(f"   Confiança >= {threshold}: cobertura {sum(confident) / len(confident) * 100:.1f}%", end="")
+    if confident_correct:
+        print(f", acurácia {sum(confident_correct) / len(confident_correct) * 100:.1f}%")
+    else:
+        print()
+
+    # Latência: predição individual (caminho do extract-and-save) e em lote (backfill)
+    single = []
+    for title in titles[:1000]:
+        started = time.perf_counter()
+        model.predict(title)
+        single.append((time.perf_counter() - started) * 1e6)
+    single.sort()
+
+    started = time.perf_counter()
+    model.predict_many(titles)
+    batch_seconds = time.perf_counter() - started
+
+    print("\n⚡ Latência")
+    print(f"   Individual: p50 {statistics.median(single):.0f}µs, p99 {single[int(len(single) * 0.99) - 1]:.0f}µs")
+    print(f"   Lote: {len(titles) / batch_seconds:,.0f} títulos/s")
+
+
+async def main(args):
+    samples = await load_samples(args.min_per_class)
+    if len(samples) < 20:
+        print("⚠️  Poucas ofertas categorizadas para treinar o modelo")
+        return
+
+    if args.benchmark_only:
+        evaluate(LocalClassifier.load(args.output), samples, args.threshold)
+        return
+
+    random.Random(args.seed).shuffle(samples)
+    split = int(len(samples) * (1 - args.test_size))
+    train, test = samples[:split], samples[split:]
+    classes = sorted({category for _, category in samples})
+
+    started = time.perf_counter()
+    model = LocalClassifier(classes).train([t for t, _ in train], [c for _, c in train], epochs=args.epochs)
+    print(f"\n🏋️  Treino: {len(train)} títulos em {time.perf_counter() - started:.1f}s")
+    evaluate(model, test, args.threshold)
+
+    # Modelo final com todos os dados
+    model = LocalClassifier(classes).train([t for t, _ in samples], [c for _, c in samples], epochs=args.epochs)
+    model.save(args.output)
+    print(f"\n💾 Modelo salvo em {args.output} ({os.path.getsize(args.output) / 1024:.0f} KB)")
+    print("💡 Reinicie a aplicação para carregar o novo modelo.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Treina o classificador local de categorias")
+    parser.add_argument("--output", default=LOCAL_CLASSIFIER_PATH, help="Arquivo do modelo")
+    parser.add_argument("--epochs", type=int, default=60, help="Épocas de treino")
+    parser.add_argument("--test-size", type=float, default=0.2, help="Fração reservada para avaliação")
+    parser.add_argument("--min-per-class", type=int, default=5, help="Mínimo de títulos por categoria")
+    parser.add_argument("--threshold", type=float, default=LOCAL_CLASSIFIER_THRESHOLD, help="Limiar de confiança avaliado")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--benchmark-only", action="store_true", help="Apenas avalia o modelo salvo")
+    asyncio.run(main(parser.parse_args()))